@@ -1,10 +1,15 @@
+import logging
+
 from django import forms
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
+from django.db import transaction
 from django.utils.html import format_html
 from .models import Genre, MediaItem, Season, Rating, Watchlist, Profile
 
+logger = logging.getLogger(__name__)
+
 
 @admin.register(Genre)
 class GenreAdmin(admin.ModelAdmin):
@@ -13,6 +18,16 @@ class GenreAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+def refresh_similar_titles(item_id):
+    """Update the content-based lists after an admin save; the save has committed, so never fail it."""
+    try:
+        from .recommendations import content
+
+        content.item_changed(item_id)
+    except Exception:
+        logger.exception("Could not refresh similar titles of item %s.", item_id)
+
+
 @admin.register(MediaItem)
 class MediaItemAdmin(admin.ModelAdmin):
     list_display = ['title', 'media_type', 'release_year', 'country', 'is_published']
@@ -21,7 +36,7 @@ class MediaItemAdmin(admin.ModelAdmin):
     save_on_top = True
     filter_horizontal = ['genres']
     radio_fields = {'media_type': admin.HORIZONTAL}
-    readonly_fields = ['poster_preview', 'created_at', 'updated_at']
+    readonly_fields = ['poster_preview', 'created_at', 'updated_at', 'avg_rating', 'rating_count']
     fieldsets = (
         ('Basic info', {
             'fields': ('title', 'original_title', 'media_type', 'description'),
@@ -38,11 +53,20 @@ class MediaItemAdmin(admin.ModelAdmin):
         ('Status', {
             'fields': ('is_published', 'created_at', 'updated_at'),
         }),
+        ('Ratings', {
+            'fields': (('avg_rating', 'rating_count'),),
+        }),
     )
 
     class Media:
         css = {'all': ('admin/custom-admin.css',)}
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Genres are saved by now; refresh the "similar titles" lists once committed.
+        item_id = form.instance.pk
+        transaction.on_commit(lambda: refresh_similar_titles(item_id))
+
     def poster_preview(self, obj):
         if obj.poster:
             return format_html('<img src="{}" width="100" />', obj.poster.url)
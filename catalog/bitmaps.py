@@ -0,0 +1,254 @@
+"""In-memory bitmap index for faceted catalog filtering.
+
+Every published item gets a dense bit position; each facet value (media type,
+genre, release year, country, duration bucket) keeps a Python ``int`` used as a
+bitset of the items that have it. A filter is a handful of ``&``/``|`` on those
+ints, and the count for every remaining option is one intersection and
+``bit_count()``, so faceted browsing issues no join queries at all.
+
+Each worker process holds its own index, built on first use. When items
+change, a patched copy replaces it in one assignment, so readers never see an
+index that is being modified. A shared ``bitmaps`` version counter (see
+``catalog.caching``) tells the other processes to rebuild theirs.
+"""
+import json
+import threading
+from dataclasses import dataclass, field
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+
+from .caching import bump_version, get_version
+from .models import MediaItem
+
+NAMESPACE = 'bitmaps'
+FACETS = ('type', 'genre', 'year', 'country', 'duration')
+
+# (key, label, minutes from, minutes to)
+DURATION_BUCKETS = (
+    ('short', 'До 30 хв', 0, 30),
+    ('medium', '30–90 хв', 30, 90),
+    ('long', '90–150 хв', 90, 150),
+    ('epic', 'Понад 150 хв', 150, None),
+)
+
+
+def duration_bucket(minutes):
+    for key, _, low, high in DURATION_BUCKETS:
+        if minutes >= low and (high is None or minutes < high):
+            return key
+    return DURATION_BUCKETS[0][0]
+
+
+@dataclass
+class Filters:
+    """Selected values per facet; an empty set means "any"."""
+    type: set = field(default_factory=set)
+    genre: set = field(default_factory=set)
+    year: set = field(default_factory=set)
+    country: set = field(default_factory=set)
+    duration: set = field(default_factory=set)
+    genre_mode: str = 'or'
+    # Optional item ids the result must stay within (e.g. text search matches).
+    restrict_ids: object = None
+
+
+class BitmapIndex:
+    def __init__(self, version=None):
+        self.version = version
+        self.positions = {}
+        self.ids = []
+        self.universe = 0
+        self.facets = {facet: {} for facet in FACETS}
+        self.item_keys = {}
+
+    @classmethod
+    def build(cls, version=None):
+        index = cls(version)
+        genres = {}
+        through = MediaItem.genres.through.objects.filter(mediaitem__is_published=True)
+        for item_id, genre_id in through.values_list('mediaitem_id', 'genre_id').iterator():
+            genres.setdefault(item_id, []).append(genre_id)
+        rows = (
+            MediaItem.objects.filter(is_published=True).order_by('pk')
+            .values_list('pk', 'media_type', 'release_year', 'country', 'duration')
+        )
+        members = {facet: {} for facet in FACETS}
+        for row in rows.iterator():
+            position = index.positions[row[0]] = len(index.ids)
+            index.ids.append(row[0])
+            keys = index.item_keys[row[0]] = _item_keys(row, genres.get(row[0], ()))
+            for facet, values in keys.items():
+                for value in values:
+                    members[facet].setdefault(value, []).append(position)
+        # Setting bits one by one on a growing int is quadratic; pack them instead.
+        index.universe = (1 << len(index.ids)) - 1
+        for facet, values in members.items():
+            index.facets[facet] = {value: _pack(positions) for value, positions in values.items()}
+        return index
+
+    def copy(self):
+        """An independent index to patch; bitsets are immutable ints, so only the containers are copied."""
+        clone = BitmapIndex(self.version)
+        clone.positions = dict(self.positions)
+        clone.ids = list(self.ids)
+        clone.universe = self.universe
+        clone.facets = {facet: dict(bitsets) for facet, bitsets in self.facets.items()}
+        clone.item_keys = dict(self.item_keys)
+        return clone
+
+    def add(self, pk, keys):
+        self.remove(pk)
+        position = self.positions.get(pk)
+        if position is None:
+            position = self.positions[pk] = len(self.ids)
+            self.ids.append(pk)
+        bit = 1 << position
+        self.universe |= bit
+        for facet, values in keys.items():
+            bitsets = self.facets[facet]
+            for value in values:
+                bitsets[value] = bitsets.get(value, 0) | bit
+        self.item_keys[pk] = keys
+
+    def remove(self, pk):
+        keys = self.item_keys.pop(pk, None)
+        if keys is None:
+            return
+        # The position stays reserved for the item; a rebuild compacts it.
+        mask = ~(1 << self.positions[pk])
+        self.universe &= mask
+        for facet, values in keys.items():
+            bitsets = self.facets[facet]
+            for value in values:
+                remaining = bitsets[value] & mask
+                if remaining:
+                    bitsets[value] = remaining
+                else:
+                    del bitsets[value]
+
+    def bits_for_ids(self, ids):
+        positions = sorted(self.positions[pk] for pk in ids if pk in self.positions)
+        return _pack(positions) if positions else 0
+
+    def ids_for_bits(self, bits):
+        binary = bin(bits & self.universe)[:1:-1]
+        return [self.ids[position] for position, flag in enumerate(binary) if flag == '1']
+
+    def select(self, filters, skip=None):
+        """Bits of the items matching ``filters``, ignoring the ``skip`` facet."""
+        bits = self.universe
+        if filters.restrict_ids is not None:
+            bits &= self.bits_for_ids(filters.restrict_ids)
+        for facet in FACETS:
+            selected = getattr(filters, facet)
+            if facet == skip or not selected:
+                continue
+            bitsets = self.facets[facet]
+            if facet == 'genre' and filters.genre_mode == 'and':
+                for value in selected:
+                    bits &= bitsets.get(value, 0)
+            else:
+                union = 0
+                for value in selected:
+                    union |= bitsets.get(value, 0)
+                bits &= union
+        return bits
+
+    def counts(self, filters):
+        """``{facet: {value: count}}`` of what each option would match next.
+
+        OR facets are counted without their own selection, so picking another
+        value of the same facet shows how many items it would add; AND-mode
+        genres are counted within the current result.
+        """
+        counts = {}
+        for facet in FACETS:
+            own = facet == 'genre' and filters.genre_mode == 'and'
+            base = self.select(filters, skip=None if own else facet)
+            counts[facet] = {
+                value: (base & bits).bit_count()
+                for value, bits in self.facets[facet].items()
+            }
+        return counts
+
+    def total(self, facet=None, value=None):
+        if facet is None:
+            return self.universe.bit_count()
+        return self.facets[facet].get(value, 0).bit_count()
+
+
+def _pack(positions):
+    buffer = bytearray(positions[-1] // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def _item_keys(row, genre_ids):
+    _, media_type, release_year, country, duration = row
+    return {
+        'type': (media_type,),
+        'genre': tuple(genre_ids),
+        'year': (release_year,),
+        'country': (country,) if country else (),
+        'duration': (duration_bucket(duration or 0),),
+    }
+
+
+_lock = threading.Lock()
+_index = None
+
+
+def get_index():
+    global _index
+    version = get_version(NAMESPACE)
+    if _index is None or _index.version != version:
+        with _lock:
+            if _index is None or _index.version != version:
+                _index = BitmapIndex.build(version)
+    return _index
+
+
+def _refresh_items(item_ids):
+    global _index
+    item_ids = {pk for pk in item_ids if pk is not None}
+    if not item_ids:
+        return
+    with _lock:
+        current = _index is not None and _index.version == get_version(NAMESPACE)
+        version = bump_version(NAMESPACE)
+        if not current or version != _index.version + 1:
+            # Someone else changed the catalog in between; rebuild on next use.
+            return
+        # Requests may be reading ``_index`` without the lock: patch a copy.
+        index = _index.copy()
+        genres = {}
+        through = MediaItem.genres.through.objects.filter(mediaitem_id__in=item_ids)
+        for item_id, genre_id in through.values_list('mediaitem_id', 'genre_id'):
+            genres.setdefault(item_id, []).append(genre_id)
+        rows = (
+            MediaItem.objects.filter(pk__in=item_ids, is_published=True)
+            .values_list('pk', 'media_type', 'release_year', 'country', 'duration')
+        )
+        published = set()
+        for row in rows:
+            published.add(row[0])
+            index.add(row[0], _item_keys(row, genres.get(row[0], ())))
+        for pk in item_ids - published:
+            index.remove(pk)
+        index.version = version
+        _index = index
+
+
+def items_changed(item_ids):
+    """Patch the index for these items once the current transaction commits."""
+    item_ids = list(item_ids)
+    transaction.on_commit(lambda: _refresh_items(item_ids))
+
+
+def ids_condition(ids):
+    """Right-hand side for ``pk__in`` that stays a single parameter for long id lists."""
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT value FROM json_each(%s)', [json.dumps(ids)])
+    return ids
@@ -0,0 +1,41 @@
+"""Versioned cache namespaces.
+
+Entries are stored under keys that embed the namespace's current version, so
+invalidating a namespace is a single ``incr`` of its version counter: every
+process sharing the cache stops seeing the old entries at once, and the stale
+ones simply expire.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_TIMEOUT = None  # version counters never expire on their own
+
+
+def _version_key(namespace):
+    return f'catalog:version:{namespace}'
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so a lost counter never resurrects old entries.
+        cache.add(key, int(time.time() * 1000), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, VERSION_TIMEOUT)
+        return version
+
+
+def versioned_key(namespace, *parts):
+    suffix = ':'.join(str(part) for part in parts)
+    return f'catalog:{namespace}:{get_version(namespace)}:{suffix}'
@@ -0,0 +1,70 @@
+"""Materialized top charts per genre.
+
+Charts rank items by ``MediaItem.weighted_rating`` (see
+``catalog.ratings.weighted_rating``). Per media type the item table's own
+``(media_type, -weighted_rating, -id)`` index already serves the chart; a genre
+chart needs the M2M join, so each (genre, published item) pair keeps a
+``ChartEntry`` row carrying copies of the type and score, indexed by
+``(genre, [media_type,] -weighted_rating, -id)``. A chart page is then one
+index range scan whatever the size of the genre.
+
+Rating changes update the score copies in place (``ratings.apply_change``);
+``sync_items`` rewrites the rows of items whose genres, type or publication
+changed.
+"""
+from django.db import transaction
+
+from .bitmaps import ids_condition
+from .models import ChartEntry, MediaItem
+
+ORDERING = ('-weighted_rating', '-id')
+
+
+def _entries(items):
+    genres = {}
+    through = MediaItem.genres.through.objects.filter(mediaitem_id__in=ids_condition([pk for pk, *_ in items]))
+    for item_id, genre_id in through.values_list('mediaitem_id', 'genre_id'):
+        genres.setdefault(item_id, []).append(genre_id)
+    return [
+        ChartEntry(genre_id=genre_id, media_item_id=pk, media_type=media_type, weighted_rating=weighted)
+        for pk, media_type, weighted in items
+        for genre_id in genres.get(pk, ())
+    ]
+
+
+def sync_items(item_ids):
+    """Rewrite the chart rows of ``item_ids`` from their current state."""
+    item_ids = [pk for pk in set(item_ids) if pk is not None]
+    if not item_ids:
+        return
+    items = list(
+        MediaItem.objects.filter(pk__in=ids_condition(item_ids), is_published=True)
+        .values_list('pk', 'media_type', 'weighted_rating')
+    )
+    with transaction.atomic():
+        ChartEntry.objects.filter(media_item_id__in=ids_condition(item_ids)).delete()
+        ChartEntry.objects.bulk_create(_entries(items), batch_size=500)
+
+
+def rebuild(batch_size=500):
+    """Recreate every chart row. Returns the number of rows written."""
+    written = 0
+    with transaction.atomic():
+        ChartEntry.objects.all().delete()
+        items = MediaItem.objects.filter(is_published=True).order_by('pk').values_list('pk', 'media_type', 'weighted_rating')
+        batch = []
+        for row in items.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                written += len(ChartEntry.objects.bulk_create(_entries(batch)))
+                batch = []
+        written += len(ChartEntry.objects.bulk_create(_entries(batch)))
+    return written
+
+
+def genre_chart(genre, media_type=None):
+    """Entries of the ``genre`` chart, optionally of one media type, for keyset pagination."""
+    entries = ChartEntry.objects.filter(genre=genre)
+    if media_type:
+        entries = entries.filter(media_type=media_type)
+    return entries
@@ -1,6 +1,11 @@
-from .models import Genre
+from django.utils.functional import SimpleLazyObject
+
+from . import reference
+
 
 def genres_processor(request):
+    # Lazy: pages that never list genres do not even touch the cache.
     return {
-        'genres': Genre.objects.all()
-    }
\ No newline at end of file
+        'genres': SimpleLazyObject(reference.get_genres),
+        'media_type_labels': reference.media_type_labels(),
+    }
@@ -0,0 +1,74 @@
+"""Cached facet counts for the catalog (per media type, genre and type×genre)."""
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Sum, Value
+
+from .caching import bump_version, versioned_key
+from .models import MediaItem
+
+NAMESPACE = 'facets'
+CACHE_TIMEOUT = 60 * 60
+
+
+class FacetCounts:
+    def __init__(self, rows=()):
+        self.types = {}
+        self.genres = {}
+        self.type_genres = {}
+        self.ratings = 0
+        for media_type, genre_id, count, ratings in rows:
+            if genre_id is None:
+                self.types[media_type] = count
+                self.ratings += ratings or 0
+            else:
+                self.type_genres[(media_type, genre_id)] = count
+                self.genres[genre_id] = self.genres.get(genre_id, 0) + count
+
+    @property
+    def total(self):
+        return sum(self.types.values())
+
+    def type_count(self, media_type):
+        if media_type in (None, '', 'all'):
+            return self.total
+        return self.types.get(media_type, 0)
+
+    def genre_count(self, genre_id, media_type=None):
+        if media_type in (None, '', 'all'):
+            return self.genres.get(genre_id, 0)
+        return self.type_genres.get((media_type, genre_id), 0)
+
+
+def _query_rows():
+    """Per-type totals and per-(type, genre) counts in a single UNION ALL query."""
+    published = MediaItem.objects.filter(is_published=True)
+    per_type = (
+        published.order_by()
+        .values('media_type')
+        .annotate(
+            genre=Value(None, output_field=IntegerField()),
+            items=Count('id'),
+            ratings=Sum('rating_count'),
+        )
+        .values_list('media_type', 'genre', 'items', 'ratings')
+    )
+    per_type_genre = (
+        MediaItem.genres.through.objects.filter(mediaitem__is_published=True)
+        .order_by()
+        .values('mediaitem__media_type', 'genre_id')
+        .annotate(items=Count('id'), ratings=Value(0, output_field=IntegerField()))
+        .values_list('mediaitem__media_type', 'genre_id', 'items', 'ratings')
+    )
+    return list(per_type.union(per_type_genre, all=True))
+
+
+def get_facet_counts():
+    key = versioned_key(NAMESPACE, 'counts')
+    rows = cache.get(key)
+    if rows is None:
+        rows = _query_rows()
+        cache.set(key, rows, CACHE_TIMEOUT)
+    return FacetCounts(rows)
+
+
+def invalidate():
+    bump_version(NAMESPACE)
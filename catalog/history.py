@@ -0,0 +1,256 @@
+"""Export and import of a user's watchlist and rating history.
+
+Both directions hold a bounded amount of data however large the account is:
+
+* exports read the tables with ``.iterator()`` in chunks of ``CHUNK_SIZE``
+  and yield CSV lines or JSON array elements one by one, for a
+  ``StreamingHttpResponse`` or a file;
+* imports parse the upload incrementally (``csv`` rows, or one JSON object at
+  a time out of the array) and write every ``BATCH_SIZE`` records: watchlist
+  entries through ``watchlists.bulk_change``, ratings with one upsert followed
+  by a recount of the touched items' aggregates.
+
+A record is ``{'kind': 'watchlist' | 'rating', 'media_item_id', 'title',
+'status', 'score', 'comment', 'created_at'}``; ``title`` and ``created_at``
+are informational and ignored on import.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import facets, pagecache, ratings, user_stats, watchlists
+from .bitmaps import ids_condition
+from .models import MediaItem, Rating, Watchlist
+from .search import autocomplete
+
+FORMATS = ('csv', 'json')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'json': 'application/json'}
+FIELDS = ('kind', 'media_item_id', 'title', 'status', 'score', 'comment', 'created_at')
+WATCHLIST, RATING = 'watchlist', 'rating'
+CHUNK_SIZE = 2000
+BATCH_SIZE = 500
+READ_SIZE = 64 * 1024
+# Longest JSON record accepted; anything larger is rejected instead of buffered.
+MAX_RECORD_SIZE = 1024 * 1024
+
+
+class HistoryImportError(ValueError):
+    """The upload cannot be parsed; ``result`` holds what was imported before the error."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result or {}
+
+
+def records(user):
+    """Every watchlist entry, then every rating of ``user``, read in chunks."""
+    entries = (
+        Watchlist.objects.filter(user=user).order_by('pk')
+        .values_list('media_item_id', 'media_item__title', 'status', 'added_at')
+    )
+    for item_id, title, status, added_at in entries.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'kind': WATCHLIST, 'media_item_id': item_id, 'title': title, 'status': status,
+            'score': None, 'comment': '', 'created_at': added_at.isoformat(),
+        }
+    rated = (
+        Rating.objects.filter(user=user).order_by('pk')
+        .values_list('media_item_id', 'media_item__title', 'score', 'comment', 'created_at')
+    )
+    for item_id, title, score, comment, created_at in rated.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            'kind': RATING, 'media_item_id': item_id, 'title': title, 'status': '',
+            'score': score, 'comment': comment, 'created_at': created_at.isoformat(),
+        }
+
+
+class _Line:
+    """File-like target for ``csv.writer`` that hands back each written line."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(user):
+    writer = csv.writer(_Line())
+    yield '\ufeff' + writer.writerow(FIELDS)
+    for record in records(user):
+        yield writer.writerow(['' if record[field] is None else record[field] for field in FIELDS])
+
+
+def export_json(user):
+    yield '['
+    separator = '\n'
+    for record in records(user):
+        yield separator + json.dumps(record, ensure_ascii=False)
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def export(user, fmt):
+    """Chunks of the export of ``user`` in ``fmt`` (``csv`` or ``json``)."""
+    return export_csv(user) if fmt == 'csv' else export_json(user)
+
+
+def export_filename(user, fmt):
+    return f'sakura-media-{user.username}-{timezone.localdate():%Y%m%d}.{fmt}'
+
+
+def _text(stream):
+    # Decodes as it reads; the BOM written by ``export_csv`` is dropped.
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def _csv_rows(stream):
+    text = _text(stream)
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        text.detach()
+
+
+def _json_objects(stream):
+    """Objects of a top-level JSON array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    text = _text(stream)
+    buffer, position, started, finished = '', 0, False, False
+    try:
+        while not finished:
+            chunk = text.read(READ_SIZE)
+            if not chunk:
+                break
+            buffer = buffer[position:] + chunk
+            position = 0
+            while not finished:
+                while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ',')):
+                    position += 1
+                if position == len(buffer):
+                    break
+                if not started:
+                    if buffer[position] != '[':
+                        raise HistoryImportError('JSON export must be an array of records.')
+                    started, position = True, position + 1
+                elif buffer[position] == ']':
+                    finished = True
+                else:
+                    try:
+                        record, position = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError as exc:
+                        if not _cut_off(exc):
+                            raise HistoryImportError(f'Malformed JSON record: {exc}') from exc
+                        if len(buffer) - position > MAX_RECORD_SIZE:
+                            raise HistoryImportError('JSON record is too large.') from exc
+                        # An object cut at the chunk boundary: read more.
+                        break
+                    yield record
+    finally:
+        text.detach()
+    if not finished:
+        raise HistoryImportError('JSON export is truncated or malformed.')
+
+
+def _cut_off(exc):
+    """Whether a decode error may just be the end of the buffer rather than bad JSON."""
+    # An unterminated string reports where it starts; everything else fails at
+    # the end of the text (give or take a cut ``\uXXXX`` escape).
+    return exc.msg.startswith('Unterminated string') or exc.pos >= len(exc.doc) - 6
+
+
+def _clean(record):
+    """``(kind, item_id, values)`` for a valid record, ``None`` otherwise."""
+    if not isinstance(record, dict):
+        return None
+    try:
+        item_id = int(record.get('media_item_id'))
+        if record.get('kind') == WATCHLIST:
+            status = record.get('status')
+            return (WATCHLIST, item_id, status) if status in Watchlist.Status.values else None
+        if record.get('kind') == RATING:
+            score = int(record.get('score'))
+            comment = record.get('comment') or ''
+            return (RATING, item_id, (score, str(comment))) if 1 <= score <= 10 else None
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def _write_watchlist(user, statuses):
+    groups = {}
+    for item_id, status in statuses.items():
+        groups.setdefault(status, []).append(item_id)
+    written = 0
+    for status, item_ids in groups.items():
+        changed = watchlists.bulk_change(user, watchlists.ADD, item_ids, status, activity=False)
+        written += changed['added'] + changed['updated']
+    return written
+
+
+def _write_ratings(user, scores):
+    known = set(MediaItem.objects.filter(pk__in=ids_condition(list(scores))).values_list('pk', flat=True))
+    rows = [
+        Rating(user=user, media_item_id=item_id, score=score, comment=comment)
+        for item_id, (score, comment) in scores.items() if item_id in known
+    ]
+    with transaction.atomic():
+        Rating.objects.bulk_create(
+            rows,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'media_item'],
+            update_fields=['score', 'comment'],
+        )
+        # Row signals did not run: recount the aggregates the upsert moved.
+        drifted = ratings.recompute(sorted(known))
+        # Comment-only changes move no aggregate but still change the review fragments.
+        MediaItem.objects.filter(pk__in=ids_condition(sorted(known - set(drifted)))).update(
+            content_version=F('content_version') + 1,
+        )
+    for item_id in drifted:
+        autocomplete.update_rank(item_id)
+    pagecache.purge(known)
+    return len(rows)
+
+
+def import_history(user, stream, fmt):
+    """Import records from the binary ``stream`` in ``fmt`` into ``user``'s account.
+
+    Returns ``{'watchlist': ..., 'ratings': ..., 'skipped': ...}``; records for
+    unknown items or with invalid values are skipped.
+    """
+    result = {'watchlist': 0, 'ratings': 0, 'skipped': 0}
+    statuses, scores = {}, {}
+
+    def flush():
+        if statuses:
+            result['watchlist'] += _write_watchlist(user, statuses)
+        if scores:
+            written = _write_ratings(user, scores)
+            result['ratings'] += written
+            result['skipped'] += len(scores) - written
+        statuses.clear()
+        scores.clear()
+
+    source = _csv_rows(stream) if fmt == 'csv' else _json_objects(stream)
+    try:
+        for record in source:
+            cleaned = _clean(record)
+            if cleaned is None:
+                result['skipped'] += 1
+                continue
+            kind, item_id, values = cleaned
+            (statuses if kind == WATCHLIST else scores)[item_id] = values
+            if len(statuses) + len(scores) >= BATCH_SIZE:
+                flush()
+        flush()
+    except (HistoryImportError, csv.Error, UnicodeDecodeError) as exc:
+        flush()
+        raise HistoryImportError(str(exc), result) from exc
+    finally:
+        if result['ratings']:
+            facets.invalidate()
+        user_stats.recompute([user.pk])
+    return result
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from catalog import pagecache, posters
+from catalog.bitmaps import ids_condition
+from catalog.models import MediaItem
+
+
+class Command(BaseCommand):
+    help = "Write the resized WebP/AVIF poster variants of items that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Regenerate the variants of every poster, e.g. after changing the renditions.",
+        )
+
+    def handle(self, *args, **options):
+        items = MediaItem.objects.exclude(poster='').exclude(poster__isnull=True).only('id', 'poster', 'poster_variants')
+        if not options['all']:
+            items = items.filter(poster_variants={})
+
+        built, failed = [], 0
+        # Read up front: SQLite does not isolate a cursor from writes to its table.
+        for item in list(items.order_by('pk')):
+            variants = posters.generate(item.poster)
+            # A targeted UPDATE: no save signals, the files are the only change.
+            MediaItem.objects.filter(pk=item.pk).update(poster_variants=variants)
+            if variants:
+                built.append(item.pk)
+            else:
+                failed += 1
+        if built:
+            MediaItem.objects.filter(pk__in=ids_condition(built)).bump_content_version()
+            pagecache.purge(built)
+
+        self.stdout.write(self.style.SUCCESS(f"Built poster variants for {len(built)} items."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} posters could not be read and keep serving the original."))
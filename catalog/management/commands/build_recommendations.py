@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from catalog.recommendations import collaborative, content
+from catalog.recommendations.matrix import TOP_K
+
+BUILDERS = {
+    'ratings': collaborative,
+    'content': content,
+}
+
+
+class Command(BaseCommand):
+    help = "Compute precomputed neighbour lists: collaborative (\"users who liked this also liked\") and content-based similar titles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=sorted(BUILDERS),
+            action='append',
+            help="Only build this kind of lists (default: all).",
+        )
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help="Collaborative lists: only refresh items whose ratings changed since the last run.",
+        )
+        parser.add_argument(
+            '--items',
+            nargs='+',
+            type=int,
+            metavar='ID',
+            help="Only refresh these media items (and the items that list them).",
+        )
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=TOP_K,
+            help=f"Neighbours kept per item (default: {TOP_K}).",
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or list(BUILDERS)
+        if options['stale']:
+            kinds = [kind for kind in kinds if kind == 'ratings']
+        for kind in kinds:
+            builder = BUILDERS[kind]
+            if options['stale']:
+                refreshed = builder.refresh_stale(top_k=options['top_k'])
+            else:
+                refreshed = builder.refresh(options['items'], top_k=options['top_k'])
+            self.stdout.write(self.style.SUCCESS(f"{kind}: neighbour lists refreshed for {len(refreshed)} items."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catalog import trending
+
+
+class Command(BaseCommand):
+    help = "Rebase decayed trending scores and drop activity older than a week. Run it periodically (e.g. hourly from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help="Recompute all trending scores from the rating and watchlist history instead.",
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            scored = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Trending scores rebuilt for {scored} items."))
+            return
+        removed = trending.compact()
+        self.stdout.write(self.style.SUCCESS(f"Trending scores compacted. Expired daily buckets removed: {removed}"))
@@ -0,0 +1,29 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import history
+
+
+class Command(BaseCommand):
+    help = "Export a user's watchlist and ratings as CSV or JSON (streamed, constant memory)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=history.FORMATS, default='csv')
+        parser.add_argument('--output', help="File to write (default: stdout).")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        target = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in history.export(user, options['format']):
+                target.write(chunk)
+        finally:
+            if target is not sys.stdout:
+                target.close()
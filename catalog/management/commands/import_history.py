@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog import history
+
+
+class Command(BaseCommand):
+    help = "Import a watchlist and ratings export (CSV or JSON) into a user's account."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            choices=history.FORMATS,
+            help="File format (default: from the file extension).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        fmt = options['format'] or ('json' if options['path'].lower().endswith('.json') else 'csv')
+        with open(options['path'], 'rb') as stream:
+            try:
+                result = history.import_history(user, stream, fmt)
+            except history.HistoryImportError as exc:
+                raise CommandError(f"{exc} Imported before the error: {exc.result}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported watchlist entries: {result['watchlist']}, ratings: {result['ratings']}, skipped: {result['skipped']}."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from catalog import search as search_index
+from catalog.search import autocomplete, fuzzy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the inverted search, autocomplete and fuzzy title indexes for all published media items."
+
+    def handle(self, *args, **options):
+        indexed = search_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt. Items indexed: {indexed}"))
+        indexed = autocomplete.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Autocomplete index rebuilt. Items indexed: {indexed}"))
+        indexed = fuzzy.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Fuzzy title index rebuilt. Items indexed: {indexed}"))
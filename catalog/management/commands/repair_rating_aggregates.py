@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from catalog import charts, ratings
+from catalog.search import autocomplete
+
+
+class Command(BaseCommand):
+    help = "Verify denormalized rating aggregates on media items against the ratings table, repair drift and rebuild genre charts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report items whose aggregates drifted.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = ratings.recompute(dry_run=options['dry_run'])
+        if not options['dry_run']:
+            entries = charts.rebuild()
+            self.stdout.write(f"Genre charts rebuilt: {entries} entries.")
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Rating aggregates are consistent."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Items with drifted aggregates: {len(drifted)} ({', '.join(map(str, drifted[:20]))})"))
+            return
+
+        for item_id in drifted:
+            autocomplete.update_rank(item_id)
+        self.stdout.write(self.style.SUCCESS(f"Repaired rating aggregates for {len(drifted)} items."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from catalog import user_stats
+
+
+class Command(BaseCommand):
+    help = "Verify per-user profile counters against the watchlist and ratings tables and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Only report users whose counters drifted.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = user_stats.recompute(dry_run=options['dry_run'])
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Profile counters are consistent."))
+            return
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Users with drifted counters: {len(drifted)} ({', '.join(map(str, drifted[:20]))})"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired profile counters for {len(drifted)} users."))
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_search_index(apps, schema_editor):
+    from catalog.search.index import item_tokens
+
+    MediaItem = apps.get_model('catalog', 'MediaItem')
+    SearchToken = apps.get_model('catalog', 'SearchToken')
+    rows = []
+    for item in MediaItem.objects.filter(is_published=True).iterator():
+        rows.extend(
+            SearchToken(token=token, media_item_id=item.pk, weight=weight)
+            for token, weight in item_tokens(item).items()
+        )
+    SearchToken.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_watchlist_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('media_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='catalog.mediaitem')),
+            ],
+            options={
+                'unique_together': {('token', 'media_item')},
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
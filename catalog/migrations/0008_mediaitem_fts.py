@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_fts(apps, schema_editor):
+    from catalog.search import fts
+
+    fts.ensure_schema(schema_editor.connection)
+
+
+def drop_fts(apps, schema_editor):
+    from catalog.search import fts
+
+    fts.drop_schema(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_search_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
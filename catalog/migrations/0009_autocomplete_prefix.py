@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Avg, Count
+
+
+def build_autocomplete(apps, schema_editor):
+    from catalog.search.autocomplete import item_prefixes, popularity
+
+    MediaItem = apps.get_model('catalog', 'MediaItem')
+    AutocompletePrefix = apps.get_model('catalog', 'AutocompletePrefix')
+    items = MediaItem.objects.filter(is_published=True).annotate(
+        avg_rating=Avg('ratings__score'), rating_count=Count('ratings')
+    )
+    rows = []
+    for item in items.iterator():
+        rank = popularity(item.avg_rating, item.rating_count)
+        rows.extend(
+            AutocompletePrefix(prefix=prefix, media_item_id=item.pk, rank=rank)
+            for prefix in item_prefixes(item.title, item.original_title)
+        )
+    AutocompletePrefix.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_mediaitem_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutocompletePrefix',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=24)),
+                ('rank', models.FloatField(default=0)),
+                ('media_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='autocomplete_prefixes', to='catalog.mediaitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['prefix', '-rank', 'media_item'], name='catalog_aut_prefix_dfc487_idx')],
+                'unique_together': {('prefix', 'media_item')},
+            },
+        ),
+        migrations.RunPython(build_autocomplete, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_trigrams(apps, schema_editor):
+    from catalog.search.fuzzy import item_trigrams
+
+    MediaItem = apps.get_model('catalog', 'MediaItem')
+    TitleTrigram = apps.get_model('catalog', 'TitleTrigram')
+    rows = []
+    for item in MediaItem.objects.filter(is_published=True).iterator():
+        rows.extend(
+            TitleTrigram(trigram=gram, media_item_id=item.pk)
+            for gram in item_trigrams(item.title, item.original_title)
+        )
+    TitleTrigram.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0009_autocomplete_prefix'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TitleTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('media_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='title_trigrams', to='catalog.mediaitem')),
+            ],
+            options={
+                'unique_together': {('trigram', 'media_item')},
+            },
+        ),
+        migrations.RunPython(build_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:13
+
+import catalog.models
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    MediaItem = apps.get_model('catalog', 'MediaItem')
+    Rating = apps.get_model('catalog', 'Rating')
+
+    aggregates = {}
+    rows = Rating.objects.values('media_item_id', 'score').annotate(votes=Count('id')).order_by()
+    for row in rows:
+        item = aggregates.setdefault(row['media_item_id'], {'sum': 0, 'count': 0, 'histogram': [0] * 10})
+        item['sum'] += row['score'] * row['votes']
+        item['count'] += row['votes']
+        item['histogram'][row['score'] - 1] += row['votes']
+
+    items = list(MediaItem.objects.filter(pk__in=aggregates))
+    for item in items:
+        data = aggregates[item.pk]
+        item.rating_sum = data['sum']
+        item.rating_count = data['count']
+        item.rating_histogram = data['histogram']
+        item.avg_rating = data['sum'] / data['count']
+    MediaItem.objects.bulk_update(
+        items, ['rating_sum', 'rating_count', 'rating_histogram', 'avg_rating'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0010_title_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaitem',
+            name='avg_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mediaitem',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='mediaitem',
+            name='rating_histogram',
+            field=models.JSONField(default=catalog.models.empty_histogram),
+        ),
+        migrations.AddField(
+            model_name='mediaitem',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['-avg_rating'], name='catalog_med_avg_rat_e81c68_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0011_mediaitem_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mediaitem',
+            name='catalog_med_created_cfa0c9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mediaitem',
+            name='catalog_med_avg_rat_e81c68_idx',
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['-created_at', '-id'], name='catalog_med_created_d80de4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['title', 'id'], name='catalog_med_title_0fe5c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['-release_year', '-id'], name='catalog_med_release_8a3c70_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['-avg_rating', '-id'], name='catalog_med_avg_rat_648e69_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_mediaitem_content_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['media_item', '-created_at', '-id'], name='catalog_rat_media_i_ad9dfb_idx'),
+        ),
+    ]
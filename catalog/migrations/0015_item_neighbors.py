@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_rating_review_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaitem',
+            name='neighbors_stale',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.CreateModel(
+            name='ItemNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ratings', 'Схожі оцінки')], max_length=10)),
+                ('score', models.FloatField()),
+                ('media_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='catalog.mediaitem')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='catalog.mediaitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['media_item', 'kind', '-score'], name='catalog_ite_media_i_fad4d5_idx'), models.Index(fields=['neighbor', 'kind'], name='catalog_ite_neighbo_101505_idx')],
+                'unique_together': {('media_item', 'kind', 'neighbor')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_item_neighbors'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='itemneighbor',
+            name='kind',
+            field=models.CharField(choices=[('ratings', 'Схожі оцінки'), ('content', 'Схожий зміст')], max_length=10),
+        ),
+    ]
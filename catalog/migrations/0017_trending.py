@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:41
+
+import time
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_epoch(apps, schema_editor):
+    TrendingEpoch = apps.get_model('catalog', 'TrendingEpoch')
+    TrendingEpoch.objects.create(timestamp=time.time())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_item_neighbor_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEpoch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('media_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='catalog.mediaitem')),
+                ('media_type', models.CharField(choices=[('movie', 'Фільм'), ('series', 'Серіал'), ('anime', 'Аніме')], max_length=10)),
+                ('score', models.FloatField(default=0)),
+                ('week_score', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['media_type', '-score'], name='catalog_tre_media_t_718705_idx'), models.Index(fields=['media_type', '-week_score'], name='catalog_tre_media_t_09808a_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('points', models.FloatField(default=0)),
+                ('media_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_buckets', to='catalog.mediaitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='catalog_tre_day_761742_idx')],
+                'unique_together': {('media_item', 'day')},
+            },
+        ),
+        migrations.RunPython(create_epoch, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_charts(apps, schema_editor):
+    MediaItem = apps.get_model('catalog', 'MediaItem')
+    ChartEntry = apps.get_model('catalog', 'ChartEntry')
+    prior_votes = settings.CATALOG_RATING_PRIOR_VOTES
+    prior_mean = settings.CATALOG_RATING_PRIOR_MEAN
+
+    items = list(MediaItem.objects.filter(rating_count__gt=0).only('rating_sum', 'rating_count'))
+    for item in items:
+        item.weighted_rating = (item.rating_sum + prior_votes * prior_mean) / (item.rating_count + prior_votes)
+    MediaItem.objects.bulk_update(items, ['weighted_rating'], batch_size=500)
+
+    through = MediaItem.genres.through
+    rows = through.objects.filter(mediaitem__is_published=True).values_list(
+        'genre_id', 'mediaitem_id', 'mediaitem__media_type', 'mediaitem__weighted_rating',
+    )
+    ChartEntry.objects.bulk_create([
+        ChartEntry(genre_id=genre_id, media_item_id=item_id, media_type=media_type, weighted_rating=weighted)
+        for genre_id, item_id, media_type, weighted in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_trending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_type', models.CharField(choices=[('movie', 'Фільм'), ('series', 'Серіал'), ('anime', 'Аніме')], max_length=10)),
+                ('weighted_rating', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='mediaitem',
+            name='catalog_med_avg_rat_648e69_idx',
+        ),
+        migrations.AddField(
+            model_name='mediaitem',
+            name='weighted_rating',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['-weighted_rating', '-id'], name='catalog_med_weighte_6d4d30_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['media_type', '-weighted_rating', '-id'], name='catalog_med_media_t_5b1a45_idx'),
+        ),
+        migrations.AddField(
+            model_name='chartentry',
+            name='genre',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chart_entries', to='catalog.genre'),
+        ),
+        migrations.AddField(
+            model_name='chartentry',
+            name='media_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chart_entries', to='catalog.mediaitem'),
+        ),
+        migrations.AddIndex(
+            model_name='chartentry',
+            index=models.Index(fields=['genre', '-weighted_rating', '-id'], name='catalog_cha_genre_i_9a3345_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chartentry',
+            index=models.Index(fields=['genre', 'media_type', '-weighted_rating', '-id'], name='catalog_cha_genre_i_20a6b2_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='chartentry',
+            unique_together={('genre', 'media_item')},
+        ),
+        migrations.RunPython(populate_charts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+STATUS_FIELDS = {'planned': 'planned_count', 'watched': 'watched_count', 'favorite': 'favorite_count'}
+TYPE_FIELDS = {'movie': 'movie_count', 'series': 'series_count', 'anime': 'anime_count'}
+
+
+def populate_user_stats(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Watchlist = apps.get_model('catalog', 'Watchlist')
+    Rating = apps.get_model('catalog', 'Rating')
+    UserStats = apps.get_model('catalog', 'UserStats')
+
+    stats = {pk: UserStats(user_id=pk) for pk in User.objects.values_list('pk', flat=True)}
+    watchlist = Watchlist.objects.order_by()
+    for user_id, status, count in watchlist.values_list('user_id', 'status').annotate(count=Count('id')):
+        stats[user_id].watchlist_count += count
+        if status in STATUS_FIELDS:
+            setattr(stats[user_id], STATUS_FIELDS[status], count)
+    for user_id, media_type, count in watchlist.values_list('user_id', 'media_item__media_type').annotate(count=Count('id')):
+        if media_type in TYPE_FIELDS:
+            setattr(stats[user_id], TYPE_FIELDS[media_type], count)
+    totals = Rating.objects.order_by().values_list('user_id').annotate(
+        count=Count('id'), total=Sum('score'), comments=Count('id', filter=~Q(comment='')),
+    )
+    for user_id, count, total, comments in totals:
+        stats[user_id].rating_count = count
+        stats[user_id].rating_sum = total or 0
+        stats[user_id].comment_count = comments
+    UserStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('catalog', '0018_weighted_rating_charts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('watchlist_count', models.PositiveIntegerField(default=0)),
+                ('planned_count', models.PositiveIntegerField(default=0)),
+                ('watched_count', models.PositiveIntegerField(default=0)),
+                ('favorite_count', models.PositiveIntegerField(default=0)),
+                ('movie_count', models.PositiveIntegerField(default=0)),
+                ('series_count', models.PositiveIntegerField(default=0)),
+                ('anime_count', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
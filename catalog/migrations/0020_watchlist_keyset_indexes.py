@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_user_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['user', '-added_at', '-id'], name='catalog_wat_user_id_7a349d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlist',
+            index=models.Index(fields=['user', 'status', '-added_at', '-id'], name='catalog_wat_user_id_b64dbb_idx'),
+        ),
+    ]
@@ -7,6 +7,11 @@ import os
 import uuid
 from django.core.files.storage import default_storage
 
+def empty_histogram():
+    """Vote counts for scores 1..10."""
+    return [0] * 10
+
+
 def avatar_upload_path(instance, filename):
     ext = filename.split('.')[-1]
     new_filename = f'{uuid.uuid4()}.{ext}'
@@ -23,6 +28,27 @@ class Genre(models.Model):
     def __str__(self):
         return self.name
 
+def card_genres():
+    """Prefetch of the genre columns a poster card shows."""
+    return models.Prefetch('genres', queryset=Genre.objects.only('id', 'name', 'slug'))
+
+
+class MediaItemQuerySet(models.QuerySet):
+    # Everything a poster card renders, plus the keyset sort columns.
+    CARD_FIELDS = (
+        'id', 'title', 'media_type', 'release_year', 'duration', 'poster', 'poster_variants',
+        'avg_rating', 'rating_count', 'created_at', 'content_version',
+    )
+
+    def for_cards(self, *extra_fields):
+        """Slim card projection: a fixed number of queries however many cards are shown."""
+        return self.only(*self.CARD_FIELDS, *extra_fields).prefetch_related(card_genres())
+
+    def bump_content_version(self):
+        """Invalidate the cached template fragments of these items."""
+        return self.update(content_version=models.F('content_version') + 1)
+
+
 class MediaItem(models.Model):
     MEDIA_TYPES = [
         ('movie', 'Фільм'),
@@ -38,24 +64,161 @@ class MediaItem(models.Model):
     country = models.CharField(max_length=100)
     duration = models.IntegerField(help_text="Тривалість у хвилинах")
     poster = models.ImageField(upload_to='posters/', blank=True, null=True)
+    # Widths and formats of the resized copies written when the poster changed
+    # (see catalog.posters); empty until they exist.
+    poster_variants = models.JSONField(default=dict, blank=True, editable=False)
     trailer_url = models.URLField(blank=True)
     genres = models.ManyToManyField(Genre)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
+    # Denormalized rating aggregates, maintained by Rating signals (see catalog.ratings).
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_histogram = models.JSONField(default=empty_histogram)
+    avg_rating = models.FloatField(default=0)
+    # Bayesian average pulled towards a prior (see catalog.ratings.weighted_rating);
+    # the ordering column of top charts.
+    weighted_rating = models.FloatField(default=0)
+    # Part of every template fragment cache key for the item; bumped by signals
+    # when the item, its genres, seasons or ratings change (see catalog.signals).
+    content_version = models.PositiveIntegerField(default=0)
+    # Set by every rating change; the next ``build_recommendations --stale`` run
+    # recomputes the item's collaborative neighbours (see catalog.recommendations).
+    neighbors_stale = models.BooleanField(default=True)
+
+    objects = MediaItemQuerySet.as_manager()
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['-created_at']),
+            # Keyset pagination orderings (see views.CATALOG_SORTS).
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['title', 'id']),
+            models.Index(fields=['-release_year', '-id']),
+            models.Index(fields=['-weighted_rating', '-id']),
+            models.Index(fields=['media_type', '-weighted_rating', '-id']),
             models.Index(fields=['media_type']),
         ]
 
+    # Maintained with targeted UPDATEs elsewhere; a plain save() of a possibly
+    # stale instance must not write them back.
+    DENORMALIZED_FIELDS = frozenset({
+        'rating_sum', 'rating_count', 'rating_histogram', 'avg_rating', 'weighted_rating',
+        'content_version', 'neighbors_stale', 'poster_variants',
+    })
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Watchlist type counters on profiles move when the type changes.
+        instance._loaded_media_type = instance.__dict__.get('media_type')
+        # Poster variants are regenerated when the file changes.
+        instance._loaded_poster = instance.__dict__.get('poster')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Deferred fields were not loaded, so they cannot have changed either.
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.DENORMALIZED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     def average_rating(self):
-        return self.ratings.aggregate(models.Avg('score'))['score__avg'] or 0
+        return self.avg_rating
+
+    def season_summary(self):
+        """``{'season_count': ..., 'episode_count': ...}`` in one aggregate query."""
+        summary = self.seasons.aggregate(
+            season_count=models.Count('id'),
+            episode_count=models.Sum('episodes_count'),
+        )
+        summary['episode_count'] = summary['episode_count'] or 0
+        return summary
+
+class ChartEntry(models.Model):
+    """A published item on the top chart of one of its genres (see catalog.charts)."""
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE, related_name='chart_entries')
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='chart_entries')
+    # Copies of the item's columns, so a chart page is one index range scan.
+    media_type = models.CharField(max_length=10, choices=MediaItem.MEDIA_TYPES)
+    weighted_rating = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['genre', 'media_item']
+        indexes = [
+            models.Index(fields=['genre', '-weighted_rating', '-id']),
+            models.Index(fields=['genre', 'media_type', '-weighted_rating', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.genre_id}: {self.media_item_id} ({self.weighted_rating:.2f})"
+
+class ItemNeighbor(models.Model):
+    """Precomputed nearest neighbour of a MediaItem, ranked by ``score`` within a ``kind``."""
+    class Kind(models.TextChoices):
+        RATINGS = 'ratings', 'Схожі оцінки'
+        CONTENT = 'content', 'Схожий зміст'
+
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='neighbor_of')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ['media_item', 'kind', 'neighbor']
+        indexes = [
+            models.Index(fields=['media_item', 'kind', '-score']),
+            models.Index(fields=['neighbor', 'kind']),
+        ]
+
+    def __str__(self):
+        return f"{self.media_item_id} -> {self.neighbor_id} ({self.kind})"
+
+class TrendingEpoch(models.Model):
+    """Reference time (unix seconds) that decayed trending scores are expressed at; a single row."""
+    timestamp = models.FloatField()
+
+
+class TrendingScore(models.Model):
+    """Activity of an item: a time-decayed score and the points of the last seven days (see catalog.trending)."""
+    media_item = models.OneToOneField(MediaItem, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    # Copied from the item so each section is a range scan of one index.
+    media_type = models.CharField(max_length=10, choices=MediaItem.MEDIA_TYPES)
+    score = models.FloatField(default=0)
+    week_score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['media_type', '-score']),
+            models.Index(fields=['media_type', '-week_score']),
+        ]
+
+    def __str__(self):
+        return f"{self.media_item_id}: {self.score:.2f}"
+
+
+class TrendingBucket(models.Model):
+    """Activity points of an item on one day; expired days are subtracted from ``week_score`` on compaction."""
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='trending_buckets')
+    day = models.DateField()
+    points = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['media_item', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+
+    def __str__(self):
+        return f"{self.media_item_id} @ {self.day}: {self.points:g}"
 
 class Season(models.Model):
     media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='seasons')
@@ -68,9 +231,78 @@ class Season(models.Model):
         ordering = ['season_number']
         unique_together = ['media_item', 'season_number']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Episode progress bitmaps are trimmed when a season loses episodes.
+        instance._loaded_episodes_count = instance.__dict__.get('episodes_count')
+        return instance
+
     def __str__(self):
         return f"{self.media_item.title} - Сезон {self.season_number}"
 
+class EpisodeProgress(models.Model):
+    """Watched episodes of one season for one user, as a bitmap (see catalog.progress)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='episode_progress')
+    season = models.ForeignKey(Season, on_delete=models.CASCADE, related_name='progress')
+    # Bit ``n - 1`` (little-endian) is set when episode ``n`` is watched.
+    watched = models.BinaryField(default=b'')
+    watched_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'season']
+
+    def __str__(self):
+        return f"{self.user_id} @ season {self.season_id}: {self.watched_count}"
+
+class SearchToken(models.Model):
+    """Inverted search index row: a normalized token found in a MediaItem."""
+    token = models.CharField(max_length=64)
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='search_tokens')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['token', 'media_item']
+
+    def __str__(self):
+        return f"{self.token} -> {self.media_item_id}"
+
+class AutocompletePrefix(models.Model):
+    """Edge n-gram of a title word-start, used by search suggestions."""
+    prefix = models.CharField(max_length=24)
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='autocomplete_prefixes')
+    rank = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ['prefix', 'media_item']
+        indexes = [
+            models.Index(fields=['prefix', '-rank', 'media_item']),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix} -> {self.media_item_id}"
+
+class TitleTrigram(models.Model):
+    """Trigram of a transliterated, phonetically folded title for fuzzy search."""
+    trigram = models.CharField(max_length=3)
+    media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='title_trigrams')
+
+    class Meta:
+        unique_together = ['trigram', 'media_item']
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.media_item_id}"
+
+class RatingQuerySet(models.QuerySet):
+    def for_reviews(self):
+        """Review list projection: author and avatar come with the rating row."""
+        return self.select_related('user__profile').only(
+            'id', 'score', 'comment', 'created_at', 'media_item_id',
+            'user__id', 'user__username', 'user__profile__id', 'user__profile__avatar',
+        )
+
+
 class Rating(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     media_item = models.ForeignKey(MediaItem, on_delete=models.CASCADE, related_name='ratings')
@@ -80,9 +312,24 @@ class Rating(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = RatingQuerySet.as_manager()
+
     class Meta:
         unique_together = ['user', 'media_item']
         ordering = ['-created_at']
+        indexes = [
+            # Review lists: keyset pagination per item, newest first.
+            models.Index(fields=['media_item', '-created_at', '-id']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what is stored so aggregate updates can apply a delta on save.
+        instance._loaded_score = instance.__dict__.get('score')
+        instance._loaded_media_item_id = instance.__dict__.get('media_item_id')
+        instance._loaded_comment = instance.__dict__.get('comment')
+        return instance
 
 class Watchlist(models.Model):
     class Status(models.TextChoices):
@@ -102,6 +349,19 @@ class Watchlist(models.Model):
     class Meta:
         unique_together = ['user', 'media_item']
         ordering = ['-added_at']
+        indexes = [
+            # Watchlist page: keyset pagination per user, optionally per status.
+            models.Index(fields=['user', '-added_at', '-id']),
+            models.Index(fields=['user', 'status', '-added_at', '-id']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what is stored so profile counters can apply a delta on save.
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_media_item_id = instance.__dict__.get('media_item_id')
+        return instance
 
 
 class Profile(models.Model):
@@ -112,6 +372,45 @@ class Profile(models.Model):
         return f'Profile for {self.user.username}'
 
 
+class UserStats(models.Model):
+    """Profile counters of one user, kept current by ``catalog.user_stats``."""
+    STATUS_FIELDS = {
+        Watchlist.Status.PLANNED: 'planned_count',
+        Watchlist.Status.WATCHED: 'watched_count',
+        Watchlist.Status.FAVORITE: 'favorite_count',
+    }
+    TYPE_FIELDS = {
+        'movie': 'movie_count',
+        'series': 'series_count',
+        'anime': 'anime_count',
+    }
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    watchlist_count = models.PositiveIntegerField(default=0)
+    planned_count = models.PositiveIntegerField(default=0)
+    watched_count = models.PositiveIntegerField(default=0)
+    favorite_count = models.PositiveIntegerField(default=0)
+    movie_count = models.PositiveIntegerField(default=0)
+    series_count = models.PositiveIntegerField(default=0)
+    anime_count = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Stats for user {self.user_id}'
+
+    @property
+    def average_score(self):
+        return self.rating_sum / self.rating_count if self.rating_count else 0
+
+    def status_count(self, status):
+        return getattr(self, self.STATUS_FIELDS[status])
+
+    def type_count(self, media_type):
+        return getattr(self, self.TYPE_FIELDS[media_type])
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
@@ -0,0 +1,134 @@
+"""Full-page cache for anonymous catalog reads.
+
+Anonymous GET/HEAD responses of the decorated views are stored under a key made
+of the view name, the normalized query string and the versions of the page's
+namespaces (see ``catalog.caching``). Listing pages share the ``pages``
+namespace; each media detail page has its own, so a season change purges one
+page instead of the whole site. Cached responses carry an ETag and
+Last-Modified and answer conditional requests with 304 without touching the
+database.
+
+``purge`` also stamps each namespace it bumps with the time of the change, and
+a page's Last-Modified is the latest stamp of its namespaces. Every change that
+invalidates a page therefore moves its validator too, including score edits
+and deletions. Stamps are rounded up to whole seconds as HTTP dates are, so a
+copy rendered in the same second as a later change still looks older.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .caching import VERSION_TIMEOUT, bump_version, get_version
+
+NAMESPACE = 'pages'
+CACHE_TIMEOUT = 60 * 15
+# Query parameters that never change the page.
+IGNORED_PARAMS = frozenset({'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid'})
+
+
+def item_namespace(pk):
+    return f'{NAMESPACE}:media:{pk}'
+
+
+def normalized_query(request):
+    params = sorted(
+        (name, value)
+        for name, values in request.GET.lists() if name not in IGNORED_PARAMS
+        for value in values if value != ''
+    )
+    return urlencode(params)
+
+
+def page_key(view_name, request, namespaces):
+    versions = ':'.join(str(get_version(namespace)) for namespace in namespaces)
+    query = hashlib.md5(normalized_query(request).encode()).hexdigest()
+    return f'catalog:page:{view_name}:{versions}:{query}'
+
+
+def _changed_key(namespace):
+    return f'catalog:changed:{namespace}'
+
+
+def _now():
+    return math.ceil(time.time())
+
+
+def purge(item_ids=(), lists=True):
+    """Drop cached pages: the listing pages and the detail pages of ``item_ids``."""
+    namespaces = [NAMESPACE] if lists else []
+    namespaces += [item_namespace(pk) for pk in set(item_ids) if pk is not None]
+    now = _now()
+    for namespace in namespaces:
+        bump_version(namespace)
+    cache.set_many({_changed_key(namespace): now for namespace in namespaces}, VERSION_TIMEOUT)
+
+
+def last_changed(namespaces):
+    """Unix time of the latest purge of any of ``namespaces``."""
+    stamps = cache.get_many([_changed_key(namespace) for namespace in namespaces])
+    if len(stamps) < len(namespaces):
+        # Lost or never purged: nothing older can be vouched for.
+        now = _now()
+        for namespace in namespaces:
+            if _changed_key(namespace) not in stamps:
+                cache.add(_changed_key(namespace), now, VERSION_TIMEOUT)
+        stamps = cache.get_many([_changed_key(namespace) for namespace in namespaces])
+    return max(stamps.values(), default=None)
+
+
+def _personalized(request):
+    # Pending flash messages are rendered into the page, so they bypass the cache too.
+    return request.user.is_authenticated or len(get_messages(request)) > 0
+
+
+def _finalize(request, entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    if entry['last_modified'] is not None:
+        response['Last-Modified'] = http_date(entry['last_modified'])
+    patch_vary_headers(response, ('Cookie',))
+    patch_cache_control(response, max_age=0, must_revalidate=True)
+    return get_conditional_response(
+        request, etag=entry['etag'], last_modified=entry['last_modified'], response=response,
+    )
+
+
+def anonymous_page_cache(namespaces=None):
+    """Cache anonymous responses of a view.
+
+    ``namespaces(request, *args, **kwargs)`` returns the cache namespaces the page
+    depends on (the listing namespace by default); they also date the page
+    (see ``last_changed``).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or _personalized(request):
+                return view(request, *args, **kwargs)
+
+            scopes = namespaces(request, *args, **kwargs) if namespaces else [NAMESPACE]
+            key = page_key(view.__name__, request, scopes)
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming or response.cookies:
+                    return response
+                modified = last_changed(scopes)
+                entry = {
+                    'content': response.content,
+                    'content_type': response['Content-Type'],
+                    'etag': '"%s"' % hashlib.md5(f'{key}:{modified}'.encode()).hexdigest(),
+                    'last_modified': modified,
+                }
+                cache.set(key, entry, CACHE_TIMEOUT)
+            return _finalize(request, entry)
+        return wrapped
+    return decorator
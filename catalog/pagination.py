@@ -0,0 +1,124 @@
+"""Keyset (cursor) pagination.
+
+Pages are fetched with ``WHERE (sort_key, pk) > cursor ORDER BY sort_key, pk
+LIMIT size + 1``, so the cost of a page depends on its size only, not on how
+deep into the catalog it is. Cursors are signed tokens carrying the sort values
+of the boundary row; clients treat them as opaque.
+"""
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+CURSOR_SALT = 'catalog.pagination.cursor'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _split(ordering):
+    return ordering.lstrip('-'), ordering.startswith('-')
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` by ``ordering``; the last ordering field must be unique (e.g. id)."""
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [_split(order)[0] for order in self.ordering]
+
+    def _model_field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def encode_cursor(self, obj, direction):
+        # value_to_string keeps full precision (e.g. datetime microseconds).
+        values = [self._model_field(field).value_to_string(obj) for field in self.fields]
+        return signing.dumps(
+            {'v': values, 'd': direction, 'o': self.ordering},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def decode_cursor(self, token):
+        try:
+            data = signing.loads(token, salt=CURSOR_SALT)
+            if data.get('o') != self.ordering or data.get('d') not in ('next', 'prev'):
+                raise InvalidCursor("Cursor does not match the current ordering.")
+            values = [
+                self._model_field(field).to_python(value)
+                for field, value in zip(self.fields, data['v'])
+            ]
+        except (signing.BadSignature, ValidationError, TypeError, AttributeError) as exc:
+            raise InvalidCursor(str(exc)) from exc
+        return values, data['d']
+
+    def _after(self, values, reverse=False):
+        """Q selecting rows strictly after ``values`` in the (possibly reversed) ordering."""
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            field, descending = _split(order)
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        # A non-strict bound on the leading column lets the database seek the index.
+        field, descending = _split(self.ordering[0])
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{field}__{lookup}': values[0]}) & condition
+
+    def get_page(self, cursor=None):
+        direction, values = 'next', None
+        if cursor:
+            try:
+                values, direction = self.decode_cursor(cursor)
+            except InvalidCursor:
+                values, direction = None, 'next'
+
+        reverse = direction == 'prev'
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse=reverse))
+        if reverse:
+            ordering = [order[1:] if order.startswith('-') else f'-{order}' for order in self.ordering]
+        else:
+            ordering = self.ordering
+
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+        )
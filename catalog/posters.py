@@ -0,0 +1,113 @@
+"""Resized poster variants.
+
+Uploads in ``posters/`` are full-size originals of up to several MB, while
+pages show them at 56-400 CSS pixels. When an item's poster changes,
+``generate`` writes it once at every width in ``RENDITIONS`` (never upscaled),
+in WebP and, when Pillow can encode it, AVIF. The files are named
+``posters/variants/<original name>-<width>w.<format>``, and the widths and
+formats that were written go in ``MediaItem.poster_variants``.
+``sources`` turns that into ``srcset`` strings per rendition (see the
+``poster_picture`` template tag), so the page needs no filesystem lookup.
+
+An item without variants (the image could not be read, or it was uploaded
+before this pipeline existed; see ``build_poster_variants``) keeps serving the
+original.
+"""
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import MediaItem
+
+logger = logging.getLogger(__name__)
+
+# Rendition -> (widths for srcset, ``sizes`` attribute).
+RENDITIONS = {
+    'thumb': ((56, 112, 224), '56px'),
+    'card': ((320, 480, 640), '(min-width: 992px) 330px, (min-width: 768px) 33vw, (min-width: 576px) 50vw, 100vw'),
+    'detail': ((480, 800), '(min-width: 992px) 400px, 100vw'),
+}
+WIDTHS = tuple(sorted({width for widths, _ in RENDITIONS.values() for width in widths}))
+VARIANTS_DIR = 'posters/variants'
+
+Image.init()
+# Best first: browsers take the first <source> whose type they support.
+FORMATS = tuple(fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE)
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+SAVE_OPTIONS = {'avif': {'quality': 55, 'speed': 8}, 'webp': {'quality': 80, 'method': 4}}
+
+
+def variant_name(poster_name, width, fmt):
+    return f'{VARIANTS_DIR}/{posixpath.basename(poster_name)}-{width}w.{fmt}'
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def generate(poster):
+    """Write the variants of the ``poster`` field file; returns the ``poster_variants`` value."""
+    try:
+        with poster.open('rb') as source:
+            image = Image.open(source)
+            # JPEGs decode straight at a reduced scale no smaller than the largest variant.
+            image.draft('RGB', (WIDTHS[-1], WIDTHS[-1] * image.height // image.width))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning("Cannot read poster %s; serving the original only.", poster.name, exc_info=True)
+        return {}
+
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    widths = sorted({min(width, image.width) for width in WIDTHS})
+    storage = poster.storage
+    resized = image
+    # Largest first, each one resampled from the previous rather than from the original.
+    for width in reversed(widths):
+        height = max(round(image.height * width / image.width), 1)
+        if width != resized.width:
+            resized = resized.resize((width, height), Image.LANCZOS)
+        for fmt in FORMATS:
+            name = variant_name(poster.name, width, fmt)
+            # Names are derived, not stored: replace instead of getting a suffixed copy.
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(_encode(resized, fmt)))
+    return {'widths': widths, 'formats': list(FORMATS)} if FORMATS else {}
+
+
+def delete(poster_name, variants):
+    """Remove the variant files of a replaced or deleted poster."""
+    storage = MediaItem._meta.get_field('poster').storage
+    for width in (variants or {}).get('widths', ()):
+        for fmt in variants.get('formats', ()):
+            storage.delete(variant_name(poster_name, width, fmt))
+
+
+def sources(item, rendition):
+    """``[{'type', 'srcset'}]`` of ``item``'s poster for ``rendition``, best format first."""
+    variants = item.poster_variants or {}
+    generated = variants.get('widths')
+    if not item.poster or not generated:
+        return []
+    storage = item.poster.storage
+    # Widths were capped at the original's, which is the largest one written.
+    widths = sorted({min(width, generated[-1]) for width in RENDITIONS[rendition][0]})
+    return [
+        {
+            'type': CONTENT_TYPES[fmt],
+            'srcset': ', '.join(
+                f'{storage.url(variant_name(item.poster.name, width, fmt))} {width}w' for width in widths
+            ),
+        }
+        for fmt in variants.get('formats', ()) if fmt in CONTENT_TYPES
+    ]
+
+
+def sizes(rendition):
+    return RENDITIONS[rendition][1]
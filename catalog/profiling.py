@@ -0,0 +1,129 @@
+"""Per-view SQL query budgets.
+
+``QueryStats`` records every query a block of code runs (count, total SQL time
+and repeated query shapes). ``QueryBudgetMiddleware`` wraps each request in it,
+reports the numbers in an ``X-Query-Stats`` header and logs a warning when a
+view exceeds its entry in ``QUERY_BUDGETS``. The catalog tests hold every URL
+name to the same budgets on a synthetic catalog.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Maximum SQL queries per request, keyed by URL name. The numbers hold for any
+# catalog size: listing pages must not grow with the number of items shown.
+QUERY_BUDGETS = {
+    'home': 12,
+    'media_list': 8,
+    'media_detail': 12,
+    'media_reviews': 6,
+    'rate_media': 12,
+    'toggle_watchlist': 6,
+    'update_progress': 8,
+    'update_rating': 8,
+    'delete_rating': 13,
+    'profile': 10,
+    'user_watchlist': 8,
+    'bulk_watchlist': 21,
+    'user_comments': 6,
+    'user_item_states': 4,
+    'export_history': 2,
+    'import_history': 20,
+    'search': 9,
+    'search_suggestions': 4,
+    'register': 2,
+    'login': 2,
+    'logout': 4,
+}
+
+
+class QueryStats:
+    """Context manager collecting the queries run on all database connections."""
+
+    def __init__(self, using=None):
+        self.aliases = [using] if using else list(connections)
+        self.queries = []
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in self.aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._record))
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self._started
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def sql_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """Query shapes (SQL with placeholders) that ran more than once, with their counts."""
+        shapes = Counter(sql for sql, _ in self.queries)
+        return {sql: n for sql, n in shapes.items() if n > 1}
+
+    def summary(self):
+        return (
+            f'queries={self.count}; sql={self.sql_time * 1000:.1f}ms; '
+            f'duplicates={sum(self.duplicates.values())}; '
+            f'total={self.elapsed * 1000:.1f}ms'
+        )
+
+
+def budget_for(url_name):
+    return QUERY_BUDGETS.get(url_name)
+
+
+class QueryBudgetMiddleware:
+    """Measure each request and flag views that exceed their query budget.
+
+    Active when ``CATALOG_QUERY_PROFILING`` is set (defaults to ``DEBUG``).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'CATALOG_QUERY_PROFILING', settings.DEBUG)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        with QueryStats() as stats:
+            response = self.get_response(request)
+            # Render lazy responses inside the measured block.
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+
+        response['X-Query-Stats'] = stats.summary()
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = budget_for(url_name)
+        if budget is not None and stats.count > budget:
+            logger.warning(
+                'Query budget exceeded for %s (%s): %s, budget=%d',
+                url_name, request.get_full_path(), stats.summary(), budget,
+            )
+        else:
+            logger.debug('%s %s: %s', request.method, request.get_full_path(), stats.summary())
+        return response
@@ -0,0 +1,116 @@
+"""Per-user episode progress.
+
+One ``EpisodeProgress`` row per (user, season) holds the watched episodes as a
+little-endian bitmap (a 1000-episode season takes 125 bytes) next to its
+population count. Marking a range is one read-modify-write of that row, and
+progress figures only read ``watched_count``, never the bitmaps, so they cost
+one aggregate query per page however long the seasons are.
+"""
+from django.db import transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .bitmaps import ids_condition
+from .models import EpisodeProgress, Season
+
+
+def _to_int(blob):
+    return int.from_bytes(bytes(blob or b''), 'little')
+
+
+def _to_bytes(bits, episodes_count):
+    return bits.to_bytes((episodes_count + 7) // 8, 'little')
+
+
+def _range_mask(first, last):
+    return ((1 << (last - first + 1)) - 1) << (first - 1)
+
+
+def mark(user, season, first=1, last=None, watched=True):
+    """Mark episodes ``first..last`` of ``season`` (all by default) as watched or not.
+
+    The range is clamped to the season. Returns the new watched count.
+    """
+    count = season.episodes_count
+    first = max(int(first), 1)
+    last = count if last is None else min(int(last), count)
+    with transaction.atomic():
+        progress = EpisodeProgress.objects.select_for_update().filter(user=user, season=season).first()
+        bits = _to_int(progress.watched) if progress else 0
+        if first <= last:
+            mask = _range_mask(first, last)
+            bits = bits | mask if watched else bits & ~mask
+        bits &= _range_mask(1, count) if count > 0 else 0
+        watched_count = bits.bit_count()
+
+        if not watched_count:
+            if progress:
+                progress.delete()
+            return 0
+        if progress is None:
+            progress = EpisodeProgress(user=user, season=season)
+        progress.watched = _to_bytes(bits, count)
+        progress.watched_count = watched_count
+        progress.save()
+    return watched_count
+
+
+def mark_all(user, season, watched=True):
+    return mark(user, season, watched=watched)
+
+
+def season_resized(season):
+    """Drop bits past the end of a season that lost episodes."""
+    limit = _range_mask(1, season.episodes_count) if season.episodes_count > 0 else 0
+    trimmed, emptied = [], []
+    for progress in EpisodeProgress.objects.filter(season=season).only('watched').iterator(chunk_size=500):
+        bits = _to_int(progress.watched)
+        if not bits & ~limit:
+            continue
+        bits &= limit
+        if bits:
+            progress.watched = _to_bytes(bits, season.episodes_count)
+            progress.watched_count = bits.bit_count()
+            trimmed.append(progress)
+        else:
+            emptied.append(progress.pk)
+    # Written after the scan: SQLite does not isolate a cursor from writes to its table.
+    with transaction.atomic():
+        EpisodeProgress.objects.bulk_update(trimmed, ['watched', 'watched_count'], batch_size=500)
+        EpisodeProgress.objects.filter(pk__in=ids_condition(emptied)).delete()
+
+
+def _watched(user):
+    return Subquery(
+        EpisodeProgress.objects.filter(user=user, season=OuterRef('pk')).values('watched_count')[:1],
+        output_field=IntegerField(),
+    )
+
+
+def percent(watched, total):
+    return round(100 * min(watched, total) / total) if total else None
+
+
+def seasons_with_progress(user, media):
+    """Seasons of ``media`` annotated with the user's ``watched`` count, in one query."""
+    return list(
+        Season.objects.filter(media_item=media)
+        .annotate(watched=Coalesce(_watched(user), 0))
+        .order_by('season_number')
+    )
+
+
+def item_progress(user, item_ids):
+    """``{item_id: percent}`` of watched episodes for items that have episodes, in one query."""
+    if not item_ids or not user.is_authenticated:
+        return {}
+    rows = (
+        Season.objects.filter(media_item_id__in=ids_condition(list(item_ids)))
+        .values('media_item_id')
+        .annotate(total=Sum('episodes_count'), watched=Sum(Coalesce(_watched(user), 0)))
+        .order_by()
+    )
+    return {
+        row['media_item_id']: percent(row['watched'], row['total'])
+        for row in rows if row['total']
+    }
@@ -0,0 +1,138 @@
+"""Maintenance of the denormalized rating aggregates stored on MediaItem.
+
+``rating_sum``, ``rating_count``, ``avg_rating``, ``weighted_rating`` and the
+1..10 ``rating_histogram`` are shifted by a delta on every Rating save/delete,
+so reading them never needs an aggregate query. ``recompute`` rebuilds them
+from the Rating table for bulk writes, drift repair and prior changes.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+
+from .models import ChartEntry, MediaItem, Rating, empty_histogram
+
+
+def _normalized_histogram(histogram):
+    values = list(histogram or [])
+    return (values + empty_histogram())[:10]
+
+
+def _average(rating_sum, rating_count):
+    return rating_sum / rating_count if rating_count else 0
+
+
+def weighted_rating(rating_sum, rating_count):
+    """Bayesian average: the item's votes plus ``CATALOG_RATING_PRIOR_VOTES`` votes of the prior mean.
+
+    A single 10/10 vote barely moves an item off the prior, while hundreds of
+    votes outweigh it, so top charts favour titles that are both good and
+    widely rated. Unrated items score 0 and stay below every rated one.
+    """
+    if not rating_count:
+        return 0
+    prior_votes = settings.CATALOG_RATING_PRIOR_VOTES
+    prior_mean = settings.CATALOG_RATING_PRIOR_MEAN
+    return (rating_sum + prior_votes * prior_mean) / (rating_count + prior_votes)
+
+
+def apply_change(item_id, old_score=None, new_score=None):
+    """Shift the aggregates of ``item_id`` by removing ``old_score`` and adding ``new_score``."""
+    old_score = int(old_score) if old_score is not None else None
+    new_score = int(new_score) if new_score is not None else None
+    for score in (old_score, new_score):
+        if score is not None and not 1 <= score <= 10:
+            raise ValueError(f'Rating score out of range: {score}')
+    if old_score == new_score:
+        return
+
+    delta_sum = (new_score or 0) - (old_score or 0)
+    delta_count = (new_score is not None) - (old_score is not None)
+
+    with transaction.atomic():
+        # The counter UPDATE takes the write lock first, so the histogram
+        # read-modify-write below cannot interleave with another change.
+        updated = MediaItem.objects.filter(pk=item_id).update(
+            rating_sum=F('rating_sum') + delta_sum,
+            rating_count=F('rating_count') + delta_count,
+            neighbors_stale=True,
+        )
+        if not updated:
+            return
+        item = MediaItem.objects.only('rating_sum', 'rating_count', 'rating_histogram').get(pk=item_id)
+        histogram = _normalized_histogram(item.rating_histogram)
+        if old_score is not None:
+            histogram[old_score - 1] = max(histogram[old_score - 1] - 1, 0)
+        if new_score is not None:
+            histogram[new_score - 1] += 1
+        weighted = weighted_rating(item.rating_sum, item.rating_count)
+        MediaItem.objects.filter(pk=item_id).update(
+            rating_histogram=histogram,
+            avg_rating=_average(item.rating_sum, item.rating_count),
+            weighted_rating=weighted,
+            content_version=F('content_version') + 1,
+        )
+        # The item's rows on genre charts carry a copy of the ordering column.
+        ChartEntry.objects.filter(media_item_id=item_id).update(weighted_rating=weighted)
+
+
+def expected_aggregates(item_ids=None):
+    """Compute aggregates from the Rating table: ``{item_id: (sum, count, histogram)}``."""
+    ratings = Rating.objects.all()
+    if item_ids is not None:
+        ratings = ratings.filter(media_item_id__in=item_ids)
+
+    aggregates = {}
+    rows = ratings.values('media_item_id', 'score').annotate(votes=Count('id')).order_by()
+    for row in rows:
+        rating_sum, rating_count, histogram = aggregates.get(row['media_item_id'], (0, 0, empty_histogram()))
+        histogram[row['score'] - 1] += row['votes']
+        aggregates[row['media_item_id']] = (
+            rating_sum + row['score'] * row['votes'],
+            rating_count + row['votes'],
+            histogram,
+        )
+    return aggregates
+
+
+def recompute(item_ids=None, dry_run=False, batch_size=500):
+    """Rebuild aggregates from ratings. Returns the ids of items whose stored values drifted."""
+    expected = expected_aggregates(item_ids)
+    items = MediaItem.objects.only('rating_sum', 'rating_count', 'rating_histogram', 'avg_rating', 'weighted_rating')
+    if item_ids is not None:
+        items = items.filter(pk__in=item_ids)
+
+    drifted = []
+    pending = []
+    fields = ['rating_sum', 'rating_count', 'rating_histogram', 'avg_rating', 'weighted_rating']
+    for item in items.iterator(chunk_size=batch_size):
+        rating_sum, rating_count, histogram = expected.get(item.pk, (0, 0, empty_histogram()))
+        average = _average(rating_sum, rating_count)
+        weighted = weighted_rating(rating_sum, rating_count)
+        if (
+            item.rating_sum == rating_sum
+            and item.rating_count == rating_count
+            and _normalized_histogram(item.rating_histogram) == histogram
+            and abs(item.avg_rating - average) < 1e-9
+            and abs(item.weighted_rating - weighted) < 1e-9
+        ):
+            continue
+        drifted.append(item.pk)
+        item.rating_sum, item.rating_count = rating_sum, rating_count
+        item.rating_histogram, item.avg_rating = histogram, average
+        item.weighted_rating = weighted
+        pending.append(item)
+        if not dry_run and len(pending) >= batch_size:
+            MediaItem.objects.bulk_update(pending, fields)
+            pending = []
+
+    if not dry_run and pending:
+        MediaItem.objects.bulk_update(pending, fields)
+    if not dry_run and drifted:
+        MediaItem.objects.filter(pk__in=drifted).update(
+            content_version=F('content_version') + 1,
+            neighbors_stale=True,
+        )
+        ChartEntry.objects.filter(media_item_id__in=drifted).update(
+            weighted_rating=Subquery(MediaItem.objects.filter(pk=OuterRef('media_item_id')).values('weighted_rating')[:1]),
+        )
+    return drifted
@@ -0,0 +1,3 @@
+from .neighbors import recommended_for, similar_items
+
+__all__ = ['recommended_for', 'similar_items']
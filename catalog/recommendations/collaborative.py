@@ -0,0 +1,92 @@
+"""Item-item collaborative filtering over the Rating table.
+
+Ratings of published items form a sparse user×item matrix. Each user's scores
+are centred on their own mean, so two items are similar when the same people
+rate both above (or below) their usual level. The similarity of two items is
+the cosine of their rating columns, damped by ``SHRINKAGE`` when only a few
+users rated both. For every item the ``TOP_K`` best positive neighbours are
+stored as ``ItemNeighbor`` rows of kind ``ratings``.
+
+The builders need NumPy and SciPy and are imported by the management command
+and the admin only, never by views.
+"""
+import numpy as np
+from scipy import sparse
+
+from ..bitmaps import ids_condition
+from ..models import ItemNeighbor, MediaItem, Rating
+from .matrix import TOP_K, NeighborMatrix, dependent_items, store
+
+KIND = ItemNeighbor.Kind.RATINGS
+# Pseudo-count of co-raters: a pair rated by n users keeps n / (n + SHRINKAGE)
+# of its cosine, so a coincidence of two raters cannot top the list.
+SHRINKAGE = 5
+
+
+class RatingMatrix(NeighborMatrix):
+    """Item-major view of the ratings: rows are items, columns are users."""
+
+    def __init__(self, item_ids, centred, binary):
+        super().__init__(item_ids)
+        self.centred = centred
+        self.binary = binary
+        norms = np.sqrt(np.asarray(centred.multiply(centred).sum(axis=1)).ravel())
+        self.inverse_norms = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+    @classmethod
+    def load(cls):
+        rows = np.array(
+            list(
+                Rating.objects.filter(media_item__is_published=True)
+                .values_list('media_item_id', 'user_id', 'score')
+                .order_by()
+                .iterator(chunk_size=10000)
+            ),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        item_ids, item_index = np.unique(rows[:, 0], return_inverse=True)
+        user_ids, user_index = np.unique(rows[:, 1], return_inverse=True)
+        scores = rows[:, 2].astype(np.float64)
+        user_means = np.bincount(user_index, weights=scores) / np.maximum(np.bincount(user_index), 1)
+
+        shape = (len(item_ids), len(user_ids))
+        centred = sparse.csr_matrix((scores - user_means[user_index], (item_index, user_index)), shape=shape)
+        binary = sparse.csr_matrix((np.ones_like(scores), (item_index, user_index)), shape=shape)
+        return cls(item_ids, centred, binary)
+
+    def similarities(self, positions):
+        """Sparse ``len(positions) × items`` matrix of shrunk cosine similarities."""
+        dot = self.centred[positions] @ self.centred.T
+        overlap = self.binary[positions] @ self.binary.T
+        overlap.data = overlap.data / (overlap.data + SHRINKAGE)
+        cosine = sparse.diags(self.inverse_norms[positions]) @ dot @ sparse.diags(self.inverse_norms)
+        return cosine.multiply(overlap)
+
+
+def refresh(item_ids=None, top_k=TOP_K):
+    """Recompute neighbour lists of ``item_ids`` (all items when ``None``).
+
+    An incremental run also refreshes the items currently pointing at one of
+    ``item_ids``, since their similarity to them changed; other lists pick up a
+    newly close item on their own next refresh. Returns the ids of the items
+    whose lists were rewritten.
+    """
+    if item_ids is None:
+        MediaItem.objects.filter(neighbors_stale=True).update(neighbors_stale=False)
+    matrix = RatingMatrix.load()
+    if item_ids is None:
+        neighbors = matrix.top_neighbors(matrix.positions_of(matrix.positions), top_k)
+        return store(KIND, neighbors)
+    targets = set(item_ids) | dependent_items(KIND, item_ids)
+    neighbors = matrix.top_neighbors(matrix.positions_of(targets), top_k)
+    return store(KIND, neighbors, targets)
+
+
+def refresh_stale(top_k=TOP_K):
+    """Refresh the items whose ratings changed since their last refresh."""
+    stale = list(MediaItem.objects.filter(neighbors_stale=True).values_list('pk', flat=True))
+    if not stale:
+        return set()
+    # Clear the flags before reading ratings: a rating saved meanwhile sets them again.
+    MediaItem.objects.filter(pk__in=ids_condition(stale)).update(neighbors_stale=False)
+    return refresh(stale, top_k)
@@ -0,0 +1,267 @@
+"""Content-based "similar titles", for items with few or no ratings.
+
+Each published item becomes one sparse row made of four blocks:
+
+* TF-IDF over its ``SearchToken`` rows (title, original title and description
+  words, already weighted by field), with sublinear term frequency;
+* one-hot genres;
+* one-hot media type;
+* release-year proximity: the item's ``YEAR_BIN``-year bin plus half weight on
+  the two adjacent bins, so close years overlap and distant years do not.
+
+Every block is L2-normalized and scaled by the square root of its share in
+``BLOCK_WEIGHTS``, so the dot product of two rows is the weighted sum of the
+per-block cosines. Lists are stored as ``ItemNeighbor`` rows of kind
+``content``; ``item_changed`` keeps them current when an item is saved in the
+admin, and ``build_recommendations`` rebuilds them all.
+
+Loading the matrix reads every token and genre link of the catalog, so each
+process keeps the last one it loaded. ``item_changed`` rebuilds only the saved
+item's row against that copy's vocabulary and document frequencies; a full
+``refresh`` reloads them and, through the ``content_vectors`` version, makes the
+other processes reload too.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+from scipy import sparse
+
+from django.db.models import Count, Min
+
+from ..bitmaps import ids_condition
+from ..caching import bump_version, get_version
+from ..models import ItemNeighbor, MediaItem, SearchToken
+from .matrix import TOP_K, NeighborMatrix, dependent_items, store
+
+KIND = ItemNeighbor.Kind.CONTENT
+BLOCK_WEIGHTS = {'text': 0.5, 'genres': 0.3, 'type': 0.1, 'year': 0.1}
+YEAR_BIN = 5
+NAMESPACE = 'content_vectors'
+TYPE_COLUMNS = {code: column for column, (code, _) in enumerate(MediaItem.MEDIA_TYPES)}
+
+
+def _block(rows, columns, values, shape, weight):
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.float64), (np.asarray(rows, dtype=np.int64), np.asarray(columns, dtype=np.int64))),
+        shape=shape,
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    scale = np.divide(np.sqrt(weight), norms, out=np.zeros_like(norms), where=norms > 0)
+    return sparse.diags(scale) @ matrix
+
+
+def _row_block(entries, weight):
+    """``(columns, values)`` of one normalized block of a single row.
+
+    ``entries`` are ``(column, value)`` pairs; a ``None`` column (a token, genre
+    or year unknown to the loaded matrix) matches no other row but still counts
+    towards the norm, as it would after a full load.
+    """
+    norm = np.sqrt(sum(value * value for _, value in entries))
+    scale = np.sqrt(weight) / norm if norm > 0 else 0
+    known = [(column, value * scale) for column, value in entries if column is not None]
+    return [column for column, _ in known], [value for _, value in known]
+
+
+@dataclass
+class Columns:
+    """How item attributes map to matrix columns, as of the last full load."""
+    vocabulary: dict
+    idf: np.ndarray
+    genres: dict
+    year_offset: int
+    year_count: int
+    item_count: int
+
+    @property
+    def starts(self):
+        text = 0
+        genres = text + len(self.vocabulary)
+        types = genres + len(self.genres)
+        years = types + len(TYPE_COLUMNS)
+        return {'text': text, 'genres': genres, 'type': types, 'year': years, 'end': years + self.year_count}
+
+
+class ContentMatrix(NeighborMatrix):
+    """Rows are published items, columns are tokens, genres, types and year bins."""
+
+    # Type and genre blocks make rows overlap with much of the catalog, so the
+    # per-batch product is nearly dense; keep batches small.
+    batch_size = 64
+
+    def __init__(self, item_ids, vectors, columns=None, version=None):
+        super().__init__(item_ids)
+        self.vectors = vectors.tocsr()
+        self.columns = columns
+        self.version = version
+
+    @classmethod
+    def load(cls):
+        items = list(
+            MediaItem.objects.filter(is_published=True).order_by('pk')
+            .values_list('pk', 'media_type', 'release_year')
+        )
+        positions = {row[0]: position for position, row in enumerate(items)}
+        count = len(items)
+
+        vocabulary, rows, columns, weights = {}, [], [], []
+        tokens = SearchToken.objects.filter(media_item__is_published=True).values_list('media_item_id', 'token', 'weight')
+        for item_id, token, weight in tokens.order_by().iterator(chunk_size=10000):
+            if item_id in positions:
+                rows.append(positions[item_id])
+                columns.append(vocabulary.setdefault(token, len(vocabulary)))
+                weights.append(weight)
+        document_frequency = np.bincount(np.asarray(columns, dtype=np.int64), minlength=len(vocabulary))
+        idf = np.log((1 + count) / (1 + document_frequency)) + 1
+        tf_idf = (1 + np.log(np.asarray(weights, dtype=np.float64))) * idf[np.asarray(columns, dtype=np.int64)]
+        text = _block(rows, columns, tf_idf, (count, len(vocabulary)), BLOCK_WEIGHTS['text'])
+
+        genre_columns, rows, columns = {}, [], []
+        links = MediaItem.genres.through.objects.filter(mediaitem__is_published=True).values_list('mediaitem_id', 'genre_id')
+        for item_id, genre_id in links.order_by().iterator():
+            if item_id in positions:
+                rows.append(positions[item_id])
+                columns.append(genre_columns.setdefault(genre_id, len(genre_columns)))
+        genres = _block(rows, columns, np.ones(len(rows)), (count, len(genre_columns)), BLOCK_WEIGHTS['genres'])
+
+        types = _block(
+            range(count), [TYPE_COLUMNS[row[1]] for row in items], np.ones(count),
+            (count, len(TYPE_COLUMNS)), BLOCK_WEIGHTS['type'],
+        )
+
+        bins = np.array([row[2] // YEAR_BIN for row in items], dtype=np.int64)
+        offset = bins.min() - 1 if count else 0
+        rows = np.repeat(np.arange(count), 3)
+        columns = (bins[:, None] - offset + np.array([-1, 0, 1])).ravel()
+        values = np.tile([0.5, 1.0, 0.5], count)
+        years = _block(rows, columns, values, (count, int(columns.max(initial=0)) + 1), BLOCK_WEIGHTS['year'])
+
+        vectors = sparse.hstack([text, genres, types, years], format='csr')
+        columns = Columns(vocabulary, idf, genre_columns, int(offset), years.shape[1], count)
+        return cls(np.array([row[0] for row in items], dtype=np.int64), vectors, columns)
+
+    def item_row(self, item_id):
+        """The ``1 × columns`` row of ``item_id`` built from its current data; empty if unpublished."""
+        starts = self.columns.starts
+        shape = (1, starts['end'])
+        item = MediaItem.objects.filter(pk=item_id, is_published=True).values_list('media_type', 'release_year').first()
+        if item is None:
+            return sparse.csr_matrix(shape)
+        media_type, release_year = item
+
+        vocabulary, idf = self.columns.vocabulary, self.columns.idf
+        # A token only this item has: document frequency 1.
+        unseen_idf = np.log((1 + self.columns.item_count) / 2) + 1
+        text = [
+            (vocabulary.get(token), (1 + np.log(weight)) * (idf[vocabulary[token]] if token in vocabulary else unseen_idf))
+            for token, weight in SearchToken.objects.filter(media_item_id=item_id).values_list('token', 'weight')
+        ]
+        genre_ids = MediaItem.genres.through.objects.filter(mediaitem_id=item_id).values_list('genre_id', flat=True)
+        genres = [(self.columns.genres.get(genre_id), 1.0) for genre_id in genre_ids]
+        year_bin = release_year // YEAR_BIN - self.columns.year_offset
+        years = [
+            (column if 0 <= column < self.columns.year_count else None, value)
+            for column, value in zip((year_bin - 1, year_bin, year_bin + 1), (0.5, 1.0, 0.5))
+        ]
+
+        columns, values = [], []
+        for block, entries in (('text', text), ('genres', genres), ('type', [(TYPE_COLUMNS.get(media_type), 1.0)]), ('year', years)):
+            block_columns, block_values = _row_block(entries, BLOCK_WEIGHTS[block])
+            columns.extend(starts[block] + column for column in block_columns)
+            values.extend(block_values)
+        return sparse.csr_matrix((values, ([0] * len(columns), columns)), shape=shape)
+
+    def with_item(self, item_id):
+        """A copy with the row of ``item_id`` rebuilt (appended for a new item)."""
+        row = self.item_row(item_id)
+        position = self.positions.get(item_id)
+        if position is not None:
+            vectors = sparse.vstack([self.vectors[:position], row, self.vectors[position + 1:]], format='csr')
+            item_ids = self.item_ids
+        elif row.nnz:
+            vectors = sparse.vstack([self.vectors, row], format='csr')
+            item_ids = np.append(self.item_ids, item_id)
+        else:
+            return self
+        return ContentMatrix(item_ids, vectors, self.columns, self.version)
+
+    def similarities(self, positions):
+        return self.vectors[positions] @ self.vectors.T
+
+
+_lock = threading.Lock()
+_matrix = None
+
+
+def _load():
+    global _matrix
+    matrix = ContentMatrix.load()
+    matrix.version = bump_version(NAMESPACE)
+    _matrix = matrix
+    return matrix
+
+
+def _patched(item_id):
+    """This process's matrix with ``item_id``'s row rebuilt; loaded in full if missing or outdated."""
+    global _matrix
+    with _lock:
+        current = get_version(NAMESPACE)
+        if _matrix is not None and _matrix.version == current:
+            matrix = _matrix.with_item(item_id)
+        else:
+            matrix = ContentMatrix.load()
+        version = bump_version(NAMESPACE)
+        # Another process may have changed an item in between; reload next time then.
+        matrix.version = version if version == current + 1 else None
+        _matrix = matrix
+        return matrix
+
+
+def refresh(item_ids=None, top_k=TOP_K):
+    """Recompute lists of ``item_ids`` and of the items listing them (all when ``None``)."""
+    with _lock:
+        matrix = _load()
+    if item_ids is None:
+        return store(KIND, matrix.top_neighbors(matrix.positions_of(matrix.positions), top_k))
+    targets = set(item_ids) | dependent_items(KIND, item_ids)
+    return store(KIND, matrix.top_neighbors(matrix.positions_of(targets), top_k), targets)
+
+
+def item_changed(item_id, top_k=TOP_K):
+    """Update the lists touched by a saved item.
+
+    Besides its own list and those that already include it, every item that
+    the saved one now beats (a short list, or a weakest neighbour scoring below
+    the new similarity) gets its list recomputed. Returns the refreshed ids.
+    """
+    matrix = _patched(item_id)
+    targets = {item_id} | dependent_items(KIND, [item_id])
+    position = matrix.positions.get(item_id)
+    if position is not None:
+        row = matrix.similarities([position]).tocsr()
+        scores = {
+            int(matrix.item_ids[column]): value
+            for column, value in zip(row.indices, row.data)
+            if value > 0 and column != position
+        }
+        lists = (
+            ItemNeighbor.objects.filter(kind=KIND, media_item_id__in=ids_condition(list(scores)))
+            .values('media_item_id')
+            .annotate(floor=Min('score'), size=Count('id'))
+            .order_by()
+        )
+        current = {entry['media_item_id']: (entry['floor'], entry['size']) for entry in lists}
+        for pk, score in scores.items():
+            floor, size = current.get(pk, (0, 0))
+            if size < top_k or score > floor:
+                targets.add(pk)
+    neighbors = matrix.top_neighbors(matrix.positions_of(targets), top_k)
+    # Rows of items deleted or unpublished elsewhere since the load may linger.
+    candidates = {neighbor_id for pairs in neighbors.values() for neighbor_id, _ in pairs} | set(neighbors)
+    live = set(MediaItem.objects.filter(pk__in=ids_condition(list(candidates)), is_published=True).values_list('pk', flat=True))
+    neighbors = {
+        pk: [(neighbor_id, score) for neighbor_id, score in pairs if neighbor_id in live]
+        for pk, pairs in neighbors.items() if pk in live
+    }
+    return store(KIND, neighbors, targets)
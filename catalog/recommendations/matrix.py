@@ -0,0 +1,85 @@
+"""Shared top-K search and storage for the neighbour builders.
+
+A builder turns the catalog into a sparse matrix with one row per item and
+implements ``similarities(positions)``; ``NeighborMatrix.top_neighbors`` then
+walks the requested rows in batches of ``batch_size``, so memory stays bounded
+by the batch, not the catalog. ``store`` swaps the lists of one kind in a
+single transaction and purges the detail pages that show them.
+"""
+import numpy as np
+
+from django.db import transaction
+
+from .. import pagecache
+from ..bitmaps import ids_condition
+from ..models import ItemNeighbor
+
+TOP_K = 20
+BATCH_SIZE = 256
+
+
+class NeighborMatrix:
+    batch_size = BATCH_SIZE
+
+    def __init__(self, item_ids):
+        self.item_ids = item_ids
+        self.positions = {pk: position for position, pk in enumerate(item_ids.tolist())}
+
+    def similarities(self, positions):
+        """Sparse ``len(positions) × items`` matrix of similarity scores."""
+        raise NotImplementedError
+
+    def positions_of(self, item_ids):
+        return sorted(self.positions[pk] for pk in item_ids if pk in self.positions)
+
+    def top_neighbors(self, positions, top_k=TOP_K):
+        """``{item_id: [(neighbor_id, score), ...]}`` for the items at ``positions``."""
+        result = {}
+        for start in range(0, len(positions), self.batch_size):
+            batch = positions[start:start + self.batch_size]
+            scores = self.similarities(batch).tocsr()
+            for row, position in enumerate(batch):
+                begin, end = scores.indptr[row], scores.indptr[row + 1]
+                columns, values = scores.indices[begin:end], scores.data[begin:end]
+                keep = (values > 0) & (columns != position)
+                columns, values = columns[keep], values[keep]
+                if len(values) > top_k:
+                    best = np.argpartition(-values, top_k)[:top_k]
+                    columns, values = columns[best], values[best]
+                order = np.argsort(-values, kind='stable')
+                result[int(self.item_ids[position])] = [
+                    (int(self.item_ids[column]), float(value))
+                    for column, value in zip(columns[order], values[order])
+                ]
+        return result
+
+
+def dependent_items(kind, item_ids):
+    """Items whose current lists include one of ``item_ids``."""
+    return set(
+        ItemNeighbor.objects.filter(kind=kind, neighbor_id__in=ids_condition(list(item_ids)))
+        .values_list('media_item_id', flat=True)
+    )
+
+
+def store(kind, neighbors, targets=None):
+    """Replace the lists of ``targets`` (every list of ``kind`` when ``None``).
+
+    Returns the ids of the items whose lists changed hands.
+    """
+    rows = [
+        ItemNeighbor(media_item_id=item_id, neighbor_id=neighbor_id, kind=kind, score=score)
+        for item_id, pairs in neighbors.items()
+        for neighbor_id, score in pairs
+    ]
+    with transaction.atomic():
+        if targets is None:
+            stale_rows = ItemNeighbor.objects.filter(kind=kind)
+            targets = set(neighbors) | set(stale_rows.values_list('media_item_id', flat=True).distinct())
+        else:
+            targets = set(targets)
+            stale_rows = ItemNeighbor.objects.filter(kind=kind, media_item_id__in=ids_condition(list(targets)))
+        stale_rows.delete()
+        ItemNeighbor.objects.bulk_create(rows, batch_size=1000)
+    pagecache.purge(targets, lists=False)
+    return targets
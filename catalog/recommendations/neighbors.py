@@ -0,0 +1,47 @@
+"""Reads of the precomputed neighbour lists.
+
+Pages never compute similarities: they join ``ItemNeighbor`` rows, written
+offline by ``build_recommendations``, to the card columns of the neighbours in
+a single query on the ``(media_item, kind, -score)`` index.
+"""
+from django.db.models import Sum
+
+from ..models import ItemNeighbor, MediaItem, MediaItemQuerySet, Rating, Watchlist
+
+LIMIT = 8
+# Ratings at or above this score count as "liked" for personal recommendations.
+LIKED_SCORE = 7
+
+
+def similar_items(item, kind=ItemNeighbor.Kind.RATINGS, limit=LIMIT):
+    """Published neighbours of ``item``, best first."""
+    return list(
+        MediaItem.objects.filter(
+            is_published=True,
+            neighbor_of__media_item=item,
+            neighbor_of__kind=kind,
+        )
+        .only(*MediaItemQuerySet.CARD_FIELDS)
+        .order_by('-neighbor_of__score', '-id')[:limit]
+    )
+
+
+def recommended_for(user, limit=LIMIT):
+    """Items close to what ``user`` liked, leaving out what they rated or saved already."""
+    if not user.is_authenticated:
+        return []
+    liked = Rating.objects.filter(user=user, score__gte=LIKED_SCORE).values('media_item_id')
+    rated = Rating.objects.filter(user=user).values('media_item_id')
+    saved = Watchlist.objects.filter(user=user).values('media_item_id')
+    return list(
+        MediaItem.objects.filter(
+            is_published=True,
+            neighbor_of__media_item__in=liked,
+            neighbor_of__kind=ItemNeighbor.Kind.RATINGS,
+        )
+        .exclude(pk__in=rated)
+        .exclude(pk__in=saved)
+        .annotate(affinity=Sum('neighbor_of__score'))
+        .only(*MediaItemQuerySet.CARD_FIELDS)
+        .order_by('-affinity', '-id')[:limit]
+    )
@@ -0,0 +1,45 @@
+"""Process-level cache of reference data: genres and media type labels.
+
+Genres change rarely but are read on many pages, so each worker process keeps
+them in memory and reloads only when the shared ``reference`` version counter
+moves (see ``catalog.caching``). Saving or deleting a Genre bumps the counter,
+which every process notices on its next read. The returned objects are shared
+between requests and must be treated as read-only.
+"""
+import threading
+
+from .caching import bump_version, get_version
+from .models import Genre, MediaItem
+
+NAMESPACE = 'reference'
+
+_lock = threading.Lock()
+_genres = {'version': None, 'items': (), 'by_slug': {}}
+
+
+def get_genres():
+    """All genres in display order, as a tuple of read-only Genre instances."""
+    version = get_version(NAMESPACE)
+    if _genres['version'] != version:
+        with _lock:
+            if _genres['version'] != version:
+                items = tuple(Genre.objects.all())
+                _genres.update(
+                    items=items,
+                    by_slug={genre.slug: genre for genre in items},
+                    version=version,
+                )
+    return _genres['items']
+
+
+def get_genre(slug):
+    get_genres()
+    return _genres['by_slug'].get(slug)
+
+
+def media_type_labels():
+    return dict(MediaItem.MEDIA_TYPES)
+
+
+def invalidate():
+    bump_version(NAMESPACE)
@@ -0,0 +1,13 @@
+from .backends import (
+    SearchHit,
+    SearchResults,
+    get_search_backend,
+    matches_media_item,
+)
+from .index import index_item, rebuild, remove_item, search
+from .text import normalize, tokenize
+
+__all__ = [
+    'SearchHit', 'SearchResults', 'get_search_backend', 'matches_media_item',
+    'index_item', 'rebuild', 'remove_item', 'search', 'normalize', 'tokenize',
+]
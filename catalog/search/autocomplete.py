@@ -0,0 +1,117 @@
+"""Edge n-gram autocomplete index over title/original_title word-starts.
+
+Every word-start of a title ("людина бензопила", "бензопила") contributes its
+prefixes up to ``MAX_PREFIX_LENGTH`` characters. A lookup is a single equality
+match on the (prefix, -rank) index, so its cost does not depend on catalog size.
+"""
+import math
+
+from django.db import transaction
+
+from .text import tokenize
+
+MAX_PREFIX_LENGTH = 24
+SUGGESTION_LIMIT = 8
+# How many extra candidates to inspect when the query is longer than an indexed prefix.
+OVERFETCH_FACTOR = 5
+
+
+def normalize_phrase(value):
+    return ' '.join(tokenize(value))
+
+
+def word_starts(value):
+    """All suffixes of the normalized phrase that begin at a word boundary."""
+    words = tokenize(value)
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+def item_prefixes(title, original_title=''):
+    prefixes = set()
+    for value in (title, original_title):
+        for start in word_starts(value):
+            limit = min(len(start), MAX_PREFIX_LENGTH)
+            prefixes.update(start[:length] for length in range(1, limit + 1))
+    return prefixes
+
+
+def popularity(avg_rating, rating_count):
+    """Suggestion rank: average score, boosted logarithmically by the number of votes."""
+    return (avg_rating or 0) + math.log1p(rating_count or 0)
+
+
+def index_item(item):
+    """(Re)build the prefixes of one item; unpublished items are dropped."""
+    from ..models import AutocompletePrefix
+
+    with transaction.atomic():
+        AutocompletePrefix.objects.filter(media_item_id=item.pk).delete()
+        if not item.is_published:
+            return
+        rank = popularity(item.avg_rating, item.rating_count)
+        AutocompletePrefix.objects.bulk_create([
+            AutocompletePrefix(prefix=prefix, media_item_id=item.pk, rank=rank)
+            for prefix in item_prefixes(item.title, item.original_title)
+        ])
+
+
+def update_rank(item_id):
+    """Refresh the rank of an item after its rating aggregates changed."""
+    from ..models import AutocompletePrefix, MediaItem
+
+    stats = MediaItem.objects.filter(pk=item_id).values('avg_rating', 'rating_count').first()
+    if stats is None:
+        return
+    AutocompletePrefix.objects.filter(media_item_id=item_id).update(
+        rank=popularity(stats['avg_rating'], stats['rating_count'])
+    )
+
+
+def rebuild(batch_size=1000):
+    from ..models import AutocompletePrefix, MediaItem
+
+    indexed = 0
+    with transaction.atomic():
+        AutocompletePrefix.objects.all().delete()
+        items = (
+            MediaItem.objects.filter(is_published=True)
+            .only('pk', 'title', 'original_title', 'avg_rating', 'rating_count')
+        )
+        rows = []
+        for item in items.iterator(chunk_size=batch_size):
+            rank = popularity(item.avg_rating, item.rating_count)
+            rows.extend(
+                AutocompletePrefix(prefix=prefix, media_item_id=item.pk, rank=rank)
+                for prefix in item_prefixes(item.title, item.original_title)
+            )
+            indexed += 1
+            if len(rows) >= batch_size:
+                AutocompletePrefix.objects.bulk_create(rows)
+                rows = []
+        AutocompletePrefix.objects.bulk_create(rows)
+    return indexed
+
+
+def suggest(query, limit=SUGGESTION_LIMIT):
+    """Return up to ``limit`` published MediaItems whose title has a word starting with ``query``."""
+    from ..models import MediaItem
+
+    phrase = normalize_phrase(query)
+    if not phrase:
+        return []
+
+    prefix = phrase[:MAX_PREFIX_LENGTH]
+    truncated = len(phrase) > MAX_PREFIX_LENGTH
+    items = (
+        MediaItem.objects.filter(autocomplete_prefixes__prefix=prefix)
+        .order_by('-autocomplete_prefixes__rank', 'autocomplete_prefixes__media_item_id')
+    )[:limit * OVERFETCH_FACTOR if truncated else limit]
+
+    if not truncated:
+        return list(items)
+    return [
+        item for item in items
+        if any(start.startswith(phrase)
+               for value in (item.title, item.original_title)
+               for start in word_starts(value))
+    ][:limit]
@@ -0,0 +1,253 @@
+"""Pluggable search backends.
+
+Every backend answers ``search(query, limit, offset)`` with ranked ``SearchHit``
+tuples, ``count(query)``, ``match_ids(query)`` and ``match_condition(query)``. Views go through
+``get_search_backend()``, which honours ``settings.CATALOG_SEARCH_BACKEND`` and
+falls back to the casefold matcher when the configured engine is unavailable.
+"""
+import re
+import unicodedata
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import fts, index
+from .text import APOSTROPHES
+
+DEFAULT_BACKEND = 'fts5'
+FALLBACK_BACKEND = 'casefold'
+
+
+class SearchHit(NamedTuple):
+    pk: int
+    score: float
+    snippet: str = ''
+
+
+def matches_media_item(item, query_cf):
+    """Case-insensitive (Unicode) match across title/original_title/description using Python casefold."""
+    fields = [item.title, item.original_title, item.description]
+    return any(query_cf in (value or '').casefold() for value in fields)
+
+
+class BaseSearchBackend:
+    name = None
+
+    def is_available(self):
+        return True
+
+    def ranked(self, query):
+        """Full ranked hit list; backends that rank in the database override search/count instead."""
+        raise NotImplementedError
+
+    def search(self, query, limit=None, offset=0):
+        hits = self.ranked(query)
+        end = None if limit is None else offset + limit
+        return hits[offset:end]
+
+    def count(self, query):
+        return len(self.ranked(query))
+
+    def match_ids(self, query):
+        return [hit.pk for hit in self.search(query)]
+
+    def match_condition(self, query):
+        """Right-hand side for ``media_item_id__in`` that keeps the match inside the query."""
+        from ..bitmaps import ids_condition
+
+        return ids_condition(self.match_ids(query))
+
+
+class CasefoldSearchBackend(BaseSearchBackend):
+    """Python substring scan over every published item. Always available."""
+    name = 'casefold'
+
+    def __init__(self):
+        self._cache = {}
+
+    def ranked(self, query):
+        from ..models import MediaItem
+
+        query_cf = query.casefold()
+        if query_cf not in self._cache:
+            items = (
+                MediaItem.objects.filter(is_published=True)
+                .only('pk', 'title', 'original_title', 'description')
+                .order_by('-created_at')
+            )
+            self._cache[query_cf] = [
+                SearchHit(item.pk, 0) for item in items if matches_media_item(item, query_cf)
+            ]
+        return self._cache[query_cf]
+
+
+class TokenIndexSearchBackend(BaseSearchBackend):
+    """Inverted token index maintained by MediaItem signals (see ``search.index``)."""
+    name = 'index'
+
+    def __init__(self):
+        self._cache = {}
+
+    def ranked(self, query):
+        if query not in self._cache:
+            self._cache[query] = [SearchHit(pk, score) for pk, score in index.search(query)]
+        return self._cache[query]
+
+
+_FTS_TERM_RE = re.compile(r'[^\W_]+')
+_APOSTROPHE_RE = re.compile(f"[{APOSTROPHES}]")
+_SNIPPET_START, _SNIPPET_END = '\x02', '\x03'
+# bm25 weights for title, original_title, description.
+FTS_COLUMN_WEIGHTS = (10.0, 6.0, 1.0)
+
+
+def fts_match_expression(query):
+    """Build an FTS5 MATCH expression: every word is a required prefix term."""
+    phrases = []
+    for word in unicodedata.normalize('NFKC', query).casefold().split():
+        # The FTS tokenizer splits on apostrophes, so "м'ята" is indexed as the phrase "м ята".
+        parts = _FTS_TERM_RE.findall(_APOSTROPHE_RE.sub(' ', word))
+        if parts:
+            phrases.append('"{}"*'.format(' '.join(parts)))
+    return ' AND '.join(phrases)
+
+
+def highlight_snippet(raw):
+    """Escape an FTS snippet and turn the engine's match markers into <mark> tags."""
+    if not raw:
+        return ''
+    html = escape(raw).replace(_SNIPPET_START, '<mark>').replace(_SNIPPET_END, '</mark>')
+    return mark_safe(html)
+
+
+class FTS5SearchBackend(BaseSearchBackend):
+    """SQLite FTS5 with engine-side BM25 ranking and snippet highlighting."""
+    name = 'fts5'
+    _available = None
+
+    def is_available(self):
+        if FTS5SearchBackend._available is None:
+            FTS5SearchBackend._available = (
+                fts.fts5_supported(connection) and fts.schema_exists(connection)
+            )
+        return FTS5SearchBackend._available
+
+    def _from_where(self):
+        return (
+            f"FROM {fts.FTS_TABLE} "
+            f"JOIN {fts.SOURCE_TABLE} AS media ON media.id = {fts.FTS_TABLE}.rowid "
+            f"WHERE {fts.FTS_TABLE} MATCH %s AND media.is_published"
+        )
+
+    def search(self, query, limit=None, offset=0):
+        expression = fts_match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        sql = (
+            f"SELECT media.id, bm25({fts.FTS_TABLE}, {weights}) AS rank, "
+            f"snippet({fts.FTS_TABLE}, -1, %s, %s, '…', 16) "
+            f"{self._from_where()} ORDER BY rank, media.id DESC LIMIT %s OFFSET %s"
+        )
+        params = [_SNIPPET_START, _SNIPPET_END, expression, -1 if limit is None else limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # bm25() is negative, lower is better; flip it so higher score means better.
+            return [
+                SearchHit(pk, -rank, highlight_snippet(snippet))
+                for pk, rank, snippet in cursor.fetchall()
+            ]
+
+    def count(self, query):
+        expression = fts_match_expression(query)
+        if not expression:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) {self._from_where()}", [expression])
+            return cursor.fetchone()[0]
+
+    def match_ids(self, query):
+        expression = fts_match_expression(query)
+        if not expression:
+            return []
+        weights = ', '.join(str(weight) for weight in FTS_COLUMN_WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT media.id {self._from_where()} "
+                f"ORDER BY bm25({fts.FTS_TABLE}, {weights}), media.id DESC",
+                [expression],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def match_condition(self, query):
+        # Unranked and not limited to published items: callers filter their own rows.
+        expression = fts_match_expression(query)
+        if not expression:
+            return []
+        return RawSQL(f"SELECT rowid FROM {fts.FTS_TABLE} WHERE {fts.FTS_TABLE} MATCH %s", [expression])
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (FTS5SearchBackend, TokenIndexSearchBackend, CasefoldSearchBackend)
+}
+
+
+def get_search_backend(name=None):
+    name = name or getattr(settings, 'CATALOG_SEARCH_BACKEND', DEFAULT_BACKEND)
+    backend = BACKENDS.get(name, BACKENDS[FALLBACK_BACKEND])()
+    if not backend.is_available():
+        backend = BACKENDS[FALLBACK_BACKEND]()
+    return backend
+
+
+class SearchResults:
+    """Lazy, Paginator-compatible view over a backend's ranked hits.
+
+    Only the requested slice is fetched from the engine and hydrated into
+    MediaItem objects, annotated with ``search_score`` and ``search_snippet``.
+    """
+
+    def __init__(self, query, backend=None, queryset=None):
+        from ..models import MediaItem
+
+        self.query = query
+        self.backend = backend or get_search_backend()
+        self.queryset = queryset if queryset is not None else MediaItem.objects.all()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.query)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if key.step not in (None, 1):
+                raise ValueError("SearchResults does not support stepped slices.")
+            offset = key.start or 0
+            limit = None if key.stop is None else max(key.stop - offset, 0)
+            return self._hydrate(self.backend.search(self.query, limit=limit, offset=offset))
+        hits = self.backend.search(self.query, limit=1, offset=key)
+        if not hits:
+            raise IndexError(key)
+        return self._hydrate(hits)[0]
+
+    def _hydrate(self, hits):
+        items = self.queryset.in_bulk([hit.pk for hit in hits])
+        results = []
+        for hit in hits:
+            item = items.get(hit.pk)
+            if item is None:
+                continue
+            item.search_score = hit.score
+            item.search_snippet = hit.snippet
+            results.append(item)
+        return results
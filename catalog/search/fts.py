@@ -0,0 +1,99 @@
+"""SQLite FTS5 mirror of MediaItem.title/original_title/description.
+
+The virtual table is an external-content table over ``catalog_mediaitem`` kept in
+sync by database triggers, so rows are indexed no matter how they are written
+(ORM, admin, raw SQL). ``ensure_schema`` is idempotent: SQLite drops triggers
+when Django rebuilds ``catalog_mediaitem`` during a migration, so it is also run
+after every ``migrate``.
+"""
+
+FTS_TABLE = 'catalog_mediaitem_fts'
+SOURCE_TABLE = 'catalog_mediaitem'
+COLUMNS = ('title', 'original_title', 'description')
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, original_title, description,
+    content='{SOURCE_TABLE}', content_rowid='id',
+    tokenize="unicode61 remove_diacritics 2 separators 'ʼ’`'",
+    prefix='2 3'
+)
+"""
+
+_NEW_ROW = "new.id, new.title, new.original_title, new.description"
+_OLD_ROW = "old.id, old.title, old.original_title, old.description"
+_DELETE_OLD = (
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, original_title, description) "
+    f"VALUES ('delete', {_OLD_ROW});"
+)
+_INSERT_NEW = f"INSERT INTO {FTS_TABLE}(rowid, title, original_title, description) VALUES ({_NEW_ROW});"
+
+TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {SOURCE_TABLE} BEGIN
+            {_INSERT_NEW}
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {SOURCE_TABLE} BEGIN
+            {_DELETE_OLD}
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF title, original_title, description ON {SOURCE_TABLE} BEGIN
+            {_DELETE_OLD}
+            {_INSERT_NEW}
+        END
+    """,
+}
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Older builds load FTS5 without reporting the compile option.
+        cursor.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'")
+        return cursor.fetchone() is not None
+
+
+def schema_exists(connection):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def ensure_schema(connection):
+    """Create the FTS table and triggers if missing. Returns True if anything changed."""
+    if not fts5_supported(connection):
+        return False
+    if SOURCE_TABLE not in connection.introspection.table_names():
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f'{FTS_TABLE}%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in TRIGGERS if name not in existing]
+        if FTS_TABLE in existing and not missing:
+            return False
+
+        cursor.execute(_CREATE_TABLE)
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        # Triggers may have been missing while rows changed; resync from the source table.
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def drop_schema(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
@@ -0,0 +1,142 @@
+"""Typo-tolerant title lookup over a precomputed trigram index.
+
+Titles and queries are folded to a rough Latin phonetic key first: Ukrainian is
+transliterated, spelling variants that sound alike are merged and runs of
+vowels collapse to a single ``a``. "Бліч", "Блич" and "Bleach" all fold to
+"blach". Matching then counts shared trigrams through the (trigram, item)
+index, so a lookup only touches the posting lists of the query's trigrams.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Count
+
+from .text import normalize
+
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'h', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'ye',
+    'ж': 'zh', 'з': 'z', 'и': 'y', 'і': 'i', 'ї': 'yi', 'й': 'y', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ь': '', 'ю': 'yu',
+    'я': 'ya',
+    # Russian letters users often type instead of Ukrainian ones.
+    'ы': 'y', 'э': 'e', 'ё': 'yo', 'ъ': '',
+}
+_TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+
+# Applied in order to the transliterated text.
+_SOUND_RULES = [
+    (re.compile(r'shch|sch'), 'sh'),
+    (re.compile(r'tch'), 'ch'),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'kh'), 'h'),
+    (re.compile(r'ck|q'), 'k'),
+    (re.compile(r'c(?=[eiy])'), 's'),
+    (re.compile(r'c(?!h)'), 'k'),
+    (re.compile(r'j'), 'dzh'),
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'[aeiouy]+'), 'a'),
+    (re.compile(r'([^\W\d_])\1+'), r'\1'),
+]
+_WORD_RE = re.compile(r'[^\W_]+')
+
+MIN_SIMILARITY = 0.65
+CANDIDATE_LIMIT = 50
+# Exact search returning fewer hits than this is topped up with fuzzy matches.
+FALLBACK_THRESHOLD = 3
+
+
+def fold(value):
+    """Fold a title or query to its phonetic Latin key."""
+    text = normalize(value).translate(_TRANSLIT_TABLE)
+    for pattern, replacement in _SOUND_RULES:
+        text = pattern.sub(replacement, text)
+    return ' '.join(_WORD_RE.findall(text))
+
+
+def trigrams(value):
+    """pg_trgm-style trigrams of the folded value; each word is padded separately."""
+    grams = set()
+    for word in fold(value).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def item_trigrams(title, original_title=''):
+    return trigrams(title) | trigrams(original_title)
+
+
+def index_item(item):
+    """(Re)build the trigrams of one item; unpublished items are dropped."""
+    from ..models import TitleTrigram
+
+    with transaction.atomic():
+        TitleTrigram.objects.filter(media_item_id=item.pk).delete()
+        if not item.is_published:
+            return
+        TitleTrigram.objects.bulk_create([
+            TitleTrigram(trigram=gram, media_item_id=item.pk)
+            for gram in item_trigrams(item.title, item.original_title)
+        ])
+
+
+def rebuild(batch_size=1000):
+    from ..models import MediaItem, TitleTrigram
+
+    indexed = 0
+    with transaction.atomic():
+        TitleTrigram.objects.all().delete()
+        rows = []
+        items = MediaItem.objects.filter(is_published=True).only('pk', 'title', 'original_title')
+        for item in items.iterator(chunk_size=batch_size):
+            rows.extend(
+                TitleTrigram(trigram=gram, media_item_id=item.pk)
+                for gram in item_trigrams(item.title, item.original_title)
+            )
+            indexed += 1
+            if len(rows) >= batch_size:
+                TitleTrigram.objects.bulk_create(rows)
+                rows = []
+        TitleTrigram.objects.bulk_create(rows)
+    return indexed
+
+
+def similar_ids(query, limit=10, exclude=(), min_similarity=MIN_SIMILARITY):
+    """Return ``[(item_id, similarity), ...]`` for titles resembling ``query``.
+
+    Similarity is the share of the query's trigrams found in the title, so a
+    short query still matches a long multi-word title.
+    """
+    from ..models import TitleTrigram
+
+    grams = trigrams(query)
+    if not grams:
+        return []
+
+    min_shared = max(1, int(len(grams) * min_similarity + 0.999))
+    candidates = (
+        TitleTrigram.objects.filter(trigram__in=grams)
+        .exclude(media_item_id__in=list(exclude))
+        .values('media_item_id')
+        .annotate(shared=Count('id'))
+        .filter(shared__gte=min_shared)
+        .order_by('-shared', 'media_item_id')
+    )[:min(limit, CANDIDATE_LIMIT)]
+    return [(row['media_item_id'], row['shared'] / len(grams)) for row in candidates]
+
+
+def similar_items(query, queryset, limit=10, exclude=()):
+    """Hydrated fuzzy matches, flagged with ``fuzzy_match`` and ``search_score``."""
+    ranked = similar_ids(query, limit=limit, exclude=exclude)
+    items = queryset.in_bulk([pk for pk, _similarity in ranked])
+    results = []
+    for pk, similarity in ranked:
+        item = items.get(pk)
+        if item is None:
+            continue
+        item.search_score = similarity
+        item.fuzzy_match = True
+        results.append(item)
+    return results
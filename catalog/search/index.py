@@ -0,0 +1,115 @@
+"""Persistent inverted token index over MediaItem title/original_title/description."""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .text import tokenize
+
+# Per-occurrence weight of a token depending on the field it was found in.
+FIELD_WEIGHTS = {
+    'title': 10,
+    'original_title': 6,
+    'description': 1,
+}
+# Caps the contribution of a single token so long descriptions can't outrank titles.
+MAX_TOKEN_WEIGHT = 30
+# A token that equals the query term scores higher than one that only starts with it.
+EXACT_MATCH_BONUS = 2
+
+_PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+def item_tokens(item):
+    """Return {token: weight} for a MediaItem."""
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token in tokenize(getattr(item, field)):
+            weights[token] += field_weight
+    return {token: min(weight, MAX_TOKEN_WEIGHT) for token, weight in weights.items()}
+
+
+def index_item(item):
+    """(Re)build index rows for a single item; unpublished items are removed."""
+    from ..models import SearchToken
+
+    with transaction.atomic():
+        SearchToken.objects.filter(media_item_id=item.pk).delete()
+        if not item.is_published:
+            return
+        SearchToken.objects.bulk_create([
+            SearchToken(token=token, media_item_id=item.pk, weight=weight)
+            for token, weight in item_tokens(item).items()
+        ])
+
+
+def remove_item(item_id):
+    from ..models import SearchToken
+
+    SearchToken.objects.filter(media_item_id=item_id).delete()
+
+
+def rebuild(batch_size=500):
+    """Rebuild the whole index from scratch. Returns the number of indexed items."""
+    from ..models import MediaItem, SearchToken
+
+    indexed = 0
+    with transaction.atomic():
+        SearchToken.objects.all().delete()
+        items = (
+            MediaItem.objects.filter(is_published=True)
+            .only('pk', 'title', 'original_title', 'description')
+        )
+        rows = []
+        for item in items.iterator(chunk_size=batch_size):
+            rows.extend(
+                SearchToken(token=token, media_item_id=item.pk, weight=weight)
+                for token, weight in item_tokens(item).items()
+            )
+            indexed += 1
+            if len(rows) >= batch_size:
+                SearchToken.objects.bulk_create(rows)
+                rows = []
+        SearchToken.objects.bulk_create(rows)
+    return indexed
+
+
+def _term_scores(term):
+    """{item_id: score} for items having a token that starts with ``term``."""
+    from ..models import SearchToken
+
+    # A range scan instead of LIKE so the (token, media_item) index is used.
+    rows = SearchToken.objects.filter(
+        token__gte=term, token__lt=term + _PREFIX_UPPER_BOUND
+    ).values_list('media_item_id', 'token', 'weight')
+
+    scores = defaultdict(int)
+    for item_id, token, weight in rows:
+        score = weight * EXACT_MATCH_BONUS if token == term else weight
+        if score > scores[item_id]:
+            scores[item_id] = score
+    return scores
+
+
+def search(query):
+    """Return ``[(item_id, score), ...]`` ranked by relevance; every term must match."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    # Start with the most selective (longest) term to keep intermediate sets small.
+    terms.sort(key=len, reverse=True)
+    totals = None
+    for term in terms:
+        scores = _term_scores(term)
+        if totals is None:
+            totals = dict(scores)
+        else:
+            totals = {
+                item_id: total + scores[item_id]
+                for item_id, total in totals.items()
+                if item_id in scores
+            }
+        if not totals:
+            return []
+
+    return sorted(totals.items(), key=lambda pair: (-pair[1], -pair[0]))
@@ -0,0 +1,21 @@
+import re
+import unicodedata
+
+# Apostrophes used inside Ukrainian words (мʼята, п'ять). They are dropped so the
+# word stays a single token regardless of which variant the user typed.
+APOSTROPHES = "'’ʼ`"
+_APOSTROPHE_RE = re.compile(f"[{APOSTROPHES}]")
+_TOKEN_RE = re.compile(r'\w+')
+
+MAX_TOKEN_LENGTH = 64
+
+
+def normalize(value):
+    """NFKC + casefold + apostrophe folding; works for Ukrainian and Latin text."""
+    value = unicodedata.normalize('NFKC', value or '')
+    return _APOSTROPHE_RE.sub('', value).casefold()
+
+
+def tokenize(value):
+    """Split text into normalized word tokens (Unicode aware)."""
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN_RE.findall(normalize(value))]
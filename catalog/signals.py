@@ -0,0 +1,221 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import bitmaps, charts, facets, pagecache, posters, progress, ratings, reference, trending, user_stats
+from . import search as search_index
+from .models import Genre, MediaItem, Rating, Season, UserStats, Watchlist
+from .search import autocomplete, fts, fuzzy
+
+
+@receiver(post_save, sender=MediaItem)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search_index.index_item(instance)
+    autocomplete.index_item(instance)
+    fuzzy.index_item(instance)
+
+
+@receiver(post_save, sender=Rating)
+def rating_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_item_id = getattr(instance, '_loaded_media_item_id', None)
+    old_score = getattr(instance, '_loaded_score', None)
+    user_stats.rating_changed(
+        instance.user_id,
+        old=None if old_score is None else (old_score, getattr(instance, '_loaded_comment', '')),
+        new=(instance.score, instance.comment),
+    )
+    if old_item_id is not None and old_item_id != instance.media_item_id:
+        ratings.apply_change(old_item_id, old_score=old_score)
+        autocomplete.update_rank(old_item_id)
+        pagecache.purge([old_item_id])
+        old_score = None
+
+    ratings.apply_change(instance.media_item_id, old_score=old_score, new_score=instance.score)
+    if created or old_score is None:
+        trending.record(instance.media_item_id, trending.RATING_ADDED)
+    elif int(instance.score) != int(old_score):
+        trending.record(instance.media_item_id, trending.RATING_CHANGED)
+    instance._loaded_score = int(instance.score)
+    instance._loaded_media_item_id = instance.media_item_id
+    instance._loaded_comment = instance.comment
+    autocomplete.update_rank(instance.media_item_id)
+    pagecache.purge([instance.media_item_id])
+
+
+@receiver(post_delete, sender=Rating)
+def rating_deleted(sender, instance, **kwargs):
+    item_id = getattr(instance, '_loaded_media_item_id', None) or instance.media_item_id
+    score = getattr(instance, '_loaded_score', None) or instance.score
+    ratings.apply_change(item_id, old_score=score)
+    user_stats.rating_changed(instance.user_id, old=(score, getattr(instance, '_loaded_comment', instance.comment)))
+    autocomplete.update_rank(item_id)
+    pagecache.purge([item_id])
+
+
+@receiver(post_save, sender=Watchlist)
+def watchlist_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    old_status = getattr(instance, '_loaded_status', None)
+    user_stats.watchlist_changed(
+        instance.user_id,
+        old=None if created or old_status is None else (old_status, instance._loaded_media_item_id),
+        new=(instance.status, instance.media_item_id),
+    )
+    instance._loaded_status = instance.status
+    instance._loaded_media_item_id = instance.media_item_id
+    if created:
+        trending.record(instance.media_item_id, trending.WATCHLIST_ADDED)
+    elif update_fields is None or 'status' in update_fields:
+        trending.record(instance.media_item_id, trending.WATCHLIST_STATUS_CHANGED)
+
+
+@receiver(post_delete, sender=Watchlist)
+def watchlist_deleted(sender, instance, **kwargs):
+    user_stats.watchlist_changed(instance.user_id, old=(
+        getattr(instance, '_loaded_status', None) or instance.status,
+        getattr(instance, '_loaded_media_item_id', None) or instance.media_item_id,
+    ))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=MediaItem)
+@receiver(post_delete, sender=MediaItem)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_facet_counts(sender, raw=False, **kwargs):
+    if not raw:
+        facets.invalidate()
+
+
+@receiver(m2m_changed, sender=MediaItem.genres.through)
+def media_genres_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        facets.invalidate()
+
+
+def _items_changed(item_ids, lists=True, membership=True):
+    """Invalidate fragment caches and cached pages that show these items.
+
+    ``membership`` means the items' filterable attributes may have changed too.
+    """
+    item_ids = [pk for pk in item_ids if pk is not None]
+    if item_ids:
+        MediaItem.objects.filter(pk__in=item_ids).bump_content_version()
+        if membership:
+            bitmaps.items_changed(item_ids)
+            charts.sync_items(item_ids)
+    pagecache.purge(item_ids, lists=lists)
+
+
+@receiver(post_save, sender=MediaItem)
+def media_item_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    _poster_saved(instance)
+    if created:
+        bitmaps.items_changed([instance.pk])
+        charts.sync_items([instance.pk])
+        pagecache.purge()
+    else:
+        _items_changed([instance.pk])
+        trending.media_type_changed(instance.pk, instance.media_type)
+        old_type = getattr(instance, '_loaded_media_type', None)
+        if old_type and old_type != instance.media_type:
+            user_stats.media_type_changed(instance.pk, old_type, instance.media_type)
+    instance._loaded_media_type = instance.media_type
+
+
+def _poster_saved(instance):
+    # Before the fragment caches are invalidated, so they re-render with the new variants.
+    old_name = getattr(instance, '_loaded_poster', None) or ''
+    new_name = instance.poster.name or ''
+    if new_name == old_name:
+        return
+    if old_name:
+        posters.delete(old_name, instance.poster_variants)
+    instance.poster_variants = posters.generate(instance.poster) if new_name else {}
+    MediaItem.objects.filter(pk=instance.pk).update(poster_variants=instance.poster_variants)
+    instance._loaded_poster = new_name
+
+
+@receiver(post_delete, sender=MediaItem)
+def media_item_deleted(sender, instance, **kwargs):
+    bitmaps.items_changed([instance.pk])
+    pagecache.purge([instance.pk])
+    if instance.poster and 'poster_variants' in instance.__dict__:
+        posters.delete(instance.poster.name, instance.poster_variants)
+
+
+@receiver(post_save, sender=Season)
+@receiver(post_delete, sender=Season)
+def season_changed(sender, instance, raw=False, **kwargs):
+    # Seasons only appear on the detail page.
+    if not raw:
+        _items_changed([instance.media_item_id], lists=False, membership=False)
+
+
+@receiver(post_save, sender=Season)
+def season_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_count = getattr(instance, '_loaded_episodes_count', None)
+    if not created and old_count is not None and instance.episodes_count < old_count:
+        progress.season_resized(instance)
+    instance._loaded_episodes_count = instance.episodes_count
+
+
+@receiver(m2m_changed, sender=MediaItem.genres.through)
+def media_genres_content_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _items_changed([instance.pk])
+        return
+    # Changed from the Genre side: pk_set holds item ids, except for clear().
+    if action == 'pre_clear':
+        instance._cleared_item_ids = list(instance.mediaitem_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        _items_changed(pk_set)
+    elif action == 'post_clear':
+        _items_changed(instance.__dict__.pop('_cleared_item_ids', []))
+
+
+@receiver(post_save, sender=Genre)
+def genre_saved(sender, instance, created, raw=False, **kwargs):
+    reference.invalidate()
+    if raw:
+        return
+    if created:
+        pagecache.purge()
+    else:
+        _items_changed(instance.mediaitem_set.values_list('pk', flat=True), membership=False)
+
+
+@receiver(pre_delete, sender=Genre)
+def genre_deleting(sender, instance, **kwargs):
+    # The M2M rows go with the genre without m2m_changed; remember the items.
+    instance._tagged_item_ids = list(instance.mediaitem_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Genre)
+def genre_deleted(sender, instance, **kwargs):
+    reference.invalidate()
+    _items_changed(getattr(instance, '_tagged_item_ids', []))
+
+
+@receiver(post_migrate)
+def ensure_fts_schema(sender, app_config=None, using='default', **kwargs):
+    # Table rebuilds during migrations drop the FTS triggers; put them back.
+    if app_config is not None and app_config.name == 'catalog':
+        fts.ensure_schema(connections[using])
@@ -0,0 +1,18 @@
+from django import template
+
+from catalog import posters
+
+register = template.Library()
+
+
+@register.inclusion_tag('catalog/partials/poster.html')
+def poster_picture(item, rendition, css_class='', style='', sizes=None, lazy=True):
+    """``<picture>`` of ``item``'s poster: AVIF/WebP variants for ``rendition``, the original as fallback."""
+    return {
+        'item': item,
+        'sources': posters.sources(item, rendition),
+        'sizes': sizes or posters.sizes(rendition),
+        'css_class': css_class,
+        'style': style,
+        'lazy': lazy,
+    }
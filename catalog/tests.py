@@ -1,3 +1,1236 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+import numpy as np
+from PIL import Image
+
+from . import bitmaps, charts, history, posters, progress, ratings, reference, trending, user_stats, urls as catalog_urls
+from .admin import refresh_similar_titles
+from .models import (
+    AutocompletePrefix, ChartEntry, EpisodeProgress, Genre, ItemNeighbor, MediaItem, Rating, SearchToken, Season,
+    TitleTrigram, TrendingBucket, TrendingScore, UserStats, Watchlist,
+)
+from .profiling import QUERY_BUDGETS, QueryStats
+from .recommendations import collaborative, content, recommended_for, similar_items
+from .search import autocomplete, fts, fuzzy, get_search_backend
+from .search import index as token_index
+from .search.backends import FTS5SearchBackend, fts_match_expression
+from .user_state import item_states
+from .views import REVIEWS_PAGE_SIZE
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Every catalog view stays within its query budget on a large catalog."""
+
+    ITEMS = 150
+    RATERS = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        genres = [
+            Genre.objects.create(name=f'Жанр {i}', slug=f'genre-{i}')
+            for i in range(8)
+        ]
+        media_types = [code for code, _ in MediaItem.MEDIA_TYPES]
+        cls.items = []
+        for i in range(cls.ITEMS):
+            item = MediaItem.objects.create(
+                title=f'Космічна історія {i}',
+                original_title=f'Space story {i}',
+                description=f'Опис пригоди номер {i}',
+                media_type=media_types[i % len(media_types)],
+                release_year=1980 + i % 40,
+                country='Україна',
+                duration=90 + i % 60,
+            )
+            item.genres.set(genres[i % 8:i % 8 + 3])
+            if item.media_type != 'movie':
+                for number in range(1, 4):
+                    Season.objects.create(media_item=item, season_number=number, release_year=2000, episodes_count=10)
+            cls.items.append(item)
+
+        cls.detail_item = cls.items[1]
+        for i in range(cls.RATERS):
+            rater = User.objects.create_user(f'rater{i}', password='secret-pass')
+            Rating.objects.create(user=rater, media_item=cls.detail_item, score=1 + i % 10, comment=f'Відгук {i}')
+
+        cls.user = User.objects.create_user('budget', password='secret-pass')
+        for i, item in enumerate(cls.items[:40]):
+            Watchlist.objects.create(user=cls.user, media_item=item, status=Watchlist.Status.choices[i % 3][0])
+            Rating.objects.create(user=cls.user, media_item=item, score=1 + i % 10, comment=f'Коментар {i}')
+        cls.own_rating = Rating.objects.get(user=cls.user, media_item=cls.detail_item)
+        collaborative.refresh()
+        content.refresh()
+
+    def setUp(self):
+        cache.clear()
+
+    def measure(self, method, url, data=None, login=False):
+        if login:
+            self.client.force_login(self.user)
+        # Warm process-level caches first; the budget applies to steady state.
+        # Callables build a fresh url or data (e.g. uploads) for every request,
+        # outside the measured queries.
+        target = url if callable(url) else lambda: url
+        payload = data if callable(data) else lambda: data or {}
+        getattr(self.client, method)(target(), payload())
+        request_url, request_data = target(), payload()
+        with QueryStats() as stats:
+            response = getattr(self.client, method)(request_url, request_data)
+        self.assertLess(response.status_code, 400, request_url)
+        return stats
+
+    def scenarios(self):
+        item = self.detail_item
+        detail = reverse('media_detail', args=[item.pk])
+        return {
+            'home': ('get', reverse('home'), None, True),
+            'media_list': ('get', reverse('media_list') + '?type=series&genre=genre-2&sort=title', None, True),
+            'media_detail': ('get', detail, None, True),
+            'media_reviews': ('get', self.client.get(detail).context['reviews_next_url'], None, False),
+            'rate_media': ('post', reverse('rate_media', args=[item.pk]), {'score': 7, 'comment': 'Ок'}, True),
+            'toggle_watchlist': ('post', reverse('toggle_watchlist', args=[item.pk]), {'status': 'watched', 'next': detail}, True),
+            'update_progress': (
+                'post', reverse('update_progress', args=[item.pk]),
+                {'season': item.seasons.first().pk, 'first': 2, 'last': 5, 'next': detail}, True,
+            ),
+            'update_rating': ('post', reverse('update_rating', args=[self.own_rating.pk]), {'score': 5, 'next': detail}, True),
+            'delete_rating': ('post', self.disposable_rating_url, {'next': detail}, True),
+            'profile': ('get', reverse('profile'), None, True),
+            'user_watchlist': ('get', reverse('user_watchlist') + '?q=космічна', None, True),
+            'bulk_watchlist': (
+                'post', reverse('bulk_watchlist'),
+                {'action': 'add', 'status': 'favorite', 'ids': ','.join(str(i.pk) for i in self.items[20:80])}, True,
+            ),
+            'user_comments': ('get', reverse('user_comments'), None, True),
+            'user_item_states': (
+                'get', reverse('user_item_states') + '?ids=' + ','.join(str(i.pk) for i in self.items[:60]), None, True,
+            ),
+            'export_history': ('get', reverse('export_history') + '?format=json', None, True),
+            'import_history': ('post', reverse('import_history'), self.history_upload, True),
+            'search': ('get', reverse('search') + '?q=космічна', None, True),
+            'search_suggestions': ('get', reverse('search_suggestions') + '?q=кос', None, False),
+            'register': ('get', reverse('register'), None, False),
+            'login': ('get', reverse('login'), None, False),
+            'logout': ('post', reverse('logout'), None, True),
+        }
+
+    def disposable_rating_url(self):
+        rating, _ = Rating.objects.get_or_create(
+            user=self.user, media_item=self.items[-1], defaults={'score': 4, 'comment': 'Видалю'},
+        )
+        return reverse('delete_rating', args=[rating.pk])
+
+    def history_upload(self):
+        rows = '\n'.join(
+            f'{kind},{item.pk},,{status},{score},,'
+            for item in self.items[40:100]
+            for kind, status, score in (('watchlist', 'planned', ''), ('rating', '', 7))
+        )
+        content = f'{",".join(history.FIELDS)}\n{rows}\n'.encode()
+        return {'file': SimpleUploadedFile('history.csv', content, content_type='text/csv')}
+
+    def test_every_url_name_has_a_budget(self):
+        names = {pattern.name for pattern in catalog_urls.urlpatterns}
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+        self.assertEqual(names - set(self.scenarios()), set())
+
+    def test_views_stay_within_budget(self):
+        for name, (method, url, data, login) in self.scenarios().items():
+            with self.subTest(view=name):
+                stats = self.measure(method, url, data, login)
+                self.assertLessEqual(
+                    stats.count, QUERY_BUDGETS[name],
+                    f'{name}: {stats.summary()}\n' + '\n'.join(sql for sql, _ in stats.queries),
+                )
+                self.client.logout()
+
+    def test_listing_queries_do_not_grow_with_page_size(self):
+        rare = Genre.objects.create(name='Рідкісний', slug='rare')
+        rare.mediaitem_set.add(*self.items[:2])
+        small = self.measure('get', reverse('media_list') + '?genre=rare')
+        full = self.measure('get', reverse('media_list'))
+        self.assertEqual(small.count, full.count)
+
+    def test_middleware_reports_stats_header(self):
+        with self.settings(CATALOG_QUERY_PROFILING=True):
+            response = self.client.get(reverse('home'))
+        self.assertIn('queries=', response['X-Query-Stats'])
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = MediaItem.objects.create(
+            title='Серіал', description='Опис', media_type='series',
+            release_year=2020, country='Україна', duration=45,
+        )
+
+    def test_content_version_follows_related_changes(self):
+        def version():
+            return MediaItem.objects.get(pk=self.item.pk).content_version
+
+        changes = [
+            lambda: Season.objects.create(media_item=self.item, season_number=1, release_year=2020),
+            lambda: self.item.genres.add(Genre.objects.create(name='Драма', slug='drama')),
+            lambda: Genre.objects.filter(slug='drama').get().delete(),
+            lambda: Rating.objects.create(
+                user=User.objects.create_user('fan', password='secret-pass'), media_item=self.item, score=8,
+            ),
+        ]
+        for change in changes:
+            before = version()
+            change()
+            self.assertGreater(version(), before)
+
+    def test_detail_fragment_is_refreshed_after_season_change(self):
+        url = reverse('media_detail', args=[self.item.pk])
+        Season.objects.create(media_item=self.item, season_number=1, release_year=2020, episodes_count=8)
+        self.assertContains(self.client.get(url), '>8</span>')
+        Season.objects.create(media_item=self.item, season_number=2, release_year=2021, episodes_count=5)
+        self.assertContains(self.client.get(url), '>13</span>')
+
+
+    def test_home_sections_share_one_card_fragment(self):
+        self.item.genres.add(Genre.objects.create(name='Драма', slug='drama'))
+        trending.record(self.item.pk, 5)
+        self.client.force_login(User.objects.create_user('viewer', password='secret-pass'))
+        content = self.client.get(reverse('home')).content.decode()
+        cards = re.findall(r'<div class="col-lg-3 col-md-4 col-sm-6">.*?</a>\s*</div>', content, re.S)
+        cards = [card for card in cards if f'data-item-id="{self.item.pk}"' in card]
+        # Trending, weekly top and the latest series section.
+        self.assertEqual(len(cards), 3)
+        self.assertEqual(len(set(cards)), 1)
+        self.assertIn('Драма', cards[0])
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = MediaItem.objects.create(
+            title='Аніме', description='Опис', media_type='anime',
+            release_year=2021, country='Японія', duration=24,
+        )
+        self.other = MediaItem.objects.create(
+            title='Інше', description='Опис', media_type='anime',
+            release_year=2022, country='Японія', duration=24,
+        )
+
+    def get(self, url, **headers):
+        with QueryStats() as stats:
+            response = self.client.get(url, **headers)
+        return response, stats
+
+    def test_repeat_requests_skip_the_database(self):
+        url = reverse('media_list') + '?type=anime'
+        first, _ = self.get(url)
+        second, stats = self.get(url + '&utm_source=mail')
+        self.assertEqual(stats.count, 0)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Cookie', second['Vary'])
+        self.assertTrue(second.has_header('Last-Modified'))
+
+    def test_conditional_get_returns_not_modified(self):
+        url = reverse('media_detail', args=[self.item.pk])
+        response, _ = self.get(url)
+        revalidated, stats = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(stats.count, 0)
+
+    def test_changes_purge_only_affected_pages(self):
+        detail = reverse('media_detail', args=[self.item.pk])
+        other_detail = reverse('media_detail', args=[self.other.pk])
+        home = reverse('home')
+        etags = {url: self.get(url)[0]['ETag'] for url in (detail, other_detail, home)}
+
+        Season.objects.create(media_item=self.item, season_number=1, release_year=2021)
+        self.assertNotEqual(self.get(detail)[0]['ETag'], etags[detail])
+        self.assertEqual(self.get(other_detail)[0]['ETag'], etags[other_detail])
+        self.assertEqual(self.get(home)[0]['ETag'], etags[home])
+
+        user = User.objects.create_user('viewer', password='secret-pass')
+        Rating.objects.create(user=user, media_item=self.other, score=6)
+        self.assertNotEqual(self.get(other_detail)[0]['ETag'], etags[other_detail])
+        self.assertNotEqual(self.get(home)[0]['ETag'], etags[home])
+
+    def test_last_modified_follows_rating_edits_and_deletions(self):
+        url = reverse('media_detail', args=[self.item.pk])
+        user = User.objects.create_user('viewer', password='secret-pass')
+        with patch('catalog.pagecache.time.time', return_value=1_000_000.2):
+            rating = Rating.objects.create(user=user, media_item=self.item, score=6)
+            response, stats = self.get(url)
+        self.assertEqual(response['Last-Modified'], http_date(1_000_001))
+        self.assertFalse([sql for sql, _ in stats.queries if 'MAX(' in sql.upper()])
+
+        with patch('catalog.pagecache.time.time', return_value=1_000_100.0):
+            rating.score = 9
+            rating.save()
+        edited, _ = self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(edited.status_code, 200)
+        self.assertEqual(edited['Last-Modified'], http_date(1_000_100))
+
+        with patch('catalog.pagecache.time.time', return_value=1_000_200.0):
+            rating.delete()
+        deleted, _ = self.get(url, HTTP_IF_MODIFIED_SINCE=edited['Last-Modified'])
+        self.assertEqual(deleted.status_code, 200)
+        self.assertEqual(deleted['Last-Modified'], http_date(1_000_200))
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=deleted['Last-Modified'])[0].status_code, 304)
+
+    def test_authenticated_requests_are_not_cached(self):
+        self.client.force_login(User.objects.create_user('member', password='secret-pass'))
+        response, _ = self.get(reverse('home'))
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ReferenceDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_genres_load_once_and_reload_after_change(self):
+        Genre.objects.create(name='Драма', slug='drama')
+        self.assertEqual([genre.slug for genre in reference.get_genres()], ['drama'])
+        with QueryStats() as stats:
+            reference.get_genres()
+            self.client.get(reverse('login'))
+        self.assertEqual(stats.count, 0)
+
+        Genre.objects.create(name='Комедія', slug='comedy')
+        self.assertEqual(reference.get_genre('comedy').name, 'Комедія')
+        Genre.objects.filter(slug='drama').get().delete()
+        self.assertIsNone(reference.get_genre('drama'))
+
+
+class BitmapIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.drama = Genre.objects.create(name='Драма', slug='drama')
+        self.comedy = Genre.objects.create(name='Комедія', slug='comedy')
+        rows = [
+            ('movie', 1999, 'США', 120, [self.drama]),
+            ('movie', 2005, 'Україна', 95, [self.drama, self.comedy]),
+            ('series', 2010, 'США', 45, [self.comedy]),
+            ('anime', 2015, 'Японія', 24, [self.drama]),
+        ]
+        self.items = []
+        for media_type, year, country, duration, genres in rows:
+            item = MediaItem.objects.create(
+                title=f'{media_type} {year}', description='Опис', media_type=media_type,
+                release_year=year, country=country, duration=duration,
+            )
+            item.genres.set(genres)
+            self.items.append(item)
+        self.index = bitmaps.BitmapIndex.build()
+
+    def matching(self, **filters):
+        return set(self.index.ids_for_bits(self.index.select(bitmaps.Filters(**filters))))
+
+    def test_select_combines_facets(self):
+        movie, both, series, anime = (item.pk for item in self.items)
+        self.assertEqual(self.matching(genre={self.drama.pk, self.comedy.pk}), {movie, both, series, anime})
+        self.assertEqual(self.matching(genre={self.drama.pk, self.comedy.pk}, genre_mode='and'), {both})
+        self.assertEqual(self.matching(genre={self.drama.pk}, country={'США'}), {movie})
+        self.assertEqual(self.matching(year={2005, 2010}, duration={'long'}), {both})
+        self.assertEqual(self.matching(type={'movie'}, restrict_ids=[both, series]), {both})
+
+    def test_counts_ignore_own_facet_selection(self):
+        counts = self.index.counts(bitmaps.Filters(type={'movie'}, genre={self.comedy.pk}))
+        self.assertEqual(counts['type'], {'movie': 1, 'series': 1, 'anime': 0})
+        self.assertEqual(counts['genre'], {self.drama.pk: 2, self.comedy.pk: 1})
+        self.assertEqual(counts['country']['Україна'], 1)
+
+    def test_index_is_patched_on_change(self):
+        index = bitmaps.get_index()
+        item = self.items[3]
+        with self.captureOnCommitCallbacks(execute=True):
+            item.genres.add(self.comedy)
+        patched = bitmaps.get_index()
+        # Patched into a copy: a request still holding the old index keeps a consistent snapshot.
+        self.assertIsNot(patched, index)
+        self.assertEqual(patched.version, index.version + 1)
+        self.assertIn(item.pk, patched.ids_for_bits(patched.facets['genre'][self.comedy.pk]))
+        self.assertNotIn(item.pk, index.ids_for_bits(index.facets['genre'][self.comedy.pk]))
+        with self.captureOnCommitCallbacks(execute=True):
+            item.is_published = False
+            item.save()
+        self.assertNotIn(item.pk, bitmaps.get_index().ids_for_bits(bitmaps.get_index().universe))
+
+    def test_counts_while_items_change(self):
+        bitmaps.get_index()
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    bitmaps._index.counts(bitmaps.Filters(type={'movie'}))
+            except Exception as exc:
+                errors.append(exc)
+
+        readers = [threading.Thread(target=read) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        try:
+            item = self.items[0]
+            for i in range(200):
+                # A new facet value on every change grows and shrinks the facet dicts.
+                MediaItem.objects.filter(pk=item.pk).update(country=f'Країна {i}', release_year=1900 + i)
+                bitmaps._refresh_items([item.pk])
+        finally:
+            done.set()
+            for reader in readers:
+                reader.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(bitmaps.get_index().counts(bitmaps.Filters())['country']['Країна 199'], 1)
+
+    def test_catalog_filters_by_several_genres(self):
+        response = self.client.get(reverse('media_list') + '?genre=drama&genre=comedy&genre_mode=and')
+        self.assertContains(response, 'movie 2005')
+        self.assertNotContains(response, 'series 2010')
+
+
+class ReviewPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.item = MediaItem.objects.create(
+            title='Фільм', description='Опис', media_type='movie',
+            release_year=2020, country='Україна', duration=100,
+        )
+        for i in range(23):
+            user = User.objects.create_user(f'critic{i}', password='secret-pass')
+            Rating.objects.create(user=user, media_item=self.item, score=1 + i % 10, comment=f'Відгук №{i}')
+
+    def test_reviews_are_loaded_in_pages(self):
+        response = self.client.get(reverse('media_detail', args=[self.item.pk]))
+        self.assertEqual(len(response.context['ratings']), REVIEWS_PAGE_SIZE)
+        seen = [rating.pk for rating in response.context['ratings']]
+        url = response.context['reviews_next_url']
+        pages = 0
+        while url:
+            data = self.client.get(url).json()
+            seen += [int(pk) for pk in re.findall(r'data-review-id="(\d+)"', data['html'])]
+            url = data['next_url']
+            pages += 1
+        self.assertEqual(pages, 2)
+        expected = Rating.objects.filter(media_item=self.item).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(expected.values_list('pk', flat=True)))
+
+
+class UserStateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('watcher', password='secret-pass')
+        self.items = [
+            MediaItem.objects.create(
+                title=f'Тайтл {i}', description='Опис', media_type='movie',
+                release_year=2000 + i, country='Україна', duration=100,
+            )
+            for i in range(3)
+        ]
+        Watchlist.objects.create(user=self.user, media_item=self.items[0], status=Watchlist.Status.WATCHED)
+        Rating.objects.create(user=self.user, media_item=self.items[0], score=9)
+        Rating.objects.create(user=self.user, media_item=self.items[1], score=4)
+
+    def test_states_come_from_one_query(self):
+        first, second, third = (item.pk for item in self.items)
+        with QueryStats() as stats:
+            states = item_states(self.user, [first, second, third, 999999])
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(states[first]['status'], Watchlist.Status.WATCHED)
+        self.assertEqual(states[first]['score'], 9)
+        self.assertEqual((states[second]['in_watchlist'], states[second]['score']), (False, 4))
+        self.assertEqual(states[third]['score'], None)
+        self.assertFalse(states[999999]['in_watchlist'])
+
+    def test_endpoint(self):
+        url = reverse('user_item_states') + f'?ids={self.items[0].pk},oops,%C2%B2,-1,{2 ** 63},999999999999999999999999999999'
+        self.assertEqual(list(self.client.get(url).json()['items']), [str(self.items[0].pk)])
+        self.assertEqual(self.client.get(url).json()['items'][str(self.items[0].pk)]['score'], None)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertEqual(response.json()['items'][str(self.items[0].pk)]['status_label'], 'Переглянуто')
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a, self.b, self.c, self.d = [
+            MediaItem.objects.create(
+                title=f'Тайтл {i}', description='Опис', media_type='movie',
+                release_year=2000, country='Україна', duration=100,
+            )
+            for i in range(4)
+        ]
+        for i in range(4):
+            fan = User.objects.create_user(f'fan{i}', password='secret-pass')
+            Rating.objects.create(user=fan, media_item=self.a, score=9)
+            Rating.objects.create(user=fan, media_item=self.b, score=8 + i % 2)
+            Rating.objects.create(user=fan, media_item=self.c, score=2)
+
+    def test_neighbours_follow_co_ratings(self):
+        collaborative.refresh()
+        with QueryStats() as stats:
+            similar = similar_items(self.a)
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(similar, [self.b])
+        self.assertFalse(ItemNeighbor.objects.filter(media_item=self.a, neighbor=self.c).exists())
+
+        newcomer = User.objects.create_user('newcomer', password='secret-pass')
+        Rating.objects.create(user=newcomer, media_item=self.a, score=10)
+        Rating.objects.create(user=newcomer, media_item=self.d, score=3)
+        self.assertEqual(recommended_for(newcomer), [self.b])
+
+        response = self.client.get(reverse('media_detail', args=[self.a.pk]))
+        self.assertEqual(response.context['also_liked'], [self.b])
+
+    def test_stale_refresh_only_touches_changed_items(self):
+        collaborative.refresh_stale()
+        self.assertFalse(MediaItem.objects.filter(neighbors_stale=True).exists())
+        self.assertEqual(collaborative.refresh_stale(), set())
+
+        Rating.objects.create(user=User.objects.get(username='fan0'), media_item=self.d, score=9)
+        self.assertEqual(list(MediaItem.objects.filter(neighbors_stale=True)), [self.d])
+        refreshed = collaborative.refresh_stale()
+        self.assertIn(self.d.pk, refreshed)
+        self.assertNotIn(self.c.pk, refreshed)
+
+    def test_similar_titles_cover_unrated_items(self):
+        space = Genre.objects.create(name='Фантастика', slug='sci-fi')
+        romance = Genre.objects.create(name='Мелодрама', slug='romance')
+        probe = MediaItem.objects.create(
+            title='Зоряний шлях', description='Екіпаж космічного корабля досліджує далекі галактики.',
+            media_type='series', release_year=2016, country='США', duration=45,
+        )
+        probe.genres.add(space)
+        romantic = MediaItem.objects.create(
+            title='Літо в Парижі', description='Історія кохання двох студентів.',
+            media_type='movie', release_year=1995, country='Франція', duration=110,
+        )
+        romantic.genres.add(romance)
+        content.refresh()
+        self.assertNotIn(probe, similar_items(romantic, ItemNeighbor.Kind.CONTENT)[:1])
+
+        sequel = MediaItem.objects.create(
+            title='Зоряний шлях: новий екіпаж', description='Космічного корабля екіпаж вирушає до галактики.',
+            media_type='series', release_year=2018, country='США', duration=45,
+        )
+        sequel.genres.add(space)
+        refreshed = content.item_changed(sequel.pk)
+        self.assertIn(probe.pk, refreshed)
+        self.assertEqual(similar_items(sequel, ItemNeighbor.Kind.CONTENT)[0], probe)
+        self.assertEqual(similar_items(probe, ItemNeighbor.Kind.CONTENT)[0], sequel)
+
+    def scores_of(self, item, matrix):
+        scores = matrix.similarities([matrix.positions[item.pk]]).toarray().ravel()
+        return {int(pk): float(score) for pk, score in zip(matrix.item_ids, scores) if pk != item.pk}
+
+    def test_saving_an_item_rebuilds_only_its_row(self):
+        space = Genre.objects.create(name='Фантастика', slug='sci-fi')
+        content.refresh()
+        self.a.genres.add(space)
+        MediaItem.objects.filter(pk=self.a.pk).update(release_year=2024)
+        with patch.object(content.ContentMatrix, 'load', side_effect=AssertionError('full load')), QueryStats() as stats:
+            content.item_changed(self.a.pk)
+        token_reads = [sql for sql, _ in stats.queries if 'FROM "catalog_searchtoken"' in sql]
+        self.assertEqual(len(token_reads), 1)
+        self.assertIn('"catalog_searchtoken"."media_item_id" = ', token_reads[0])
+
+        # Same scores as a full load: the unseen genre and year bin only change the row's norm.
+        patched, loaded = (self.scores_of(self.a, matrix) for matrix in (content._matrix, content.ContentMatrix.load()))
+        self.assertEqual(patched.keys(), loaded.keys())
+        for pk, score in loaded.items():
+            self.assertAlmostEqual(patched[pk], score, msg=pk)
+
+    def test_admin_refresh_failures_are_logged(self):
+        with patch.object(content, 'item_changed', side_effect=RuntimeError('boom')), self.assertLogs('catalog.admin', 'ERROR'):
+            refresh_similar_titles(self.a.pk)
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old, self.fresh, self.quiet = [
+            MediaItem.objects.create(
+                title=f'Тайтл {i}', description='Опис', media_type='anime',
+                release_year=2000, country='Японія', duration=24,
+            )
+            for i in range(3)
+        ]
+        self.now = timezone.now()
+
+    def test_events_feed_decayed_and_weekly_scores(self):
+        user = User.objects.create_user('fan', password='secret-pass')
+        Rating.objects.create(user=user, media_item=self.fresh, score=8)
+        Watchlist.objects.create(user=user, media_item=self.fresh)
+        self.assertEqual(
+            TrendingScore.objects.get(pk=self.fresh.pk).week_score,
+            trending.RATING_ADDED + trending.WATCHLIST_ADDED,
+        )
+
+        # Older activity counts for less, however much of it there was.
+        trending.record(self.old.pk, 8, now=self.now - timedelta(days=8))
+        trending.record(self.fresh.pk, 1, now=self.now)
+        with QueryStats() as stats:
+            sections = trending.sections('score')
+        self.assertEqual(stats.count, 1)
+        self.assertEqual(sections['anime'], [self.fresh, self.old])
+        self.assertEqual(sections['movie'], [])
+
+    def test_compaction_keeps_order_and_expires_old_days(self):
+        trending.record(self.old.pk, 8, now=self.now - timedelta(days=8))
+        trending.record(self.fresh.pk, 1, now=self.now)
+        before = trending.sections('score')['anime']
+
+        self.assertEqual(trending.compact(now=self.now), 1)
+        self.assertEqual(trending.sections('score')['anime'], before)
+        self.assertAlmostEqual(TrendingScore.objects.get(pk=self.old.pk).score, 8 / 16, places=3)
+        self.assertEqual(TrendingScore.objects.get(pk=self.old.pk).week_score, 0)
+        self.assertEqual(trending.sections('week_score')['anime'], [self.fresh])
+        self.assertFalse(TrendingBucket.objects.filter(media_item=self.old).exists())
+
+
+class TopChartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.genre = Genre.objects.create(name='Драма', slug='drama')
+        self.lucky, self.classic, self.other = [
+            MediaItem.objects.create(
+                title=title, description='Опис', media_type='movie',
+                release_year=1990, country='Україна', duration=100,
+            )
+            for title in ('Один голос', 'Класика', 'Інший жанр')
+        ]
+        self.lucky.genres.add(self.genre)
+        self.classic.genres.add(self.genre)
+        Rating.objects.create(user=User.objects.create(username='solo'), media_item=self.lucky, score=10)
+        for i in range(20):
+            user = User.objects.create(username=f'critic{i}')
+            Rating.objects.create(user=user, media_item=self.classic, score=8)
+            Rating.objects.create(user=user, media_item=self.other, score=9)
+
+    def test_weighted_rating_prefers_widely_rated_items(self):
+        self.lucky.refresh_from_db()
+        self.assertEqual(self.lucky.avg_rating, 10)
+        self.assertLess(self.lucky.weighted_rating, MediaItem.objects.get(pk=self.classic.pk).weighted_rating)
+
+        response = self.client.get(reverse('media_list') + '?sort=-avg_rating')
+        self.assertEqual(response.context['current_sort'], '-weighted_rating')
+        self.assertEqual(list(response.context['page_obj']), [self.other, self.classic, self.lucky])
+
+    def test_genre_chart_is_materialized(self):
+        entries = ChartEntry.objects.filter(genre=self.genre).order_by(*charts.ORDERING)
+        self.assertEqual([entry.media_item_id for entry in entries], [self.classic.pk, self.lucky.pk])
+        self.assertEqual(entries[0].weighted_rating, MediaItem.objects.get(pk=self.classic.pk).weighted_rating)
+
+        url = reverse('media_list') + '?genre=drama&sort=-weighted_rating'
+        self.assertEqual(list(self.client.get(url).context['page_obj']), [self.classic, self.lucky])
+
+        self.classic.is_published = False
+        self.classic.save()
+        self.lucky.genres.remove(self.genre)
+        self.assertFalse(ChartEntry.objects.filter(genre=self.genre).exists())
+        self.other.genres.add(self.genre)
+        self.assertEqual(charts.rebuild(), 1)
+        cache.clear()
+        self.assertEqual(list(self.client.get(url).context['page_obj']), [self.other])
+
+
+class UserStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='counter')
+        self.movie, self.series = [
+            MediaItem.objects.create(
+                title=title, description='Опис', media_type=media_type,
+                release_year=2000, country='Україна', duration=100,
+            )
+            for title, media_type in (('Фільм', 'movie'), ('Серіал', 'series'))
+        ]
+
+    def assertConsistent(self):
+        self.assertEqual(user_stats.recompute([self.user.pk], dry_run=True), [])
+
+    def test_counters_follow_watchlist_and_ratings(self):
+        entry = Watchlist.objects.create(user=self.user, media_item=self.movie)
+        Watchlist.objects.create(user=self.user, media_item=self.series, status=Watchlist.Status.FAVORITE)
+        entry = Watchlist.objects.get(pk=entry.pk)
+        entry.status = Watchlist.Status.WATCHED
+        entry.save(update_fields=['status'])
+        rating = Rating.objects.create(user=self.user, media_item=self.movie, score=8, comment='Добре')
+        Rating.objects.update_or_create(user=self.user, media_item=self.series, defaults={'score': 5})
+        self.assertConsistent()
+
+        stats = UserStats.objects.get(pk=self.user.pk)
+        self.assertEqual((stats.watchlist_count, stats.watched_count, stats.favorite_count), (2, 1, 1))
+        self.assertEqual((stats.movie_count, stats.series_count), (1, 1))
+        self.assertEqual((stats.rating_count, stats.average_score, stats.comment_count), (2, 6.5, 1))
+
+        rating.comment = ''
+        rating.save()
+        rating.delete()
+        self.series.media_type = 'anime'
+        self.series.save()
+        entry.delete()
+        self.assertConsistent()
+        stats.refresh_from_db()
+        self.assertEqual((stats.watchlist_count, stats.anime_count, stats.comment_count), (1, 1, 0))
+
+    def test_missing_rows_are_rebuilt(self):
+        Watchlist.objects.create(user=self.user, media_item=self.movie)
+        UserStats.objects.all().delete()
+        self.assertEqual(user_stats.recompute(dry_run=True), [self.user.pk])
+        self.assertEqual(user_stats.stats_for(self.user).planned_count, 1)
+
+        self.client.force_login(self.user)
+        with QueryStats() as stats:
+            response = self.client.get(reverse('user_watchlist'))
+        self.assertEqual(response.context['status_tabs'][0]['count'], 1)
+        counters = [sql for sql, _ in stats.queries if 'COUNT(' in sql.upper()]
+        self.assertEqual(counters, [])
+
+
+class WatchlistPageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='collector')
+        statuses = list(Watchlist.Status.values)
+        for i in range(30):
+            item = MediaItem.objects.create(
+                title=f'{"Зоряний" if i % 2 else "Морський"} шлях {i}', description='Опис',
+                media_type='movie' if i % 3 else 'anime', release_year=2000, country='Україна', duration=100,
+            )
+            Watchlist.objects.create(user=self.user, media_item=item, status=statuses[i % 3])
+        self.client.force_login(self.user)
+
+    def test_search_counts_and_cursor_pages(self):
+        url = reverse('user_watchlist') + '?q=зоряни'
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_watchlist_count'], 15)
+        self.assertEqual(sum(tab['count'] for tab in response.context['status_tabs']), 15)
+        self.assertTrue(all('Зоряний' in entry.media_item.title for entry in response.context['watchlist']))
+
+        response = self.client.get(reverse('user_watchlist') + '?type=anime&status=planned')
+        self.assertEqual([tab['count'] for tab in response.context['status_tabs']], [10, 0, 0])
+
+        seen = []
+        url = reverse('user_watchlist')
+        while url:
+            response = self.client.get(url)
+            seen += [entry.pk for entry in response.context['watchlist']]
+            url = response.context['next_page_url'] and reverse('user_watchlist') + response.context['next_page_url']
+        self.assertEqual(seen, list(Watchlist.objects.filter(user=self.user).order_by('-added_at', '-id').values_list('pk', flat=True)))
+
+
+class BulkWatchlistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='organizer')
+        self.items = [
+            MediaItem.objects.create(
+                title=f'Тайтл {i}', description='Опис', media_type='series' if i % 2 else 'movie',
+                release_year=2000, country='Україна', duration=100,
+            )
+            for i in range(40)
+        ]
+        self.client.force_login(self.user)
+
+    def post(self, action, items, status=None):
+        data = {'action': action, 'ids': ','.join(str(item.pk) for item in items)}
+        if status:
+            data['status'] = status
+        with QueryStats() as stats:
+            response = self.client.post(reverse('bulk_watchlist'), data)
+        return response, stats.count
+
+    def test_bulk_changes_cost_constant_queries(self):
+        for item in (self.items[0], self.items[5]):
+            Watchlist.objects.create(user=self.user, media_item=item, status=Watchlist.Status.WATCHED)
+        response, few = self.post('add', self.items[:5], 'planned')
+        self.assertEqual((response.json()['added'], response.json()['updated']), (4, 1))
+        response, many = self.post('add', self.items[5:], 'planned')
+        self.assertEqual(few, many)
+        self.assertEqual(response.json()['counts']['planned'], 40)
+        self.assertEqual(TrendingScore.objects.filter(week_score=trending.WATCHLIST_ADDED).count(), 38)
+
+        response, _ = self.post('status', self.items[:10] + [MediaItem(pk=999999)], 'favorite')
+        self.assertEqual(response.json()['updated'], 10)
+        neighbour = Watchlist.objects.create(user=User.objects.create(username='neighbour'), media_item=self.items[35])
+        response, _ = self.post('remove', self.items[30:])
+        self.assertEqual(response.json()['removed'], 10)
+        self.assertTrue(Watchlist.objects.filter(pk=neighbour.pk).exists())
+        self.assertEqual(response.json()['counts'], {'planned': 20, 'watched': 0, 'favorite': 10})
+        self.assertEqual(response.json()['total'], Watchlist.objects.filter(user=self.user).count())
+        self.assertEqual(user_stats.recompute([self.user.pk], dry_run=True), [])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.post('add', self.items[:2], 'unknown')[0].status_code, 400)
+        self.assertEqual(self.post('archive', self.items[:2])[0].status_code, 400)
+        self.assertEqual(self.client.get(reverse('bulk_watchlist')).status_code, 405)
+        self.assertFalse(Watchlist.objects.exists())
+        response = self.client.post(reverse('bulk_watchlist'), {'action': 'add', 'status': 'planned', 'ids': f'²,{self.items[0].pk}'})
+        self.assertEqual(response.json()['added'], 1)
+
+
+class HistoryTransferTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create(username='exporter')
+        self.items = [
+            MediaItem.objects.create(
+                title=f'Тайтл "{i}", частина', description='Опис', media_type='anime',
+                release_year=2000, country='Україна', duration=24,
+            )
+            for i in range(6)
+        ]
+        for i, item in enumerate(self.items[:4]):
+            Watchlist.objects.create(user=self.owner, media_item=item, status=Watchlist.Status.values[i % 3])
+            Rating.objects.create(user=self.owner, media_item=item, score=i + 5, comment=f'Рядок 1\nрядок {i}' if i % 2 else '')
+        self.client.force_login(self.owner)
+
+    def download(self, fmt):
+        response = self.client.get(reverse('export_history') + f'?format={fmt}')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def history_of(self, user):
+        return (
+            sorted(Watchlist.objects.filter(user=user).values_list('media_item_id', 'status')),
+            sorted(Rating.objects.filter(user=user).values_list('media_item_id', 'score', 'comment')),
+        )
+
+    def test_round_trip(self):
+        for fmt in history.FORMATS:
+            with self.subTest(format=fmt):
+                content = self.download(fmt)
+                target = User.objects.create(username=f'importer-{fmt}')
+                self.client.force_login(target)
+                upload = SimpleUploadedFile(f'export.{fmt}', content)
+                self.client.post(reverse('import_history'), {'file': upload})
+                self.assertEqual(self.history_of(target), self.history_of(self.owner))
+                self.assertEqual(user_stats.recompute([target.pk], dry_run=True), [])
+                self.client.force_login(self.owner)
+        rated = MediaItem.objects.get(pk=self.items[1].pk)
+        self.assertEqual((rated.rating_count, rated.rating_sum), (3, 18))
+
+    def test_json_is_parsed_incrementally(self):
+        content = self.download('json')
+        with patch.object(history, 'READ_SIZE', 7):
+            records = list(history._json_objects(io.BytesIO(content)))
+        self.assertEqual(len(records), 8)
+        with self.assertRaises(history.HistoryImportError) as error:
+            history.import_history(self.owner, io.BytesIO(content[:len(content) // 2]), 'json')
+        self.assertEqual(error.exception.result['skipped'], 0)
+
+    def test_malformed_json_fails_without_reading_on(self):
+        valid = json.dumps({'kind': 'rating', 'media_item_id': self.items[5].pk, 'score': 7})
+        content = ('[' + valid + ', {"kind": "rating", oops}, ' + ', '.join([valid] * 5000) + ']').encode()
+        stream = io.BytesIO(content)
+        with patch.object(history, 'READ_SIZE', 100), self.assertRaises(history.HistoryImportError) as error:
+            history.import_history(self.owner, stream, 'json')
+        self.assertIn('Malformed JSON record', str(error.exception))
+        self.assertLess(stream.tell(), 16 * 1024)
+        self.assertEqual(error.exception.result['ratings'], 1)
+
+        oversized = ('[{"comment": "' + 'x' * 200 + '"}]').encode()
+        with patch.multiple(history, READ_SIZE=50, MAX_RECORD_SIZE=100), self.assertRaises(history.HistoryImportError):
+            list(history._json_objects(io.BytesIO(oversized)))
+
+    def test_comment_only_import_refreshes_cached_pages(self):
+        item = self.items[1]
+        version = MediaItem.objects.get(pk=item.pk).content_version
+        detail = reverse('media_detail', args=[item.pk])
+        self.client.logout()
+        self.assertContains(self.client.get(detail), 'рядок 1')
+
+        rows = f'{",".join(history.FIELDS)}\nrating,{item.pk},,,6,Новий коментар,\n'
+        history.import_history(self.owner, io.BytesIO(rows.encode()), 'csv')
+        self.assertEqual(MediaItem.objects.get(pk=item.pk).content_version, version + 1)
+        self.assertContains(self.client.get(detail), 'Новий коментар')
+
+    def test_invalid_records_are_skipped(self):
+        rows = '\n'.join([
+            ','.join(history.FIELDS),
+            f'rating,{self.items[5].pk},,,11,,',
+            f'watchlist,{self.items[5].pk},,archived,,,',
+            'rating,999999,,,5,,',
+            f'watchlist,{self.items[5].pk},,favorite,,,',
+        ])
+        result = history.import_history(self.owner, io.BytesIO(rows.encode()), 'csv')
+        self.assertEqual(result, {'watchlist': 1, 'ratings': 0, 'skipped': 3})
+
+
+class EpisodeProgressTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='binger')
+        self.anime = MediaItem.objects.create(
+            title='Довге аніме', description='Опис', media_type='anime',
+            release_year=1999, country='Японія', duration=24,
+        )
+        self.long_season = Season.objects.create(media_item=self.anime, season_number=1, release_year=1999, episodes_count=1100)
+        self.short_season = Season.objects.create(media_item=self.anime, season_number=2, release_year=2020, episodes_count=12)
+        Watchlist.objects.create(user=self.user, media_item=self.anime)
+        self.client.force_login(self.user)
+
+    def test_ranges_are_stored_as_one_bitmap_row(self):
+        self.assertEqual(progress.mark(self.user, self.long_season, 1, 500), 500)
+        self.assertEqual(progress.mark(self.user, self.long_season, 101, 200, watched=False), 400)
+        self.assertEqual(progress.mark(self.user, self.long_season, 1090, 5000), 411)
+        row = EpisodeProgress.objects.get(user=self.user, season=self.long_season)
+        self.assertEqual(len(bytes(row.watched)), 138)
+        self.assertEqual(EpisodeProgress.objects.count(), 1)
+
+        progress.mark_all(self.user, self.short_season)
+        self.assertEqual(progress.item_progress(self.user, [self.anime.pk]), {self.anime.pk: round(100 * 423 / 1112)})
+
+        self.long_season.episodes_count = 1000
+        self.long_season.save()
+        self.assertEqual(EpisodeProgress.objects.get(pk=row.pk).watched_count, 400)
+        progress.mark_all(self.user, self.short_season, watched=False)
+        self.assertFalse(EpisodeProgress.objects.filter(season=self.short_season).exists())
+
+    def test_pages_show_progress(self):
+        self.client.post(reverse('update_progress', args=[self.anime.pk]), {'season': self.short_season.pk, 'first': 1, 'last': 6})
+        response = self.client.get(reverse('media_detail', args=[self.anime.pk]))
+        self.assertEqual([season.watched for season in response.context['season_progress']], [0, 6])
+        self.assertEqual(response.context['progress_percent'], 1)
+        response = self.client.get(reverse('user_watchlist'))
+        self.assertEqual(response.context['watchlist'][0].progress_percent, 1)
+        other = Season.objects.create(
+            media_item=MediaItem.objects.create(
+                title='Інше', description='Опис', media_type='series', release_year=2000, country='Україна', duration=40,
+            ),
+            season_number=1, release_year=2000, episodes_count=3,
+        )
+        response = self.client.post(reverse('update_progress', args=[self.anime.pk]), {'season': other.pk})
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_input_is_rejected(self):
+        url = reverse('update_progress', args=[self.anime.pk])
+        self.assertEqual(self.client.post(url, {'season': 'abc'}).status_code, 404)
+        for first, last in (('²', ''), ('1', 'x'), ('1.5', '3')):
+            response = self.client.post(url, {'season': self.short_season.pk, 'first': first, 'last': last})
+            self.assertRedirects(response, reverse('media_detail', args=[self.anime.pk]), fetch_redirect_response=False)
+        self.assertFalse(EpisodeProgress.objects.exists())
+        self.client.post(url, {'season': self.short_season.pk, 'first': ' 3 ', 'last': ''})
+        self.assertEqual(EpisodeProgress.objects.get().watched_count, 10)
+
+
+class PosterVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, name, size=(1200, 1800)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 120, 160)).save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def create_item(self, **fields):
+        return MediaItem.objects.create(
+            title='Постер', description='Опис', media_type='movie',
+            release_year=2020, country='Україна', duration=100, **fields,
+        )
+
+    def test_upload_writes_variants_and_pages_serve_srcset(self):
+        item = self.create_item(poster=self.upload('poster.jpg'))
+        item.refresh_from_db()
+        self.assertEqual(item.poster_variants['widths'], list(posters.WIDTHS))
+        self.assertIn('webp', item.poster_variants['formats'])
+        for fmt in item.poster_variants['formats']:
+            with Image.open(item.poster.storage.path(posters.variant_name(item.poster.name, 320, fmt))) as image:
+                self.assertEqual(image.size, (320, 480))
+
+        webp = posters.variant_name(item.poster.name, 640, 'webp')
+        for name in ('home', 'media_list'):
+            self.assertContains(self.client.get(reverse(name)), f'{item.poster.storage.url(webp)} 640w')
+        detail = self.client.get(reverse('media_detail', args=[item.pk]))
+        self.assertContains(detail, 'type="image/webp"')
+        self.assertContains(detail, f'src="{item.poster.url}"')
+
+        result = self.client.get(reverse('search_suggestions'), {'q': 'Пос'}).json()['results'][0]
+        self.assertEqual(result['poster'], item.poster.url)
+        self.assertIn('-112w.webp 112w', result['poster_sources'][-1]['srcset'])
+
+    def test_replacing_the_poster_replaces_variants(self):
+        item = self.create_item(poster=self.upload('first.jpg', size=(200, 300)))
+        old_variant = item.poster.storage.path(posters.variant_name(item.poster.name, 200, 'webp'))
+        self.assertTrue(os.path.exists(old_variant))
+        # Never upscaled: the widths stop at the original's.
+        self.assertEqual(item.poster_variants['widths'], [56, 112, 200])
+
+        item = MediaItem.objects.get(pk=item.pk)
+        item.poster = self.upload('second.jpg')
+        item.save()
+        self.assertFalse(os.path.exists(old_variant))
+        self.assertEqual(MediaItem.objects.get(pk=item.pk).poster_variants['widths'], list(posters.WIDTHS))
+
+        item.poster = None
+        item.save()
+        self.assertEqual(MediaItem.objects.get(pk=item.pk).poster_variants, {})
+
+    def test_backfill_command(self):
+        item = self.create_item(poster=self.upload('legacy.jpg'))
+        MediaItem.objects.filter(pk=item.pk).update(poster_variants={})
+        with self.assertLogs('catalog.posters', 'WARNING'):
+            broken = self.create_item(poster=SimpleUploadedFile('broken.jpg', b'not an image'))
+        self.assertEqual(MediaItem.objects.get(pk=broken.pk).poster_variants, {})
+
+        out = io.StringIO()
+        with self.assertLogs('catalog.posters', 'WARNING'):
+            call_command('build_poster_variants', stdout=out)
+        self.assertIn('Built poster variants for 1 items.', out.getvalue())
+        self.assertIn('1 posters could not be read', out.getvalue())
+        self.assertEqual(MediaItem.objects.get(pk=item.pk).poster_variants['widths'], list(posters.WIDTHS))
+        # Without variants the page keeps serving the original.
+        self.assertNotContains(self.client.get(reverse('media_detail', args=[broken.pk])), '<source')
+
+
+def create_titled(title, original_title='', description='Опис', **fields):
+    fields.setdefault('media_type', 'movie')
+    return MediaItem.objects.create(
+        title=title, original_title=original_title, description=description,
+        release_year=fields.pop('release_year', 2000), country='Україна', duration=100, **fields,
+    )
+
+
+class TokenIndexTests(TestCase):
+    def setUp(self):
+        self.in_title = create_titled('Мʼята ніч', description='Детектив у нічному місті.')
+        self.in_description = create_titled('Тиша', description='Мʼята записка і нічні розмови.')
+        self.other = create_titled('Океан', original_title='Ocean Story', description='Про море.')
+
+    def ids(self, query):
+        return [pk for pk, _ in token_index.search(query)]
+
+    def test_ranks_titles_above_descriptions_and_requires_every_term(self):
+        self.assertEqual(self.ids("м'ята"), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self.ids('НІЧ'), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self.ids('мята записка'), [self.in_description.pk])
+        self.assertEqual(self.ids('ocean'), [self.other.pk])
+        self.assertEqual(self.ids('мята океан'), [])
+        self.assertEqual(token_index.item_tokens(self.in_title)['мята'], token_index.FIELD_WEIGHTS['title'])
+
+    def test_index_follows_saves_unpublishing_and_deletes(self):
+        self.other.title = 'Мʼятний океан'
+        self.other.save()
+        self.assertIn(self.other.pk, self.ids('мят'))
+        self.other.is_published = False
+        self.other.save()
+        self.assertFalse(SearchToken.objects.filter(media_item=self.other).exists())
+        self.in_title.delete()
+        self.assertEqual(self.ids('мята'), [self.in_description.pk])
+
+        SearchToken.objects.all().delete()
+        self.assertEqual(token_index.rebuild(), 1)
+        self.assertEqual(self.ids('тиша'), [self.in_description.pk])
+
+
+class FTS5SearchTests(TestCase):
+    def setUp(self):
+        self.backend = get_search_backend('fts5')
+        if not isinstance(self.backend, FTS5SearchBackend):
+            self.skipTest('SQLite was built without FTS5.')
+        self.title_hit = create_titled('Космічна одіссея', description='Класика.')
+        self.description_hit = create_titled('Дорога', description='Подорож через космічний простір і час.')
+        create_titled('Сад', description='Про квіти.')
+
+    def test_bm25_ranking_prefixes_and_snippets(self):
+        hits = self.backend.search('косміч')
+        self.assertEqual([hit.pk for hit in hits], [self.title_hit.pk, self.description_hit.pk])
+        self.assertGreater(hits[0].score, hits[1].score)
+        self.assertIn('<mark>', hits[1].snippet)
+        self.assertEqual(self.backend.count('косміч простір'), 1)
+        # The engine splits words on apostrophes, so they become phrases.
+        self.assertEqual(fts_match_expression("мʼята  НІЧ"), '"м ята"* AND "ніч"*')
+        apostrophe = create_titled("Мʼята")
+        self.assertEqual(self.backend.match_ids("м'ята"), [apostrophe.pk])
+        self.assertEqual(self.backend.search(')(*'), [])
+
+    def test_triggers_keep_the_index_in_sync(self):
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE catalog_mediaitem SET title = %s WHERE id = %s', ['Зоряний сад', self.title_hit.pk])
+        self.assertEqual(self.backend.match_ids('зоряний'), [self.title_hit.pk])
+        self.assertEqual(self.backend.match_ids('одіссея'), [])
+        MediaItem.objects.filter(pk=self.description_hit.pk).update(is_published=False)
+        self.assertEqual(self.backend.count('космічний'), 0)
+        self.description_hit.delete()
+        self.assertEqual(
+            list(MediaItem.objects.filter(pk__in=self.backend.match_condition('подорож')).values_list('pk', flat=True)), [],
+        )
+
+    def test_ensure_schema_restores_dropped_triggers(self):
+        self.assertFalse(fts.ensure_schema(connection))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {fts.FTS_TABLE}_ai')
+        late = create_titled('Пізній прихід')
+        self.assertEqual(self.backend.match_ids('пізній'), [])
+        self.assertTrue(fts.ensure_schema(connection))
+        self.assertEqual(self.backend.match_ids('пізній'), [late.pk])
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.chainsaw = create_titled('Людина-бензопила', original_title='Chainsaw Man', media_type='anime')
+        self.human = create_titled('Людина-павук')
+        self.long_title = create_titled('Неймовірно довга назва фільму про пригоди')
+
+    def titles(self, query):
+        return [item.title for item in autocomplete.suggest(query)]
+
+    def test_suggests_word_starts_ranked_by_popularity(self):
+        self.assertEqual(set(self.titles('люд')), {'Людина-бензопила', 'Людина-павук'})
+        self.assertEqual(self.titles('бензо'), ['Людина-бензопила'])
+        self.assertEqual(self.titles('chainsaw m'), ['Людина-бензопила'])
+        self.assertEqual(self.titles('ман'), [])
+
+        fan = User.objects.create(username='chainsaw-fan')
+        Rating.objects.create(user=fan, media_item=self.human, score=9)
+        self.assertEqual(self.titles('людина'), ['Людина-павук', 'Людина-бензопила'])
+
+    def test_long_queries_and_index_updates(self):
+        self.assertGreater(len('довга назва фільму про пригоди'), autocomplete.MAX_PREFIX_LENGTH)
+        self.assertEqual(self.titles('довга назва фільму про пригоди'), [self.long_title.title])
+        self.assertEqual(self.titles('довга назва фільму про пригодницький'), [])
+
+        self.human.is_published = False
+        self.human.save()
+        self.assertEqual(self.titles('людина'), ['Людина-бензопила'])
+        self.chainsaw.delete()
+        self.assertFalse(AutocompletePrefix.objects.filter(prefix='л').exists())
+
+
+    def test_suggestions_endpoint_reuses_autocomplete_rows(self):
+        cache.clear()
+        with QueryStats() as stats:
+            results = self.client.get(reverse('search_suggestions'), {'q': 'бензо'}).json()['results']
+        self.assertEqual([result['id'] for result in results], [self.chainsaw.pk])
+        self.assertFalse([sql for sql, _ in stats.queries if '"catalog_mediaitem"."id" IN' in sql])
+        # Description matches come from the full-text fallback and are loaded by id.
+        results = self.client.get(reverse('search_suggestions'), {'q': 'Опис'}).json()['results']
+        self.assertEqual({result['id'] for result in results}, {self.chainsaw.pk, self.human.pk, self.long_title.pk})
+
+class FuzzySearchTests(TestCase):
+    def setUp(self):
+        self.bleach = create_titled('Бліч', original_title='Bleach', media_type='anime')
+        self.death_note = create_titled('Зошит смерті', original_title='Death Note', media_type='anime')
+
+    def test_folding_merges_spellings_and_alphabets(self):
+        self.assertEqual(fuzzy.fold('Бліч'), fuzzy.fold('Блич'))
+        self.assertEqual(fuzzy.fold('Bleach'), fuzzy.fold('Бліч'))
+        self.assertEqual(fuzzy.fold('Щастя'), 'shasta')
+
+    def test_typos_and_transliteration_match(self):
+        self.assertEqual(fuzzy.similar_ids('Блич')[0][0], self.bleach.pk)
+        self.assertEqual(fuzzy.similar_ids('zoshyt smerti')[0][0], self.death_note.pk)
+        self.assertEqual(fuzzy.similar_ids('Зошыт смерти')[0][0], self.death_note.pk)
+        self.assertEqual(fuzzy.similar_ids('Дет ноут')[0][0], self.death_note.pk)
+        self.assertEqual(fuzzy.similar_ids('Океан'), [])
+        self.assertEqual(fuzzy.similar_ids('Блич', exclude=[self.bleach.pk]), [])
+
+        response = self.client.get(reverse('search'), {'q': 'Блич'})
+        self.assertEqual([item.pk for item in response.context['results']], [self.bleach.pk])
+        self.assertTrue(response.context['results'][0].fuzzy_match)
+
+    def test_index_follows_saves_unpublishing_and_deletes(self):
+        self.bleach.title = 'Бліч: Тисячолітня війна'
+        self.bleach.save()
+        self.assertEqual(fuzzy.similar_ids('тисячолітня')[0][0], self.bleach.pk)
+        self.bleach.is_published = False
+        self.bleach.save()
+        self.assertEqual(fuzzy.similar_ids('Блич'), [])
+        self.death_note.delete()
+        self.assertFalse(TitleTrigram.objects.exists())
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.item = create_titled('Перший')
+        self.other = create_titled('Другий')
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+
+    def assertAggregates(self, item, scores):
+        item = MediaItem.objects.get(pk=item.pk)
+        histogram = [scores.count(score) for score in range(1, 11)]
+        self.assertEqual((item.rating_sum, item.rating_count, item.rating_histogram), (sum(scores), len(scores), histogram))
+        self.assertAlmostEqual(item.avg_rating, sum(scores) / len(scores) if scores else 0)
+        self.assertAlmostEqual(item.weighted_rating, ratings.weighted_rating(sum(scores), len(scores)))
+
+    def test_deltas_follow_every_rating_change(self):
+        first = Rating.objects.create(user=self.alice, media_item=self.item, score=8)
+        Rating.objects.create(user=self.bob, media_item=self.item, score=4)
+        self.assertAggregates(self.item, [8, 4])
+
+        first = Rating.objects.get(pk=first.pk)
+        first.score = 10
+        first.save()
+        self.assertAggregates(self.item, [10, 4])
+
+        first.media_item = self.other
+        first.save()
+        self.assertAggregates(self.item, [4])
+        self.assertAggregates(self.other, [10])
+
+        Rating.objects.get(user=self.bob).delete()
+        self.assertAggregates(self.item, [])
+        self.assertEqual(ratings.recompute(dry_run=True), [])
+
+    def test_repair_command_fixes_drift(self):
+        Rating.objects.create(user=self.alice, media_item=self.item, score=6)
+        Rating.objects.create(user=self.bob, media_item=self.item, score=9)
+        MediaItem.objects.filter(pk=self.item.pk).update(rating_sum=1, rating_count=7, rating_histogram=[0] * 10, avg_rating=0)
+
+        out = io.StringIO()
+        call_command('repair_rating_aggregates', '--dry-run', stdout=out)
+        self.assertIn(f'Items with drifted aggregates: 1 ({self.item.pk})', out.getvalue())
+        self.assertEqual(MediaItem.objects.get(pk=self.item.pk).rating_count, 7)
+
+        call_command('repair_rating_aggregates', stdout=io.StringIO())
+        self.assertAggregates(self.item, [6, 9])
+        self.assertEqual(ratings.recompute(dry_run=True), [])
+
+    def test_out_of_range_scores_are_rejected(self):
+        rating = Rating.objects.create(user=self.alice, media_item=self.item, score=6)
+        self.client.force_login(self.alice)
+        for score in ('0', '11', 'abc'):
+            with self.subTest(score=score):
+                response = self.client.post(reverse('rate_media', args=[self.other.pk]), {'score': score}, follow=True)
+                self.assertContains(response, 'Оцінка має бути цілим числом від 1 до 10.')
+                response = self.client.post(reverse('update_rating', args=[rating.pk]), {'score': score}, follow=True)
+                self.assertContains(response, 'Оцінка має бути цілим числом від 1 до 10.')
+        self.assertAggregates(self.item, [6])
+        self.assertAggregates(self.other, [])
+        with self.assertRaises(ValueError):
+            ratings.apply_change(self.item.pk, old_score=6, new_score=0)
+
+    def test_saving_a_stale_or_deferred_item_keeps_aggregates(self):
+        stale = MediaItem.objects.get(pk=self.item.pk)
+        deferred = MediaItem.objects.only('id', 'title').get(pk=self.item.pk)
+        Rating.objects.create(user=self.alice, media_item=self.item, score=7)
+
+        stale.title = 'Перший (оновлено)'
+        stale.save()
+        deferred.title = 'Перший (ще раз)'
+        with QueryStats() as stats:
+            deferred.save()
+        # Only the loaded field is written back; deferred ones are not fetched for the UPDATE.
+        self.assertEqual(stats.queries[0][0], 'UPDATE "catalog_mediaitem" SET "title" = %s WHERE "catalog_mediaitem"."id" = %s')
+        self.assertEqual(MediaItem.objects.get(pk=self.item.pk).title, 'Перший (ще раз)')
+        self.assertAggregates(self.item, [7])
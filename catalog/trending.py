@@ -0,0 +1,202 @@
+"""Trending items from rating and watchlist activity.
+
+Every event adds its weight to two counters on the item's ``TrendingScore`` row:
+
+* ``score`` decays exponentially with a ``HALF_LIFE``. Instead of decaying
+  every row as time passes, an event at time ``t`` adds
+  ``weight * 2 ** ((t - epoch) / HALF_LIFE)``: later events weigh more, which
+  orders items exactly as decaying all scores would. ``compact`` periodically
+  rescales the scores to a new epoch so the numbers stay small.
+* ``week_score`` sums the points of the last ``WEEK_DAYS`` days. Points are
+  also added to a per-day ``TrendingBucket``; ``compact`` subtracts the days
+  that fell out of the window and deletes their buckets.
+
+Both are plain columns with a ``(media_type, -column)`` index, so a section is
+one index range scan; nothing scans the rating history per request.
+"""
+import math
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest, Power
+from django.utils import timezone
+
+from . import pagecache
+from .bitmaps import ids_condition
+from .models import MediaItem, MediaItemQuerySet, Rating, TrendingBucket, TrendingEpoch, TrendingScore, Watchlist
+
+HALF_LIFE = 2 * 24 * 60 * 60  # seconds
+WEEK_DAYS = 7
+# Decayed scores below this are reset to zero on compaction.
+MIN_SCORE = 1e-3
+SECTION_SIZE = 4
+
+# Points per event.
+RATING_ADDED = 3.0
+RATING_CHANGED = 1.0
+WATCHLIST_ADDED = 2.0
+WATCHLIST_STATUS_CHANGED = 1.0
+
+
+def _epoch():
+    return TrendingEpoch.objects.values('timestamp')[:1]
+
+
+def record(item_id, weight, now=None):
+    """Add ``weight`` points of activity to ``item_id``."""
+    now = now or timezone.now()
+    timestamp = Value(now.timestamp(), output_field=FloatField())
+    epoch = Coalesce(Subquery(_epoch(), output_field=FloatField()), timestamp)
+    decayed = Value(float(weight)) * Power(Value(2.0), (timestamp - epoch) / Value(float(HALF_LIFE)))
+    day = timezone.localdate(now)
+
+    with transaction.atomic():
+        updated = TrendingScore.objects.filter(pk=item_id).update(
+            score=F('score') + decayed,
+            week_score=F('week_score') + weight,
+        )
+        if not updated:
+            media_type = MediaItem.objects.filter(pk=item_id).values_list('media_type', flat=True).first()
+            if media_type is None:
+                return
+            TrendingScore.objects.get_or_create(pk=item_id, defaults={'media_type': media_type})
+            TrendingScore.objects.filter(pk=item_id).update(
+                score=F('score') + decayed,
+                week_score=F('week_score') + weight,
+            )
+        if not TrendingBucket.objects.filter(media_item_id=item_id, day=day).update(points=F('points') + weight):
+            try:
+                with transaction.atomic():
+                    TrendingBucket.objects.create(media_item_id=item_id, day=day, points=weight)
+            except IntegrityError:
+                TrendingBucket.objects.filter(media_item_id=item_id, day=day).update(points=F('points') + weight)
+
+
+def record_many(media_types, weight, now=None):
+    """Add ``weight`` points to every item of ``{item_id: media_type}`` in a fixed number of queries."""
+    if not media_types:
+        return
+    now = now or timezone.now()
+    timestamp = Value(now.timestamp(), output_field=FloatField())
+    epoch = Coalesce(Subquery(_epoch(), output_field=FloatField()), timestamp)
+    decayed = Value(float(weight)) * Power(Value(2.0), (timestamp - epoch) / Value(float(HALF_LIFE)))
+    day = timezone.localdate(now)
+    item_ids = ids_condition(list(media_types))
+
+    with transaction.atomic():
+        TrendingScore.objects.bulk_create(
+            [TrendingScore(media_item_id=pk, media_type=media_type) for pk, media_type in media_types.items()],
+            batch_size=500, ignore_conflicts=True,
+        )
+        TrendingScore.objects.filter(pk__in=item_ids).update(
+            score=F('score') + decayed,
+            week_score=F('week_score') + weight,
+        )
+        # Existing buckets get the points first; the insert then skips them.
+        TrendingBucket.objects.filter(media_item_id__in=item_ids, day=day).update(points=F('points') + weight)
+        TrendingBucket.objects.bulk_create(
+            [TrendingBucket(media_item_id=pk, day=day, points=weight) for pk in media_types],
+            batch_size=500, ignore_conflicts=True,
+        )
+
+
+def media_type_changed(item_id, media_type):
+    TrendingScore.objects.filter(pk=item_id).exclude(media_type=media_type).update(media_type=media_type)
+
+
+def compact(now=None):
+    """Rebase decayed scores to ``now`` and drop days that left the weekly window."""
+    now = now or timezone.now()
+    cutoff = timezone.localdate(now) - timedelta(days=WEEK_DAYS - 1)
+    with transaction.atomic():
+        epoch = TrendingEpoch.objects.select_for_update().first()
+        if epoch is None:
+            epoch = TrendingEpoch(timestamp=now.timestamp())
+        else:
+            factor = 2 ** (-(now.timestamp() - epoch.timestamp) / HALF_LIFE)
+            TrendingScore.objects.update(score=F('score') * factor)
+            TrendingScore.objects.filter(score__lt=MIN_SCORE).exclude(score=0).update(score=0)
+            epoch.timestamp = now.timestamp()
+        epoch.save()
+
+        expired = TrendingBucket.objects.filter(day__lt=cutoff)
+        expired_points = (
+            expired.filter(media_item_id=OuterRef('pk')).order_by()
+            .values('media_item_id').annotate(total=Sum('points')).values('total')
+        )
+        TrendingScore.objects.filter(pk__in=expired.values('media_item_id')).update(
+            week_score=Greatest(F('week_score') - Coalesce(Subquery(expired_points), 0.0), 0.0),
+        )
+        removed, _ = expired.delete()
+    pagecache.purge()
+    return removed
+
+
+def rebuild(now=None):
+    """Recompute every score from the rating and watchlist history."""
+    now = now or timezone.now()
+    since = now - timedelta(seconds=HALF_LIFE * math.log2(1 / MIN_SCORE))
+    cutoff = timezone.localdate(now) - timedelta(days=WEEK_DAYS - 1)
+    events = [
+        (item_id, at, RATING_ADDED)
+        for item_id, at in Rating.objects.filter(created_at__gte=since).values_list('media_item_id', 'created_at')
+    ] + [
+        (item_id, at, WATCHLIST_ADDED)
+        for item_id, at in Watchlist.objects.filter(added_at__gte=since).values_list('media_item_id', 'added_at')
+    ]
+
+    scores, week, buckets = {}, {}, {}
+    for item_id, at, weight in events:
+        scores[item_id] = scores.get(item_id, 0) + weight * 2 ** ((at - now).total_seconds() / HALF_LIFE)
+        day = timezone.localdate(at)
+        if day >= cutoff:
+            week[item_id] = week.get(item_id, 0) + weight
+            buckets[item_id, day] = buckets.get((item_id, day), 0) + weight
+
+    media_types = dict(MediaItem.objects.filter(pk__in=list(scores)).values_list('pk', 'media_type'))
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingBucket.objects.all().delete()
+        TrendingEpoch.objects.all().delete()
+        TrendingEpoch.objects.create(timestamp=now.timestamp())
+        TrendingScore.objects.bulk_create([
+            TrendingScore(media_item_id=pk, media_type=media_types[pk], score=score, week_score=week.get(pk, 0))
+            for pk, score in scores.items() if pk in media_types
+        ], batch_size=500)
+        TrendingBucket.objects.bulk_create([
+            TrendingBucket(media_item_id=pk, day=day, points=points)
+            for (pk, day), points in buckets.items() if pk in media_types
+        ], batch_size=500)
+    pagecache.purge()
+    return len(scores)
+
+
+def sections(column, limit=SECTION_SIZE):
+    """``{media_type: [items]}`` with the top ``limit`` items of each type by ``column``.
+
+    One statement: a ``UNION ALL`` of per-type index range scans.
+    """
+    if column not in ('score', 'week_score'):
+        raise ValueError(f'Unknown trending column: {column}')
+    item_table = MediaItem._meta.db_table
+    score_table = TrendingScore._meta.db_table
+    fields = ', '.join(
+        f'm.{connection.ops.quote_name(MediaItem._meta.get_field(name).column)}'
+        for name in MediaItemQuerySet.CARD_FIELDS
+    )
+    part = (
+        f'SELECT * FROM (SELECT {fields}, t.{column} AS trend FROM {score_table} t '
+        f'INNER JOIN {item_table} m ON m.id = t.media_item_id '
+        f'WHERE t.media_type = %s AND t.{column} > 0 AND m.is_published = %s '
+        f'ORDER BY t.{column} DESC LIMIT %s)'
+    )
+    media_types = [code for code, _ in MediaItem.MEDIA_TYPES]
+    sql = ' UNION ALL '.join(part for _ in media_types)
+    params = [value for code in media_types for value in (code, True, limit)]
+    result = {code: [] for code in media_types}
+    for item in MediaItem.objects.raw(sql, params):
+        result[item.media_type].append(item)
+    for items in result.values():
+        items.sort(key=lambda item: (-item.trend, -item.pk))
+    return result
@@ -7,13 +7,19 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('catalog/', views.media_list, name='media_list'),
     path('media/<int:pk>/', views.media_detail, name='media_detail'),
+    path('media/<int:pk>/reviews/', views.media_reviews, name='media_reviews'),
     path('media/<int:pk>/rate/', views.rate_media, name='rate_media'),
     path('media/<int:pk>/watchlist/', views.toggle_watchlist, name='toggle_watchlist'),
+    path('media/<int:pk>/progress/', views.update_progress, name='update_progress'),
     path('ratings/<int:pk>/update/', views.update_rating, name='update_rating'),
     path('ratings/<int:pk>/delete/', views.delete_rating, name='delete_rating'),
     path('profile/', views.profile, name='profile'),
     path('watchlist/', views.user_watchlist, name='user_watchlist'),
+    path('watchlist/bulk/', views.bulk_watchlist, name='bulk_watchlist'),
     path('comments/', views.user_comments, name='user_comments'),
+    path('me/items/state/', views.user_item_states, name='user_item_states'),
+    path('me/history/export/', views.export_history, name='export_history'),
+    path('me/history/import/', views.import_history, name='import_history'),
     path('search/', views.search, name='search'),
     path('search/suggestions/', views.search_suggestions, name='search_suggestions'),
     path('register/', views.register, name='register'),
@@ -0,0 +1,43 @@
+"""Per-user state of catalog items: watchlist status and the user's own score.
+
+Pages shared by everyone (cached cards, listings) leave this out; views and the
+``user_item_states`` endpoint look it up here for a batch of items at once, in
+a single query however many items are asked for.
+"""
+from django.db.models import OuterRef, Subquery
+
+from .models import MediaItem, Rating, Watchlist
+
+MAX_ITEMS = 100
+
+
+def empty_state():
+    return {'in_watchlist': False, 'status': None, 'status_label': None, 'score': None}
+
+
+def item_states(user, item_ids):
+    """``{item_id: state}`` for every id in ``item_ids`` (at most ``MAX_ITEMS``)."""
+    item_ids = list(dict.fromkeys(item_ids))[:MAX_ITEMS]
+    states = {pk: empty_state() for pk in item_ids}
+    if not item_ids or not user.is_authenticated:
+        return states
+
+    watchlist = Watchlist.objects.filter(user=user, media_item=OuterRef('pk'))
+    ratings = Rating.objects.filter(user=user, media_item=OuterRef('pk'))
+    rows = (
+        MediaItem.objects.filter(pk__in=item_ids)
+        .annotate(
+            watchlist_status=Subquery(watchlist.values('status')[:1]),
+            own_score=Subquery(ratings.values('score')[:1]),
+        )
+        .values_list('pk', 'watchlist_status', 'own_score')
+    )
+    labels = dict(Watchlist.Status.choices)
+    for pk, status, score in rows:
+        states[pk] = {
+            'in_watchlist': status is not None,
+            'status': status,
+            'status_label': labels.get(status),
+            'score': score,
+        }
+    return states
@@ -0,0 +1,162 @@
+"""Materialized profile counters (``UserStats``).
+
+Every Watchlist and Rating save/delete shifts its owner's counters by a delta
+in one UPDATE, so the profile and watchlist pages read them all from a single
+row instead of counting per status and per media type. The row is created
+with the user; ``stats_for`` fills in a missing one from the tables, and
+``recompute`` rebuilds them for drift repair (``repair_user_stats``).
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+
+from .bitmaps import ids_condition
+from .models import MediaItem, Rating, UserStats, Watchlist
+
+COUNTER_FIELDS = tuple(field.name for field in UserStats._meta.concrete_fields if not field.primary_key)
+
+
+def _shift(user_id, deltas):
+    # Rows are never created here: on user deletion the cascade may already
+    # have removed them, and a missing row is rebuilt on the next read anyway.
+    changes = {field: Greatest(F(field) + delta, 0) for field, delta in deltas.items() if delta}
+    if changes:
+        UserStats.objects.filter(pk=user_id).update(**changes)
+
+
+def _add_entry(deltas, status, media_type, sign):
+    deltas['watchlist_count'] += sign
+    for field in (UserStats.STATUS_FIELDS.get(status), UserStats.TYPE_FIELDS.get(media_type)):
+        if field:
+            deltas[field] += sign
+
+
+def watchlist_changed(user_id, old=None, new=None):
+    """Move a watchlist entry from ``old`` to ``new``, each ``(status, media_item_id)`` or ``None``."""
+    entries = [(entry, sign) for entry, sign in ((old, -1), (new, 1)) if entry is not None]
+    media_types = {}
+    if old is None or new is None or old[1] != new[1]:
+        item_ids = {item_id for (_, item_id), _ in entries}
+        media_types = dict(MediaItem.objects.filter(pk__in=item_ids).values_list('pk', 'media_type'))
+    deltas = Counter()
+    for (status, item_id), sign in entries:
+        # Same item on both sides: the type counters cancel out.
+        _add_entry(deltas, status, media_types.get(item_id), sign)
+    _shift(user_id, deltas)
+
+
+def watchlist_bulk_changed(user_id, changes):
+    """Apply many watchlist moves at once.
+
+    ``changes`` holds ``(old_status, new_status, media_type)`` tuples; a ``None``
+    status stands for "not in the list".
+    """
+    deltas = Counter()
+    for old_status, new_status, media_type in changes:
+        if old_status is not None:
+            _add_entry(deltas, old_status, media_type, -1)
+        if new_status is not None:
+            _add_entry(deltas, new_status, media_type, 1)
+    _shift(user_id, deltas)
+
+
+def rating_changed(user_id, old=None, new=None):
+    """Move a rating from ``old`` to ``new``, each ``(score, comment)`` or ``None``."""
+    deltas = Counter()
+    for entry, sign in ((old, -1), (new, 1)):
+        if entry is not None:
+            score, comment = entry
+            deltas['rating_count'] += sign
+            deltas['rating_sum'] += sign * int(score)
+            deltas['comment_count'] += sign * bool(comment)
+    _shift(user_id, deltas)
+
+
+def media_type_changed(item_id, old_type, new_type):
+    """Recount the type of ``item_id`` for every user who has it in their watchlist."""
+    old_field = UserStats.TYPE_FIELDS.get(old_type)
+    new_field = UserStats.TYPE_FIELDS.get(new_type)
+    if old_field == new_field:
+        return
+    changes = {}
+    if old_field:
+        changes[old_field] = Greatest(F(old_field) - 1, 0)
+    if new_field:
+        changes[new_field] = F(new_field) + 1
+    users = Watchlist.objects.filter(media_item_id=item_id).values('user_id')
+    UserStats.objects.filter(pk__in=users).update(**changes)
+
+
+def expected_counters(user_ids=None):
+    """Counters computed from the Watchlist and Rating tables: ``{user_id: {field: value}}``."""
+    watchlist = Watchlist.objects.order_by()
+    ratings = Rating.objects.order_by()
+    if user_ids is not None:
+        watchlist = watchlist.filter(user_id__in=ids_condition(list(user_ids)))
+        ratings = ratings.filter(user_id__in=ids_condition(list(user_ids)))
+
+    result = {}
+
+    def counters(user_id):
+        return result.setdefault(user_id, dict.fromkeys(COUNTER_FIELDS, 0))
+
+    for user_id, status, count in watchlist.values_list('user_id', 'status').annotate(count=Count('id')):
+        counters(user_id)['watchlist_count'] += count
+        if status in UserStats.STATUS_FIELDS:
+            counters(user_id)[UserStats.STATUS_FIELDS[status]] = count
+    for user_id, media_type, count in watchlist.values_list('user_id', 'media_item__media_type').annotate(count=Count('id')):
+        if media_type in UserStats.TYPE_FIELDS:
+            counters(user_id)[UserStats.TYPE_FIELDS[media_type]] = count
+    totals = ratings.values_list('user_id').annotate(
+        count=Count('id'),
+        total=Sum('score'),
+        comments=Count('id', filter=~Q(comment='')),
+    )
+    for user_id, count, total, comments in totals:
+        counters(user_id).update(rating_count=count, rating_sum=total or 0, comment_count=comments)
+    return result
+
+
+def recompute(user_ids=None, dry_run=False):
+    """Rebuild the counters of ``user_ids`` (all users when ``None``).
+
+    Returns the ids of users whose row was missing or drifted.
+    """
+    users = get_user_model().objects.order_by('pk')
+    if user_ids is not None:
+        users = users.filter(pk__in=ids_condition(list(user_ids)))
+    user_ids = list(users.values_list('pk', flat=True))
+    expected = expected_counters(user_ids)
+    current = UserStats.objects.in_bulk(user_ids) if user_ids else {}
+
+    drifted, missing, changed = [], [], []
+    for user_id in user_ids:
+        values = expected.get(user_id) or dict.fromkeys(COUNTER_FIELDS, 0)
+        stats = current.get(user_id)
+        if stats is None:
+            missing.append(UserStats(user_id=user_id, **values))
+        elif any(getattr(stats, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(stats, field, value)
+            changed.append(stats)
+        else:
+            continue
+        drifted.append(user_id)
+
+    if not dry_run:
+        with transaction.atomic():
+            UserStats.objects.bulk_create(missing, batch_size=500, ignore_conflicts=True)
+            UserStats.objects.bulk_update(changed, COUNTER_FIELDS, batch_size=500)
+    return drifted
+
+
+def stats_for(user):
+    """The ``UserStats`` row of ``user``, built from the tables if it is missing."""
+    stats = UserStats.objects.filter(pk=user.pk).first()
+    if stats is None:
+        recompute([user.pk])
+        stats = UserStats.objects.get(pk=user.pk)
+    return stats
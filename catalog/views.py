@@ -2,142 +2,136 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Avg, Count, Sum
+from django.db.models import Q, Avg, Count, Sum, Prefetch, prefetch_related_objects
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import never_cache
+from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils.http import url_has_allowed_host_and_scheme
-from .models import MediaItem, Genre, Rating, Watchlist, Profile
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from .models import MediaItem, MediaItemQuerySet, Genre, ItemNeighbor, Rating, Season, Watchlist, Profile, card_genres
+from . import bitmaps, charts, history, posters, progress, reference, trending, user_stats, watchlists
+from .recommendations import recommended_for, similar_items
+from .facets import get_facet_counts
+from .pagecache import anonymous_page_cache, item_namespace
+from .pagination import KeysetPaginator
 from .forms import CustomUserCreationForm, RatingForm, ProfileForm, UserProfileForm
+from .search import SearchResults, autocomplete, fuzzy, get_search_backend
+from .user_state import item_states
 
-def _matches_media_item(item, query_cf):
-    """Case-insensitive (Unicode) match across title/original_title/description using Python casefold."""
-    fields = [item.title, item.original_title, item.description]
-    return any(query_cf in (value or '').casefold() for value in fields)
-
+@anonymous_page_cache()
 def home(request):
-    latest_movies = MediaItem.objects.filter(
+    latest_movies = MediaItem.objects.only(*MediaItemQuerySet.CARD_FIELDS).filter(
         media_type='movie',
         is_published=True
     ).order_by('-created_at')[:4]
     
-    latest_series = MediaItem.objects.filter(
+    latest_series = MediaItem.objects.only(*MediaItemQuerySet.CARD_FIELDS).filter(
         media_type='series',
         is_published=True
     ).order_by('-created_at')[:4]
     
-    latest_anime = MediaItem.objects.filter(
+    latest_anime = MediaItem.objects.only(*MediaItemQuerySet.CARD_FIELDS).filter(
         media_type='anime',
         is_published=True
     ).order_by('-created_at')[:4]
     
-    from django.db.models import Count
-    movie_count = MediaItem.objects.filter(media_type='movie', is_published=True).count()
-    series_count = MediaItem.objects.filter(media_type='series', is_published=True).count()
-    anime_count = MediaItem.objects.filter(media_type='anime', is_published=True).count()
-    rating_count = Rating.objects.count()
+    counts = get_facet_counts()
+    trending_sections = _trending_rows(trending.sections('score'))
+    weekly_sections = _trending_rows(trending.sections('week_score'))
+    recommended = recommended_for(request.user)
+    # Every card on the page gets its genres from this one prefetch.
+    _with_card_genres(
+        latest_movies, latest_series, latest_anime, recommended,
+        *(items for _, items in trending_sections + weekly_sections),
+    )
     
     context = {
+        'trending_sections': trending_sections,
+        'weekly_sections': weekly_sections,
         'latest_movies': latest_movies,
         'latest_series': latest_series,
         'latest_anime': latest_anime,
-        'movie_count': movie_count,
-        'series_count': series_count,
-        'anime_count': anime_count,
-        'rating_count': rating_count,
+        'movie_count': counts.type_count('movie'),
+        'series_count': counts.type_count('series'),
+        'anime_count': counts.type_count('anime'),
+        'rating_count': counts.ratings,
+        'recommended': recommended,
     }
     return render(request, 'catalog/home.html', context)
 
-def media_list(request):
-    media_type = request.GET.get('type', 'all')
-    genre_slug = request.GET.get('genre')
-    sort_by = request.GET.get('sort', '-created_at')
-    
-    items = MediaItem.objects.filter(is_published=True)
-    
-    all_count = items.count()
-    movie_count = items.filter(media_type='movie').count()
-    series_count = items.filter(media_type='series').count()
-    anime_count = items.filter(media_type='anime').count()
-    
-    if media_type != 'all':
-        items = items.filter(media_type=media_type)
-    
-    if genre_slug:
-        items = items.filter(genres__slug=genre_slug)
-    
-    items = items.annotate(
-        avg_rating=Avg('ratings__score')
-    )
-    
-    valid_sorts = ['-created_at', 'title', '-release_year', '-avg_rating']
-    if sort_by in valid_sorts:
-        items = items.order_by(sort_by)
-    
-    genres = Genre.objects.all()
-    
-    paginator = Paginator(items, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    context = {
-        'page_obj': page_obj,
-        'genres': genres,
-        'current_type': media_type,
-        'current_genre': genre_slug,
-        'current_sort': sort_by,
-        'all_count': all_count,
-        'movie_count': movie_count,
-        'series_count': series_count,
-        'anime_count': anime_count,
-    }
-    return render(request, 'catalog/media_list.html', context)
+def _with_card_genres(*groups):
+    """Prefetch the card genres of already loaded item lists in one query."""
+    prefetch_related_objects([item for items in groups for item in items], card_genres())
 
+def _trending_rows(sections):
+    """``[(type label, items), ...]`` for the media types that have trending items."""
+    return [(label, sections[code]) for code, label in MediaItem.MEDIA_TYPES if sections[code]]
+
+@anonymous_page_cache(namespaces=lambda request, pk: [item_namespace(pk)])
 def media_detail(request, pk):
     media = get_object_or_404(MediaItem, pk=pk, is_published=True)
-    user_rating = None
+    state = item_states(request.user, [media.pk])[media.pk]
     
-    if request.user.is_authenticated:
-        user_rating = Rating.objects.filter(
-            user=request.user, 
-            media_item=media
-        ).first()
-        
-        watchlist_item = Watchlist.objects.filter(
-            user=request.user,
-            media_item=media
-        ).first()
-        is_in_watchlist = bool(watchlist_item)
-        watchlist_status = watchlist_item.status if watchlist_item else Watchlist.Status.PLANNED
-    else:
-        is_in_watchlist = False
-        watchlist_status = Watchlist.Status.PLANNED
-    
-    ratings = media.ratings.select_related('user').order_by('-created_at')
-    seasons = media.seasons.all()
-    season_count = seasons.count()
-    episode_count = seasons.aggregate(total_episodes=Sum('episodes_count')).get('total_episodes') or 0
+    reviews = _review_page(media)
     
+    # Season totals and genres are read inside the cached fragments of the template.
     context = {
         'media': media,
-        'seasons': seasons,
-        'season_count': season_count,
-        'episode_count': episode_count,
-        'user_rating': user_rating,
-        'is_in_watchlist': is_in_watchlist,
-        'watchlist_status': watchlist_status,
-        'ratings': ratings,
+        'user_rating': state['score'],
+        'is_in_watchlist': state['in_watchlist'],
+        'watchlist_status': state['status'] or Watchlist.Status.PLANNED,
+        'ratings': reviews,
+        'reviews_next_url': _reviews_url(media, reviews),
+        'also_liked': similar_items(media),
+        'similar_titles': similar_items(media, ItemNeighbor.Kind.CONTENT),
     }
+    _with_card_genres(context['also_liked'], context['similar_titles'])
+    if request.user.is_authenticated and media.media_type in ('series', 'anime'):
+        seasons = progress.seasons_with_progress(request.user, media)
+        context['season_progress'] = seasons
+        context['progress_percent'] = progress.percent(
+            sum(season.watched for season in seasons),
+            sum(season.episodes_count for season in seasons),
+        )
     return render(request, 'catalog/media_detail.html', context)
 
+
+REVIEWS_PAGE_SIZE = 10
+
+
+def _review_page(media, cursor=None):
+    paginator = KeysetPaginator(media.ratings.for_reviews(), ('-created_at', '-id'), REVIEWS_PAGE_SIZE)
+    return paginator.get_page(cursor)
+
+
+def _reviews_url(media, page):
+    if not page.has_next:
+        return None
+    return f"{reverse('media_reviews', args=[media.pk])}?{urlencode({'cursor': page.next_cursor})}"
+
+
+@anonymous_page_cache(namespaces=lambda request, pk: [item_namespace(pk)])
+def media_reviews(request, pk):
+    """Next page of reviews as an HTML fragment, for the "show more" button."""
+    media = get_object_or_404(MediaItem.objects.only('id', 'title'), pk=pk, is_published=True)
+    reviews = _review_page(media, request.GET.get('cursor'))
+    html = render_to_string('catalog/partials/review_items.html', {
+        'media': media,
+        'ratings': reviews,
+    }, request=request)
+    return JsonResponse({'html': html, 'next_url': _reviews_url(media, reviews)})
+
 @login_required
 def rate_media(request, pk):
     media = get_object_or_404(MediaItem, pk=pk)
     
     if request.method == 'POST':
-        score = request.POST.get('score')
+        score = _score(request)
         comment = request.POST.get('comment', '')
-        
+        if score is None:
+            return redirect('media_detail', pk=pk)
+
         Rating.objects.update_or_create(
             user=request.user,
             media_item=media,
@@ -147,6 +141,18 @@ def rate_media(request, pk):
     return redirect('media_detail', pk=pk)
 
 
+def _score(request):
+    """The posted 1..10 score, or ``None`` after flashing an error."""
+    try:
+        score = int(request.POST.get('score', ''))
+    except ValueError:
+        score = None
+    if score is None or not 1 <= score <= 10:
+        messages.error(request, 'Оцінка має бути цілим числом від 1 до 10.')
+        return None
+    return score
+
+
 def _safe_redirect(request, fallback_url):
     next_url = request.POST.get('next') or request.META.get('HTTP_REFERER')
     if next_url and url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
@@ -157,15 +163,15 @@ def _safe_redirect(request, fallback_url):
 @login_required
 def update_rating(request, pk):
     rating = get_object_or_404(Rating, pk=pk, user=request.user)
-    fallback_url = reverse('media_detail', args=[rating.media_item.pk])
+    fallback_url = reverse('media_detail', args=[rating.media_item_id])
     redirect_url = _safe_redirect(request, fallback_url)
 
     if request.method == 'POST':
-        score = request.POST.get('score')
+        score = _score(request)
         comment = request.POST.get('comment', '')
 
-        if score:
-            rating.score = int(score)
+        if score is not None:
+            rating.score = score
             rating.comment = comment
             rating.save()
             messages.success(request, 'Відгук оновлено.')
@@ -176,7 +182,7 @@ def update_rating(request, pk):
 @login_required
 def delete_rating(request, pk):
     rating = get_object_or_404(Rating, pk=pk, user=request.user)
-    fallback_url = reverse('media_detail', args=[rating.media_item.pk])
+    fallback_url = reverse('media_detail', args=[rating.media_item_id])
     redirect_url = _safe_redirect(request, fallback_url)
 
     if request.method == 'POST':
@@ -185,6 +191,34 @@ def delete_rating(request, pk):
 
     return redirect(redirect_url)
 
+@login_required
+def update_progress(request, pk):
+    """Mark a range of episodes of one season (all without a range) as watched or not."""
+    redirect_url = _safe_redirect(request, reverse('media_detail', args=[pk]))
+    if request.method == 'POST':
+        try:
+            season_id = int(request.POST.get('season', ''))
+        except ValueError:
+            raise Http404('Сезон не знайдено.')
+        season = get_object_or_404(Season, pk=season_id, media_item_id=pk)
+        watched = request.POST.get('action') != 'unmark'
+        try:
+            first, last = (_optional_int(request.POST.get(name)) for name in ('first', 'last'))
+        except ValueError:
+            messages.error(request, 'Номери серій мають бути цілими числами.')
+            return redirect(redirect_url)
+        if first is None and last is None:
+            progress.mark_all(request.user, season, watched=watched)
+        else:
+            progress.mark(request.user, season, first or 1, last, watched=watched)
+    return redirect(redirect_url)
+
+
+def _optional_int(value):
+    """``None`` for a blank form value, its integer otherwise; ``ValueError`` if it is not one."""
+    value = (value or '').strip()
+    return int(value) if value else None
+
 @login_required
 def toggle_watchlist(request, pk):
     media = get_object_or_404(MediaItem, pk=pk)
@@ -239,6 +273,7 @@ def profile(request):
         profile_form = ProfileForm(instance=profile_obj)
         user_form = UserProfileForm(instance=request.user)
 
+    stats = user_stats.stats_for(request.user)
     watchlist_items = Watchlist.objects.filter(
         user=request.user
     ).select_related('media_item')
@@ -251,7 +286,7 @@ def profile(request):
         {
             'value': value,
             'label': label,
-            'count': watchlist_items.filter(status=value).count()
+            'count': stats.status_count(value)
         }
         for value, label in Watchlist.Status.choices
     ]
@@ -265,7 +300,7 @@ def profile(request):
         {
             'value': key,
             'label': type_labels.get(key, key),
-            'count': watchlist_items.filter(media_item__media_type=key).count()
+            'count': stats.type_count(key)
         }
         for key in ['movie', 'series', 'anime']
     ]
@@ -277,8 +312,10 @@ def profile(request):
     )[:3]
     
     context = {
-        'watchlist_count': watchlist_items.count(),
-        'rating_count': ratings.count(),
+        'watchlist_count': stats.watchlist_count,
+        'rating_count': stats.rating_count,
+        'average_score': stats.average_score,
+        'comment_count': stats.comment_count,
         'latest_watchlist': watchlist_items[:5],
         'recent_ratings': ratings[:5],
         'recent_comments': recent_comments,
@@ -305,19 +342,31 @@ def user_comments(request):
         'comments': comments,
     })
 
+WATCHLIST_PAGE_SIZE = 24
+WATCHLIST_ORDERING = ('-added_at', '-id')
+
+
 @login_required
 def user_watchlist(request):
     search_query = request.GET.get('q', '').strip()
     status_filter = request.GET.get('status', 'all')
     media_type_filter = request.GET.get('type', 'all')
-    base_watchlist = Watchlist.objects.filter(
-        user=request.user
-    ).select_related('media_item').order_by('-added_at')
+    entries = Watchlist.objects.filter(user=request.user)
 
-    status_counts = {
-        value: base_watchlist.filter(status=value).count()
-        for value, label in Watchlist.Status.choices
-    }
+    valid_media_types = {'movie', 'series', 'anime'}
+    if media_type_filter in valid_media_types:
+        entries = entries.filter(media_item__media_type=media_type_filter)
+    else:
+        media_type_filter = 'all'
+
+    if search_query:
+        entries = entries.filter(media_item_id__in=get_search_backend().match_condition(search_query))
+
+    if search_query or media_type_filter != 'all':
+        # Tab counts follow the search and type filters: one grouped query.
+        status_counts = dict(entries.order_by().values_list('status').annotate(count=Count('id')))
+    else:
+        status_counts = watchlists.status_counts(request.user)
 
     status_tabs = [
         {
@@ -328,71 +377,91 @@ def user_watchlist(request):
         for value, label in Watchlist.Status.choices
     ]
 
-    filtered_watchlist = base_watchlist
-
-    valid_media_types = {'movie', 'series', 'anime'}
-    if media_type_filter in valid_media_types:
-        filtered_watchlist = filtered_watchlist.filter(media_item__media_type=media_type_filter)
-    else:
-        media_type_filter = 'all'
-
     valid_statuses = {choice[0] for choice in Watchlist.Status.choices}
     if status_filter in valid_statuses:
-        filtered_watchlist = filtered_watchlist.filter(status=status_filter)
+        entries = entries.filter(status=status_filter)
     else:
         status_filter = 'all'
 
-    filtered_watchlist_list = list(filtered_watchlist)
-
-    if search_query:
-        query_cf = search_query.casefold()
-        filtered_watchlist_list = [
-            item for item in filtered_watchlist_list
-            if _matches_media_item(item.media_item, query_cf)
-        ]
-
-    total_watchlist_count = len(filtered_watchlist_list)
+    entries = entries.prefetch_related(Prefetch('media_item', queryset=MediaItem.objects.for_cards()))
+    page_obj = KeysetPaginator(entries, WATCHLIST_ORDERING, WATCHLIST_PAGE_SIZE).get_page(request.GET.get('cursor'))
+    percents = progress.item_progress(request.user, [entry.media_item_id for entry in page_obj])
+    for entry in page_obj:
+        entry.progress_percent = percents.get(entry.media_item_id)
 
     return render(request, 'catalog/watchlist.html', {
-        'watchlist': filtered_watchlist_list,
+        'watchlist': page_obj,
         'search_query': search_query,
         'status_filter': status_filter,
         'media_type_filter': media_type_filter,
         'status_tabs': status_tabs,
-        'total_watchlist_count': total_watchlist_count,
+        'total_watchlist_count': sum(status_counts.values()),
+        'next_page_url': _cursor_url(request, page_obj.next_cursor) if page_obj.has_next else None,
+        'previous_page_url': _cursor_url(request, page_obj.previous_cursor) if page_obj.has_previous else None,
     })
 
 
+@login_required
+def bulk_watchlist(request):
+    """Add, re-label or remove many watchlist items at once.
+
+    POST ``action`` (``add``, ``status`` or ``remove``), ``status`` and
+    ``ids=1,2,3``; answers with the change counts and the new per-status counts.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required.'}, status=405)
+    try:
+        result = watchlists.bulk_change(
+            request.user, request.POST.get('action'), _item_ids(request.POST), request.POST.get('status'),
+        )
+    except watchlists.BulkChangeError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    counts = watchlists.status_counts(request.user)
+    return JsonResponse({**result, 'counts': counts, 'total': sum(counts.values())})
+
+
 def search(request):
     query = request.GET.get('q', '').strip()
-    results = []
-    
+    page_obj = None
+
     if query:
-        query_cf = query.casefold()
-        base_items = MediaItem.objects.filter(is_published=True).select_related().prefetch_related('genres').order_by('-created_at')
-        results = [item for item in base_items if _matches_media_item(item, query_cf)]
-    
+        queryset = MediaItem.objects.for_cards('description')
+        results = SearchResults(query, queryset=queryset)
+        if results.count() < fuzzy.FALLBACK_THRESHOLD:
+            exact = results[:]
+            results = exact + fuzzy.similar_items(
+                query, queryset, exclude=[item.pk for item in exact]
+            )
+        paginator = Paginator(results, 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+
     return render(request, 'catalog/search.html', {
         'query': query,
-        'results': results
+        'page_obj': page_obj,
+        'results': page_obj.object_list if page_obj else [],
     })
 
+@anonymous_page_cache()
 def search_suggestions(request):
     query = request.GET.get('q', '').strip()
     suggestions = []
 
     if query:
-        query_cf = query.casefold()
-        base_qs = (
-            MediaItem.objects.filter(is_published=True)
-            .annotate(avg_rating=Avg('ratings__score'))
-            .order_by('-created_at')
-        )[:50]
-
-        matches = [
-            item for item in base_qs
-            if _matches_media_item(item, query_cf)
-        ][:8]
+        matches = autocomplete.suggest(query)
+        fallback_ids = []
+        if not matches:
+            # Nothing starts with the query; fall back to full-text matches (e.g. descriptions).
+            fallback_ids = [hit.pk for hit in get_search_backend().search(query, limit=8)]
+        found = len(matches) + len(fallback_ids)
+        if found < fuzzy.FALLBACK_THRESHOLD:
+            exclude = [item.pk for item in matches] + fallback_ids
+            fallback_ids += [
+                pk for pk, _similarity in fuzzy.similar_ids(query, limit=8 - found, exclude=exclude)
+            ]
+        if fallback_ids:
+            # Autocomplete returns the rows themselves; only fallback ids need loading.
+            items = MediaItem.objects.in_bulk(fallback_ids)
+            matches = matches + [items[pk] for pk in fallback_ids if pk in items]
 
         suggestions = [
             {
@@ -404,6 +473,9 @@ def search_suggestions(request):
                 'avg_rating': item.avg_rating or 0,
                 'url': reverse('media_detail', args=[item.pk]),
                 'poster': item.poster.url if item.poster else None,
+                # AVIF/WebP thumbnails, best format first; ``poster`` is the fallback.
+                'poster_sources': posters.sources(item, 'thumb'),
+                'poster_sizes': posters.sizes('thumb'),
             }
             for item in matches
         ]
@@ -415,6 +487,61 @@ def search_suggestions(request):
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.models import User
 
+MAX_ITEM_ID = 2 ** 63 - 1
+
+
+def _item_ids(params):
+    """Integer ids from ``ids`` parameters, each a comma-separated list; other tokens are skipped."""
+    item_ids = []
+    for chunk in params.getlist('ids'):
+        for value in chunk.split(','):
+            value = value.strip()
+            # ``isdigit()`` alone also accepts e.g. superscripts, which ``int()`` rejects;
+            # ids past the 64-bit column range overflow the database parameter.
+            if value.isascii() and value.isdigit() and int(value) <= MAX_ITEM_ID:
+                item_ids.append(int(value))
+    return item_ids
+
+
+@never_cache
+def user_item_states(request):
+    """Watchlist status and own score for ``?ids=1,2,3``; overlays shared pages."""
+    states = item_states(request.user, _item_ids(request.GET))
+    return JsonResponse({'items': {str(pk): state for pk, state in states.items()}})
+
+@login_required
+def export_history(request):
+    """The user's watchlist and ratings as a streamed CSV or JSON download."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in history.FORMATS:
+        fmt = 'csv'
+    response = StreamingHttpResponse(history.export(request.user, fmt), content_type=history.CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{history.export_filename(request.user, fmt)}"'
+    return response
+
+
+@login_required
+def import_history(request):
+    upload = request.FILES.get('file') if request.method == 'POST' else None
+    if upload:
+        fmt = 'json' if upload.name.lower().endswith('.json') else 'csv'
+        try:
+            result = history.import_history(request.user, upload, fmt)
+        except history.HistoryImportError as exc:
+            messages.error(
+                request,
+                f"Не вдалося прочитати файл ({exc}). Імпортовано до помилки: "
+                f"список — {exc.result.get('watchlist', 0)}, оцінки — {exc.result.get('ratings', 0)}.",
+            )
+        else:
+            messages.success(
+                request,
+                f"Імпорт завершено: список — {result['watchlist']}, оцінки — {result['ratings']}, "
+                f"пропущено — {result['skipped']}.",
+            )
+    return redirect('profile')
+
+
 def register(request):
     if request.method == 'POST':
         username = request.POST.get('username')
@@ -452,60 +579,144 @@ def custom_404(request, exception=None):
     response.status_code = 404
     return response
 
+CATALOG_PAGE_SIZE = 12
+# Keyset orderings per supported sort; the trailing id makes every ordering total.
+CATALOG_SORTS = {
+    '-created_at': ('-created_at', '-id'),
+    'title': ('title', 'id'),
+    '-release_year': ('-release_year', '-id'),
+    '-weighted_rating': charts.ORDERING,
+}
+# Old catalog links sorted by the plain average.
+SORT_ALIASES = {'-avg_rating': '-weighted_rating'}
+
+
+def _cursor_url(request, cursor):
+    params = request.GET.copy()
+    params.pop('page', None)
+    params['cursor'] = cursor
+    return f'?{params.urlencode()}'
+
+
+def _chart_page(genre_id, media_type, cursor):
+    card_fields = [f'media_item__{name}' for name in MediaItemQuerySet.CARD_FIELDS]
+    entries = (
+        charts.genre_chart(genre_id, None if media_type == 'all' else media_type)
+        .select_related('media_item')
+        .only('id', 'weighted_rating', 'media_item', *card_fields)
+        .prefetch_related(Prefetch('media_item__genres', queryset=Genre.objects.only('id', 'name', 'slug')))
+    )
+    page = KeysetPaginator(entries, charts.ORDERING, CATALOG_PAGE_SIZE).get_page(cursor)
+    page.object_list = [entry.media_item for entry in page.object_list]
+    return page
+
+
+def _int_param(params, name):
+    try:
+        return int(params.get(name, ''))
+    except ValueError:
+        return None
+
+
+def _catalog_filters(request, index, media_type):
+    params = request.GET
+    filters = bitmaps.Filters(genre_mode='and' if params.get('genre_mode') == 'and' else 'or')
+    if media_type != 'all':
+        filters.type = {media_type}
+    # Unknown slugs map to None, which matches nothing.
+    filters.genre = {
+        getattr(reference.get_genre(slug), 'pk', None)
+        for slug in params.getlist('genre') if slug
+    }
+    year_from, year_to = _int_param(params, 'year_from'), _int_param(params, 'year_to')
+    if year_from is not None or year_to is not None:
+        filters.year = {
+            year for year in index.facets['year']
+            if (year_from is None or year >= year_from) and (year_to is None or year <= year_to)
+        } or {None}
+    filters.country = {country for country in params.getlist('country') if country}
+    buckets = {key for key, *_ in bitmaps.DURATION_BUCKETS}
+    filters.duration = {key for key in params.getlist('duration') if key in buckets}
+    return filters
+
+
+@anonymous_page_cache()
 def media_list(request):
     media_type = request.GET.get('type', 'all')
-    genre_slug = request.GET.get('genre')
     sort_by = request.GET.get('sort', '-created_at')
     search_query = request.GET.get('q', '').strip()
+    sort_by = SORT_ALIASES.get(sort_by, sort_by)
+    if sort_by not in CATALOG_SORTS:
+        sort_by = '-created_at'
     
-    items = MediaItem.objects.filter(is_published=True)
+    index = bitmaps.get_index()
+    filters = _catalog_filters(request, index, media_type)
+    if search_query:
+        filters.restrict_ids = get_search_backend().match_ids(search_query)
+    
+    items = MediaItem.objects.for_cards().filter(is_published=True)
     
     if media_type != 'all':
         items = items.filter(media_type=media_type)
     
-    if genre_slug:
-        items = items.filter(genres__slug=genre_slug)
-    
-    items = items.annotate(
-        avg_rating=Avg('ratings__score'),
-        rating_count=Count('ratings')
-    ).distinct()
-    
-    movie_count = MediaItem.objects.filter(media_type='movie', is_published=True).count()
-    series_count = MediaItem.objects.filter(media_type='series', is_published=True).count()
-    anime_count = MediaItem.objects.filter(media_type='anime', is_published=True).count()
-    
-    valid_sorts = ['-created_at', 'title', '-release_year', '-avg_rating']
-    if sort_by in valid_sorts:
-        items = items.order_by(sort_by)
+    chart_genre = None
+    if sort_by == '-weighted_rating' and len(filters.genre) == 1 and not (
+        filters.year or filters.country or filters.duration or search_query
+    ):
+        chart_genre = next(iter(filters.genre))
+    elif any(getattr(filters, facet) for facet in ('genre', 'year', 'country', 'duration')) or search_query:
+        # The bitmap index resolves every other facet in memory, without joins.
+        matching = index.ids_for_bits(index.select(filters))
+        items = items.filter(pk__in=bitmaps.ids_condition(matching))
+    
+    counts = index.counts(filters)
+    current_genres = request.GET.getlist('genre')
+    current_countries = sorted(filters.country)
+    # Shared reference data: pair the genres with counts instead of mutating them.
+    genre_facets = [
+        (genre, counts['genre'].get(genre.pk, 0), genre.slug in current_genres)
+        for genre in reference.get_genres()
+    ]
+    country_facets = sorted(
+        (
+            (country, count, country in filters.country)
+            for country, count in counts['country'].items()
+            if count or country in filters.country
+        ),
+        key=lambda facet: (-facet[1], facet[0]),
+    )
+    duration_facets = [
+        (key, label, counts['duration'].get(key, 0), key in filters.duration)
+        for key, label, *_ in bitmaps.DURATION_BUCKETS
+    ]
+    years = sorted(index.facets['year'])
     
-    if search_query:
-        query_cf = search_query.casefold()
-        items_list = [item for item in items if _matches_media_item(item, query_cf)]
+    if chart_genre is not None:
+        # A single genre by rating: page through its materialized chart.
+        page_obj = _chart_page(chart_genre, media_type, request.GET.get('cursor'))
     else:
-        items_list = list(items)
-    
-    genres = Genre.objects.all()
-    
-    user_watchlist = []
-    if request.user.is_authenticated:
-        user_watchlist = Watchlist.objects.filter(
-            user=request.user
-        ).values_list('media_item_id', flat=True)
-
-    paginator = Paginator(items_list, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+        paginator = KeysetPaginator(items, CATALOG_SORTS[sort_by], CATALOG_PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'page_obj': page_obj,
-        'genres': genres,
+        'next_page_url': _cursor_url(request, page_obj.next_cursor) if page_obj.has_next else None,
+        'previous_page_url': _cursor_url(request, page_obj.previous_cursor) if page_obj.has_previous else None,
+        'genre_facets': genre_facets,
+        'country_facets': country_facets,
+        'duration_facets': duration_facets,
         'current_type': media_type,
-        'current_genre': genre_slug,
+        'current_genres': current_genres,
+        'current_countries': current_countries,
+        'genre_mode': filters.genre_mode,
+        'year_from': _int_param(request.GET, 'year_from'),
+        'year_to': _int_param(request.GET, 'year_to'),
+        'min_year': years[0] if years else None,
+        'max_year': years[-1] if years else None,
         'current_sort': sort_by,
-        'movie_count': movie_count,
-        'series_count': series_count,
-        'anime_count': anime_count,
-        'user_watchlist': user_watchlist,
+        'all_count': index.total(),
+        'movie_count': index.total('type', 'movie'),
+        'series_count': index.total('type', 'series'),
+        'anime_count': index.total('type', 'anime'),
     }
     return render(request, 'catalog/media_list.html', context)
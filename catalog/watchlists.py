@@ -0,0 +1,101 @@
+"""Bulk watchlist edits.
+
+``bulk_change`` adds, re-labels or removes many items of one user's watchlist
+with set-based statements in a single transaction: one read of the items and
+of the current entries, one upsert, update or delete, then the profile
+counters and trending points are shifted in bulk. The number of queries does
+not depend on how many items are edited. Row-level signals do not fire, so
+everything they maintain for watchlist rows is applied here.
+"""
+from django.db import connection, transaction
+
+from . import trending, user_stats
+from .bitmaps import ids_condition
+from .models import MediaItem, Watchlist
+
+MAX_ITEMS = 1000
+ADD, SET_STATUS, REMOVE = 'add', 'status', 'remove'
+ACTIONS = (ADD, SET_STATUS, REMOVE)
+
+
+class BulkChangeError(ValueError):
+    pass
+
+
+def bulk_change(user, action, item_ids, status=None, activity=True):
+    """Apply ``action`` to ``item_ids`` (at most ``MAX_ITEMS``) of ``user``'s watchlist.
+
+    ``add`` puts missing items in the list with ``status`` and moves listed
+    ones to it, ``status`` only moves listed ones, ``remove`` drops them.
+    Unknown item ids are ignored. ``activity=False`` (restoring an import)
+    leaves trending alone. Returns ``{'added', 'updated', 'removed'}``.
+    """
+    if action not in ACTIONS:
+        raise BulkChangeError(f'Unknown action: {action}')
+    if action != REMOVE and status not in Watchlist.Status.values:
+        raise BulkChangeError(f'Unknown status: {status}')
+    item_ids = list(dict.fromkeys(item_ids))
+    if len(item_ids) > MAX_ITEMS:
+        raise BulkChangeError(f'At most {MAX_ITEMS} items per request.')
+
+    result = {'added': 0, 'updated': 0, 'removed': 0}
+    if not item_ids:
+        return result
+
+    with transaction.atomic():
+        media_types = dict(
+            MediaItem.objects.filter(pk__in=ids_condition(item_ids)).values_list('pk', 'media_type')
+        )
+        entries = Watchlist.objects.filter(user=user, media_item_id__in=ids_condition(list(media_types)))
+        current = dict(entries.values_list('media_item_id', 'status'))
+
+        if action == REMOVE:
+            _delete_entries(user, list(current))
+            changes = {pk: (old, None) for pk, old in current.items()}
+            result['removed'] = len(changes)
+        else:
+            changes = {pk: (old, status) for pk, old in current.items() if old != status}
+            if action == ADD:
+                changes.update({pk: (None, status) for pk in media_types if pk not in current})
+                Watchlist.objects.bulk_create(
+                    [Watchlist(user=user, media_item_id=pk, status=status) for pk in changes],
+                    batch_size=500,
+                    update_conflicts=True,
+                    unique_fields=['user', 'media_item'],
+                    update_fields=['status'],
+                )
+            elif changes:
+                entries.filter(media_item_id__in=ids_condition(list(changes))).update(status=status)
+            result['added'] = sum(old is None for old, _ in changes.values())
+            result['updated'] = len(changes) - result['added']
+
+        user_stats.watchlist_bulk_changed(
+            user.pk, [(old, new, media_types[pk]) for pk, (old, new) in changes.items()]
+        )
+        if activity:
+            for weight, selected in (
+                (trending.WATCHLIST_ADDED, [pk for pk, (old, new) in changes.items() if old is None]),
+                (trending.WATCHLIST_STATUS_CHANGED, [pk for pk, (old, new) in changes.items() if old and new]),
+            ):
+                trending.record_many({pk: media_types[pk] for pk in selected}, weight)
+    return result
+
+
+def _delete_entries(user, item_ids):
+    # Watchlist rows have no dependents. A plain DELETE skips the collector and
+    # its per-row post_delete signals; bulk_change shifts the counters in one go.
+    if not item_ids:
+        return
+    table = connection.ops.quote_name(Watchlist._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(item_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE user_id = %s AND media_item_id IN ({placeholders})',
+            [user.pk, *item_ids],
+        )
+
+
+def status_counts(user):
+    """``{status: count}`` of ``user``'s watchlist, from the profile counters."""
+    stats = user_stats.stats_for(user)
+    return {value: stats.status_count(value) for value in Watchlist.Status.values}
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'catalog.profiling.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,6 +98,30 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Search engine used by search, suggestions and the catalog q= filter:
+# 'fts5' (SQLite full-text), 'index' (token index) or 'casefold' (Python scan, fallback).
+CATALOG_SEARCH_BACKEND = os.environ.get('CATALOG_SEARCH_BACKEND', 'fts5')
+
+# Adds an X-Query-Stats header to every response and logs views that exceed
+# their query budget (catalog.profiling.QUERY_BUDGETS). Off unless DEBUG.
+CATALOG_QUERY_PROFILING = os.environ.get('CATALOG_QUERY_PROFILING', str(DEBUG)) == 'True'
+
+# Prior of the Bayesian weighted rating behind top charts: every item is scored
+# as if it also had PRIOR_VOTES votes of PRIOR_MEAN. After changing them run
+# `python manage.py repair_rating_aggregates` to recompute the stored scores.
+CATALOG_RATING_PRIOR_VOTES = int(os.environ.get('CATALOG_RATING_PRIOR_VOTES', '10'))
+CATALOG_RATING_PRIOR_MEAN = float(os.environ.get('CATALOG_RATING_PRIOR_MEAN', '6.5'))
+
+# Facet counts and other catalog caches are invalidated through versioned keys,
+# so with several worker processes point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'mediahub'),
+    }
+}
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/login/'
@@ -0,0 +1,32 @@
+document.addEventListener("DOMContentLoaded", function () {
+    const button = document.getElementById("loadMoreReviews");
+    const list = document.getElementById("reviewList");
+    if (!button || !list) return;
+
+    button.addEventListener("click", function () {
+        const url = button.dataset.url;
+        if (!url) return;
+
+        button.disabled = true;
+        fetch(url, { headers: { "X-Requested-With": "XMLHttpRequest" } })
+            .then((response) => {
+                if (!response.ok) throw new Error(response.statusText);
+                return response.json();
+            })
+            .then((data) => {
+                list.insertAdjacentHTML("beforeend", data.html);
+                if (window.renderStarRatings) {
+                    window.renderStarRatings(list);
+                }
+                if (data.next_url) {
+                    button.dataset.url = data.next_url;
+                    button.disabled = false;
+                } else {
+                    button.remove();
+                }
+            })
+            .catch(() => {
+                button.disabled = false;
+            });
+    });
+});
@@ -52,10 +52,20 @@
       const thumb = document.createElement('div');
       thumb.className = 'suggestion-thumb';
       if (item.poster) {
+        const picture = document.createElement('picture');
+        (item.poster_sources || []).forEach((variant) => {
+          const source = document.createElement('source');
+          source.type = variant.type;
+          source.srcset = variant.srcset;
+          source.sizes = item.poster_sizes || '56px';
+          picture.appendChild(source);
+        });
         const img = document.createElement('img');
         img.src = item.poster;
         img.alt = item.title;
-        thumb.appendChild(img);
+        img.decoding = 'async';
+        picture.appendChild(img);
+        thumb.appendChild(picture);
       } else {
         const initial = document.createElement('span');
         const source = item.type_label || typeFallback(item.type);
@@ -116,6 +126,16 @@
 
     const dropdown = createDropdown(wrapper);
     let abortController = null;
+    const responseCache = new Map();
+    const CACHE_LIMIT = 50;
+
+    const show = (items) => {
+      if (!items.length) {
+        renderEmpty(dropdown);
+        return;
+      }
+      renderSuggestions(dropdown, items);
+    };
 
     const fetchSuggestions = debounce(async () => {
       const query = input.value.trim();
@@ -125,6 +145,12 @@
         return;
       }
 
+      const cacheKey = query.toLowerCase();
+      if (responseCache.has(cacheKey)) {
+        show(responseCache.get(cacheKey));
+        return;
+      }
+
       if (supportsAbort && abortController) {
         abortController.abort();
       }
@@ -152,12 +178,11 @@
         }
 
         const items = data.results || [];
-        if (!items.length) {
-          renderEmpty(dropdown);
-          return;
+        if (responseCache.size >= CACHE_LIMIT) {
+          responseCache.delete(responseCache.keys().next().value);
         }
-
-        renderSuggestions(dropdown, items);
+        responseCache.set(cacheKey, items);
+        show(items);
       } catch (error) {
         if (error.name !== 'AbortError') {
           console.warn('Search suggestions failed', error);
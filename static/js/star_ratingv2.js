@@ -1,5 +1,5 @@
-document.addEventListener("DOMContentLoaded", function () {
-    const elements = document.querySelectorAll(".star-rating-detailed");
+function renderStarRatings(root) {
+    const elements = (root || document).querySelectorAll(".star-rating-detailed");
 
     elements.forEach(function (ratingElement) {
         let ratingAttr = ratingElement.getAttribute("data-rating") || "0";
@@ -22,4 +22,10 @@ document.addEventListener("DOMContentLoaded", function () {
             }
         });
     });
+}
+
+window.renderStarRatings = renderStarRatings;
+
+document.addEventListener("DOMContentLoaded", function () {
+    renderStarRatings(document);
 });
@@ -0,0 +1,36 @@
+(function () {
+    const script = document.currentScript;
+    const url = script && script.dataset.url;
+    if (!url) return;
+
+    function badgeFor(state) {
+        const parts = [];
+        if (state.status_label) parts.push(state.status_label);
+        if (state.score) parts.push(`★ ${state.score}/10`);
+        if (!parts.length) return null;
+
+        const badge = document.createElement("span");
+        badge.className = "badge-sakura user-state-badge position-absolute top-0 start-0 m-2";
+        badge.textContent = parts.join(" · ");
+        return badge;
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        const cards = document.querySelectorAll("[data-item-id]");
+        const ids = [...new Set([...cards].map((card) => card.dataset.itemId))];
+        if (!ids.length) return;
+
+        fetch(`${url}?ids=${ids.join(",")}`, { credentials: "same-origin" })
+            .then((response) => (response.ok ? response.json() : { items: {} }))
+            .then((data) => {
+                cards.forEach((card) => {
+                    const state = data.items[card.dataset.itemId];
+                    const badge = state && badgeFor(state);
+                    if (!badge) return;
+                    const holder = card.querySelector(".position-relative") || card;
+                    holder.appendChild(badge);
+                });
+            })
+            .catch(() => {});
+    });
+})();
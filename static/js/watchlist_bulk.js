@@ -0,0 +1,66 @@
+document.addEventListener("DOMContentLoaded", function () {
+    const form = document.getElementById("bulkWatchlistForm");
+    if (!form) return;
+
+    const boxes = [...document.querySelectorAll(".bulk-select")];
+    const selectAll = document.getElementById("bulkSelectAll");
+    const counter = document.getElementById("bulkSelectedCount");
+    const buttons = form.querySelectorAll("button[type=submit]");
+    const errorBox = document.getElementById("bulkError");
+
+    function selectedIds() {
+        return boxes.filter((box) => box.checked).map((box) => box.value);
+    }
+
+    function refresh() {
+        const count = selectedIds().length;
+        counter.textContent = count;
+        selectAll.checked = count > 0 && count === boxes.length;
+        buttons.forEach((button) => {
+            button.disabled = count === 0;
+        });
+    }
+
+    boxes.forEach((box) => box.addEventListener("change", refresh));
+    selectAll.addEventListener("change", function () {
+        boxes.forEach((box) => {
+            box.checked = selectAll.checked;
+        });
+        refresh();
+    });
+
+    form.addEventListener("submit", function (event) {
+        event.preventDefault();
+        const ids = selectedIds();
+        if (!ids.length) return;
+
+        const data = new FormData(form);
+        data.set("action", event.submitter ? event.submitter.value : "status");
+        data.set("ids", ids.join(","));
+        buttons.forEach((button) => {
+            button.disabled = true;
+        });
+        errorBox.classList.add("d-none");
+        fetch(form.dataset.url, {
+            method: "POST",
+            body: data,
+            credentials: "same-origin",
+            headers: { "X-Requested-With": "XMLHttpRequest" },
+        })
+            .then((response) =>
+                response
+                    .json()
+                    .catch(() => ({}))
+                    .then((payload) => {
+                        if (!response.ok) throw new Error(payload.error || response.statusText || "Не вдалося змінити список.");
+                        return payload;
+                    })
+            )
+            .then(() => window.location.reload())
+            .catch((error) => {
+                errorBox.textContent = error.message || "Не вдалося змінити список.";
+                errorBox.classList.remove("d-none");
+                refresh();
+            });
+    });
+});